@@ -0,0 +1,118 @@
+"""基准测试用的合成数据：地理划分 CSV、逐日 tmax CSV、标准答案与模型输出，规模可配置且由 seed 完全决定"""
+
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+GEO_DIVISION_RELATIVE_PATH = os.path.join('data', 'station_info', '地理划分_去除空列.csv')
+GEO_LEVEL_COLUMNS = ['县', '市', '片区']
+# 模型常见的非标准写法：在标准名称后追加的后缀（mock 服务据此还原标准名称）
+GEO_NAME_SUFFIXES = ['', '', '地区', '一带', '大部']
+
+
+def build_geo_rows(n_areas: int, cities_per_area: int, counties_per_city: int, stations_per_county: int) -> List[List[str]]:
+    """生成 片区 -> 市 -> 县 三级划分，每个县若干站点；返回 [站号, 县, 市, 片区] 行。"""
+    rows = []
+    station_id = 50000
+    for area_idx in range(n_areas):
+        area = f'片区{area_idx}'
+        for city_idx in range(cities_per_area):
+            city = f'{area}市{city_idx}'
+            for county_idx in range(counties_per_city):
+                county = f'{city}县{county_idx}'
+                for _ in range(stations_per_county):
+                    rows.append([str(station_id), county, city, area])
+                    station_id += 1
+    return rows
+
+
+def random_extracted_info(rng: random.Random, geo_names: List[str], with_std_geo: bool = True) -> Dict[str, Any]:
+    """按评分所需结构随机生成 extracted_info；with_std_geo=False 时只给出带后缀的原始 geo（阶段一输入）。"""
+    def _region_geo() -> Dict[str, List[str]]:
+        std_geo = rng.sample(geo_names, rng.randint(1, 3))
+        geo = [name + rng.choice(GEO_NAME_SUFFIXES) for name in std_geo]
+        return {'geo': geo, 'std_geo': std_geo} if with_std_geo else {'geo': geo}
+
+    specific_regions = []
+    for _ in range(rng.randint(0, 4)):
+        tmax_min = rng.randint(15, 28)
+        specific_regions.append({**_region_geo(), 'tmax_min': tmax_min, 'tmax_max': tmax_min + rng.randint(1, 6)})
+    other_regions = None
+    if rng.random() < 0.7:
+        tmax_min = rng.randint(15, 28)
+        other_regions = {'tmax_min': tmax_min, 'tmax_max': tmax_min + rng.randint(1, 6)}
+    max_temp = None
+    if rng.random() < 0.7:
+        max_temp = {**_region_geo(), 'tmax': round(rng.uniform(30, 38), 1)}
+    return {'specific_regions': specific_regions, 'other_regions': other_regions, 'max_temp': max_temp}
+
+
+def generate_fixture(
+    root: str,
+    n_samples: int = 200,
+    n_days: int = 5,
+    n_areas: int = 4,
+    cities_per_area: int = 4,
+    counties_per_city: int = 5,
+    stations_per_county: int = 1,
+    seed: int = 0,
+    base_url: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    在 root 下生成一套完整的评测数据，目录结构与仓库运行时一致（地理划分使用相对路径 data/station_info/...）：
+    - tmax/day{d}.csv：每个站点约 97% 的概率有观测；
+    - labels.json：标准答案（含 std_geo 与 csv_data_path）；
+    - preds.json：阶段二输入，带 std_geo 的模型抽取结果；
+    - raw_outputs.json：阶段一输入，model_output 为不含 std_geo 的抽取结果 JSON 文本；
+    - config.yaml：base_url 不为 None 时指向本地 mock 服务。
+    返回各文件路径。
+    """
+    rng = random.Random(seed)
+    geo_rows = build_geo_rows(n_areas, cities_per_area, counties_per_city, stations_per_county)
+    geo_names = list(dict.fromkeys(name for row in geo_rows for name in row[1:]))
+
+    geo_path = os.path.join(root, GEO_DIVISION_RELATIVE_PATH)
+    os.makedirs(os.path.dirname(geo_path), exist_ok=True)
+    with open(geo_path, 'w') as f:
+        f.write(','.join(['站号+A:K'] + GEO_LEVEL_COLUMNS) + '\n')
+        for row in geo_rows:
+            f.write(','.join(row) + '\n')
+
+    tmax_dir = os.path.join(root, 'tmax')
+    os.makedirs(tmax_dir, exist_ok=True)
+    for day in range(n_days):
+        with open(os.path.join(tmax_dir, f'day{day}.csv'), 'w') as f:
+            f.write('stationid,tmax\n')
+            for row in geo_rows:
+                if rng.random() < 0.97:
+                    f.write(f'{row[0]},{rng.uniform(15, 38):.1f}\n')
+
+    labels, preds, raw_outputs = [], [], []
+    for idx in range(n_samples):
+        qid = f'q{idx}'
+        labels.append({
+            'qid': qid,
+            'input': {'csv_data_path': f'day{idx % n_days}.csv'},
+            'extracted_info': random_extracted_info(rng, geo_names),
+        })
+        preds.append({'qid': qid, 'model_output': '', 'extracted_info': random_extracted_info(rng, geo_names)})
+        raw_info = random_extracted_info(rng, geo_names, with_std_geo=False)
+        raw_outputs.append({'qid': qid, 'model_output': json.dumps(raw_info, ensure_ascii=False)})
+
+    paths = {
+        'root': root,
+        'geo_division': geo_path,
+        'tmax_dir': tmax_dir,
+        'labels': os.path.join(root, 'labels.json'),
+        'preds': os.path.join(root, 'preds.json'),
+        'raw_outputs': os.path.join(root, 'raw_outputs.json'),
+        'config': os.path.join(root, 'config.yaml'),
+    }
+    for key, data in (('labels', labels), ('preds', preds), ('raw_outputs', raw_outputs)):
+        with open(paths[key], 'w') as f:
+            json.dump(data, f, ensure_ascii=False)
+    if base_url is not None:
+        with open(paths['config'], 'w') as f:
+            f.write(f'llm_api:\n  mock:\n    base_url: "{base_url}"\n    api_key: "mock"\n  default: mock\n')
+    return paths
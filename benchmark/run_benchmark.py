@@ -0,0 +1,295 @@
+"""
+Task4 热点路径基准测试：在合成数据上按多个规模计时，结果保存为 JSON 以便跨提交对比。
+
+用法（在仓库根目录执行）：
+    python benchmark/run_benchmark.py                          # 默认规模 small、medium
+    python benchmark/run_benchmark.py --scales large --repeat 5
+    python benchmark/run_benchmark.py --skip-llm               # 不跑阶段一（mock LLM）部分
+    python benchmark/run_benchmark.py --mock-latency lognormal:0.3,0.5 --mock-rate-limit 0.1 --mock-malformed 0.05
+    python benchmark/run_benchmark.py --compare benchmark/results/旧.json benchmark/results/新.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+sys.path.insert(0, BENCHMARK_DIR)
+# 计时期间不输出进度条
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+from fixtures import generate_fixture
+
+SCALES: Dict[str, Dict[str, int]] = {
+    'small': {'n_samples': 200, 'n_days': 5, 'n_areas': 4, 'cities_per_area': 4, 'counties_per_city': 5, 'stations_per_county': 1},
+    'medium': {'n_samples': 2000, 'n_days': 30, 'n_areas': 6, 'cities_per_area': 6, 'counties_per_city': 8, 'stations_per_county': 3},
+    'large': {'n_samples': 20000, 'n_days': 120, 'n_areas': 8, 'cities_per_area': 8, 'counties_per_city': 10, 'stations_per_county': 4},
+}
+DEFAULT_SCALES = ['small', 'medium']
+DEFAULT_REPEAT = 3
+LLM_SAMPLES = 100  # 阶段一基准只取前若干条样本，主要衡量并发、解析与重试开销
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+REGRESSION_THRESHOLD = 1.2  # 对比时新耗时超过旧耗时的倍数即视为退化
+
+
+def time_call(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """重复执行 func，每次执行前调用 setup（不计时），屏蔽脚本自身的打印输出。"""
+    runs: List[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+    return {'best_seconds': min(runs), 'mean_seconds': sum(runs) / len(runs), 'runs': runs}
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': dirty}
+
+
+def collect_geo_lists(extracted_info: Dict[str, Any]) -> List[List[str]]:
+    geo_lists = [region.get('std_geo', []) for region in extracted_info['specific_regions']]
+    if extracted_info['max_temp'] is not None:
+        geo_lists.append(extracted_info['max_temp'].get('std_geo', []))
+    return geo_lists
+
+
+def run_scoring_benchmarks(paths: Dict[str, str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    """阶段二相关的热点：站点展开、匈牙利匹配、观测取值、整体评分与汇总。"""
+    from evaluation.geo_index import clear_geo_index_cache
+    from evaluation.label_store import LabelStore
+    from evaluation.metric import geo_list_match_and_iou
+    from evaluation.observation_store import ObservationStore
+    from evaluation.task4 import stage_2_scoring
+    from evaluation.util import geo_list_to_stationid
+
+    with open(paths['labels']) as f:
+        labels = json.load(f)
+    with open(paths['preds']) as f:
+        preds = json.load(f)
+    label_by_qid = {label['qid']: label for label in labels}
+
+    def reset_state() -> None:
+        # 每次计时都从冷缓存开始：标注、派生站点集合与观测数据重新加载
+        stage_2_scoring.LABEL_STORE = LabelStore(paths['labels'])
+        stage_2_scoring.OBSERVATION_STORE = ObservationStore(paths['tmax_dir'])
+        stage_2_scoring.TEMP_RANGE_MEMO.clear()
+
+    clear_geo_index_cache()
+    reset_state()
+
+    geo_lists = [geo_list for pred in preds for geo_list in collect_geo_lists(pred['extracted_info'])]
+    region_pairs = [
+        (
+            [region.get('std_geo', []) for region in pred['extracted_info']['specific_regions']],
+            [region.get('std_geo', []) for region in label_by_qid[pred['qid']]['extracted_info']['specific_regions']],
+        )
+        for pred in preds
+    ]
+    temp_queries = [
+        (geo_list_to_stationid(geo_list), label['qid'])
+        for label in labels for geo_list in collect_geo_lists(label['extracted_info'])
+    ]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    results['geo_list_to_stationid'] = {
+        'ops': len(geo_lists),
+        **time_call(lambda: [geo_list_to_stationid(geo_list) for geo_list in geo_lists], repeat),
+    }
+    results['geo_list_match_and_iou'] = {
+        'ops': len(region_pairs),
+        **time_call(lambda: [geo_list_match_and_iou(pred_lists, label_lists) for pred_lists, label_lists in region_pairs], repeat),
+    }
+    results['get_actual_temp_list'] = {
+        'ops': len(temp_queries),
+        **time_call(lambda: [stage_2_scoring.get_actual_temp_list(station_ids, qid) for station_ids, qid in temp_queries], repeat, setup=reset_state),
+    }
+    results['accuracy_scoring'] = {
+        'ops': len(preds),
+        **time_call(lambda: stage_2_scoring.accuracy_scoring(preds), repeat, setup=reset_state),
+    }
+    csv_data_paths = [label['input']['csv_data_path'] for label in labels]
+    results['precompute_temp_ranges'] = {
+        'ops': len(set(csv_data_paths)),
+        **time_call(lambda: stage_2_scoring.precompute_temp_ranges(csv_data_paths), repeat, setup=reset_state),
+    }
+
+    def reset_and_precompute() -> None:
+        reset_state()
+        stage_2_scoring.precompute_temp_ranges(csv_data_paths)
+
+    results['accuracy_scoring_precomputed'] = {
+        'ops': len(preds),
+        **time_call(lambda: stage_2_scoring.accuracy_scoring(preds), repeat, setup=reset_and_precompute),
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        scored = stage_2_scoring.accuracy_scoring(preds)
+    results['summary'] = {
+        'ops': len(scored),
+        **time_call(lambda: stage_2_scoring.summary(scored), repeat),
+    }
+    return results
+
+
+def run_llm_benchmarks(paths: Dict[str, str], repeat: int, n_samples: int = LLM_SAMPLES) -> Dict[str, Dict[str, Any]]:
+    """阶段一：对本地 mock 服务执行信息抽取与地理标准化，衡量并发调度与解析开销。"""
+    from evaluation import geo_memo
+    from evaluation.geo_memo import GeoStandardizeMemo
+    from evaluation.task4 import stage_1_1_info_extract, stage_1_2_geo_standardize
+    from model import client as model_client
+
+    with open(paths['raw_outputs']) as f:
+        raw_outputs = json.load(f)[:n_samples]
+    # 配置随 fixture 目录变化，client 注册表需要重新创建
+    model_client._MODEL_CLIENTS.clear()
+    model_client._DEFAULT_API_TYPE = None
+
+    results: Dict[str, Dict[str, Any]] = {}
+    results['info_extract_by_llm'] = {
+        'ops': len(raw_outputs),
+        **time_call(lambda: stage_1_1_info_extract.info_extract_by_llm(raw_outputs), repeat),
+    }
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        extracted = stage_1_1_info_extract.info_extract_by_llm(raw_outputs)
+
+    def reset_memo() -> None:
+        # 不落盘的空备忘录，保证每次都真正请求 LLM
+        geo_memo._GEO_MEMO = GeoStandardizeMemo()
+
+    results['geo_standardize_batch'] = {
+        'ops': len(extracted),
+        **time_call(lambda: stage_1_2_geo_standardize.geo_standardize_batch(extracted), repeat, setup=reset_memo),
+    }
+    return results
+
+
+def run_scale(scale: str, repeat: int, base_url: Optional[str]) -> Dict[str, Any]:
+    params = SCALES[scale]
+    with tempfile.TemporaryDirectory(prefix=f'task4_bench_{scale}_') as root:
+        paths = generate_fixture(root, base_url=base_url, **params)
+        # 地理划分与 config.yaml 均按相对路径读取，切换到 fixture 目录运行
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            benchmarks = run_scoring_benchmarks(paths, repeat)
+            if base_url is not None:
+                benchmarks.update(run_llm_benchmarks(paths, repeat))
+        finally:
+            os.chdir(cwd)
+    for stat in benchmarks.values():
+        stat['us_per_op'] = stat['best_seconds'] / stat['ops'] * 1e6 if stat['ops'] else None
+    return {'fixture': params, 'benchmarks': benchmarks}
+
+
+def run_benchmarks(
+    scales: List[str],
+    repeat: int = DEFAULT_REPEAT,
+    skip_llm: bool = False,
+    output_dir: str = RESULTS_DIR,
+    mock_options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """执行基准测试并写出结果文件，返回文件路径；mock_options 透传给 MockOpenAIServer（延迟 / 429 / 格式错误注入）。"""
+    mock_options = mock_options or {}
+    report: Dict[str, Any] = {
+        'meta': {
+            **git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'mock_server': None if skip_llm else mock_options,
+        },
+        'results': {},
+    }
+    server = None
+    if not skip_llm:
+        from model.mock_server import MockOpenAIServer
+        server = MockOpenAIServer(**mock_options).start()
+    try:
+        for scale in scales:
+            print(f"Running scale {scale} ...")
+            report['results'][scale] = run_scale(scale, repeat, server.base_url if server is not None else None)
+            if server is not None:
+                report['results'][scale]['mock_server_stats'] = server.get_stats()
+            for name, stat in report['results'][scale]['benchmarks'].items():
+                print(f"  {name:<24} ops={stat['ops']:<8} best={stat['best_seconds']:.4f}s  {stat['us_per_op']:.1f} us/op")
+    finally:
+        if server is not None:
+            server.stop()
+
+    os.makedirs(output_dir, exist_ok=True)
+    commit = (report['meta']['commit'] or 'nogit')[:8]
+    output_path = os.path.join(output_dir, f"{time.strftime('%Y%m%d%H%M%S')}_{commit}.json")
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Results saved to {output_path}")
+    return output_path
+
+
+def compare_results(old_path: str, new_path: str, threshold: float = REGRESSION_THRESHOLD) -> bool:
+    """按 (规模, 基准) 对比两次结果的最佳耗时，打印倍数；存在超过 threshold 的退化时返回 False。"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"old: {old['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    ok = True
+    for scale, new_scale in new['results'].items():
+        old_scale = old['results'].get(scale)
+        if old_scale is None:
+            continue
+        for name, new_stat in new_scale['benchmarks'].items():
+            old_stat = old_scale['benchmarks'].get(name)
+            if old_stat is None:
+                continue
+            ratio = new_stat['best_seconds'] / old_stat['best_seconds'] if old_stat['best_seconds'] else float('inf')
+            flag = 'REGRESSION' if ratio > threshold else ''
+            ok = ok and ratio <= threshold
+            print(f"{scale:<8} {name:<24} {old_stat['best_seconds']:.4f}s -> {new_stat['best_seconds']:.4f}s  x{ratio:.2f} {flag}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Task4 benchmark suite')
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES, choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--skip-llm', action='store_true', help='skip stage 1 benchmarks against the mock server')
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    parser.add_argument('--mock-latency', default='fixed:0', help='latency distribution of the mock server, see model.mock_server.parse_latency')
+    parser.add_argument('--mock-rate-limit', type=float, default=0.0, help='probability of 429 responses')
+    parser.add_argument('--mock-malformed', type=float, default=0.0, help='probability of truncated JSON responses')
+    parser.add_argument('--mock-max-concurrency', type=int, default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(0 if compare_results(*args.compare, threshold=args.threshold) else 1)
+    mock_options = {
+        'latency': args.mock_latency,
+        'rate_limit_rate': args.mock_rate_limit,
+        'malformed_rate': args.mock_malformed,
+        'max_concurrency': args.mock_max_concurrency,
+    }
+    run_benchmarks(args.scales, repeat=args.repeat, skip_llm=args.skip_llm, output_dir=args.output_dir, mock_options=mock_options)
+
+
+if __name__ == '__main__':
+    main()
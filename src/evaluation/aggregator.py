@@ -0,0 +1,128 @@
+"""可合并的统计聚合：逐条累加 count / sum / sum of squares / min / max，可选直方图分位数，支持跨分片、跨进程合并"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+SKETCH_LOWER = 0.0  # 分位数直方图的取值范围，评分均落在 [0, 1]
+SKETCH_UPPER = 1.0
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class HistogramSketch:
+    """
+    等宽直方图近似分位数：桶边界固定，两个相同配置的 sketch 逐桶相加即可合并；
+    分位数误差不超过一个桶宽，超出 [lower, upper] 的值计入两端的桶。
+    """
+
+    def __init__(self, bins: int = 100, lower: float = SKETCH_LOWER, upper: float = SKETCH_UPPER):
+        self.bins = bins
+        self.lower = lower
+        self.upper = upper
+        self.counts = [0] * bins
+
+    def add(self, value: float) -> None:
+        idx = int((value - self.lower) / (self.upper - self.lower) * self.bins)
+        self.counts[min(max(idx, 0), self.bins - 1)] += 1
+
+    def merge(self, other: 'HistogramSketch') -> None:
+        if (self.bins, self.lower, self.upper) != (other.bins, other.lower, other.upper):
+            raise ValueError("Cannot merge histogram sketches with different bins or ranges.")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶内均匀分布线性插值。"""
+        total = sum(self.counts)
+        if total == 0:
+            return None
+        rank = q * total
+        width = (self.upper - self.lower) / self.bins
+        cumulative = 0
+        for idx, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                return self.lower + width * (idx + (rank - cumulative) / n)
+            cumulative += n
+        return self.upper
+
+
+class MetricStat:
+    """单项指标的可合并统计；sketch_bins 不为 None 时额外维护分位数直方图。"""
+
+    def __init__(self, sketch_bins: Optional[int] = None):
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = HistogramSketch(sketch_bins) if sketch_bins is not None else None
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.sumsq += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if self.sketch is not None:
+            self.sketch.add(value)
+
+    def merge(self, other: 'MetricStat') -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """总体标准差。"""
+        if not self.count:
+            return None
+        mean = self.sum / self.count
+        return math.sqrt(max(self.sumsq / self.count - mean * mean, 0.0))
+
+    def to_dict(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        stat = {
+            'count': self.count,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+        if self.sketch is not None:
+            stat['quantiles'] = {str(q): self.sketch.quantile(q) for q in quantiles}
+        return stat
+
+
+class MetricAggregator:
+    """一组指标的可合并统计：add() 吸收一条样本的 {指标名: 数值}，None 表示该样本缺少此项。"""
+
+    def __init__(self, metric_names: Iterable[str], sketch_bins: Optional[int] = None):
+        self.metric_names: List[str] = list(metric_names)
+        self.sketch_bins = sketch_bins
+        self.total_samples = 0
+        self.stats = {name: MetricStat(sketch_bins) for name in self.metric_names}
+
+    def add(self, values: Dict[str, Optional[float]]) -> None:
+        self.total_samples += 1
+        for name, value in values.items():
+            if value is not None:
+                self.stats[name].add(value)
+
+    def merge(self, other: 'MetricAggregator') -> None:
+        self.total_samples += other.total_samples
+        for name, stat in other.stats.items():
+            self.stats[name].merge(stat)
+
+    def mean(self, name: str) -> Optional[float]:
+        return self.stats[name].mean
+
+    def to_dict(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        return {
+            'total_samples': self.total_samples,
+            'metrics': {name: stat.to_dict(quantiles) for name, stat in self.stats.items()},
+        }
@@ -0,0 +1,139 @@
+"""地理划分的包含层级：县 ⊂ 市 ⊂ 片区 构成一棵树时，地理名称列表的并、交、补与 IoU 只在少量节点上计算，不必展开成站点"""
+
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NODE_SET_CACHE_SIZE = 65536  # geo_list -> 规范节点集合的 LRU 容量
+
+
+class GeoHierarchy:
+    """
+    由各地理名称的站点位图构建的包含树：
+    - 站点集合相同的名称共用一个节点，节点的父节点是严格包含它的最小节点；
+    - 任意两个节点的站点集合要么互不相交、要么一个包含另一个（laminar）时 is_laminar 为 True，
+      此时一个 geo_list 可表示为互不相交的极大节点集合（node_set），集合运算只需比较祖先关系；
+    - 不满足上述条件（如某个片区切分了某个市）时，geo_list 级别的查询自动退回位图计算，结果相同。
+    """
+
+    def __init__(self, geo_name_pos: Dict[str, int], geo_masks: np.ndarray):
+        self.geo_name_pos = geo_name_pos
+        self.geo_masks = geo_masks
+        self.total_size = int(geo_masks.shape[1])
+
+        # 站点集合相同的名称合并为同一节点
+        node_pos: Dict[bytes, int] = {}
+        node_rows: List[int] = []
+        self.name_node: Dict[str, int] = {}
+        for geo_name, row in geo_name_pos.items():
+            key = np.packbits(geo_masks[row]).tobytes()
+            if key not in node_pos:
+                node_pos[key] = len(node_rows)
+                node_rows.append(row)
+            self.name_node[geo_name] = node_pos[key]
+        node_masks = geo_masks[node_rows].astype(np.int64)
+        self.size: List[int] = node_masks.sum(axis=1).tolist()
+
+        # 两两重叠的站点数；laminar 要求重叠为 0 或等于较小一方的大小
+        overlap = node_masks @ node_masks.T
+        sizes = np.asarray(self.size, dtype=np.int64)
+        smaller = np.minimum(sizes[:, None], sizes[None, :])
+        self.is_laminar = bool(((overlap == 0) | (overlap == smaller)).all())
+
+        self.parent: List[Optional[int]] = [None] * len(self.size)
+        self.children: List[List[int]] = [[] for _ in self.size]
+        self.lineage: List[FrozenSet[int]] = [frozenset((node,)) for node in range(len(self.size))]
+        # 子节点恰好覆盖父节点（没有只属于父节点的站点）时，子节点齐全即可上卷为父节点
+        self.exact_cover: List[bool] = [False] * len(self.size)
+        if self.is_laminar:
+            for node, node_size in enumerate(self.size):
+                supersets = [other for other in np.flatnonzero(overlap[node] == node_size).tolist() if self.size[other] > node_size]
+                if supersets:
+                    parent = min(supersets, key=lambda other: self.size[other])
+                    self.parent[node] = parent
+                    self.children[parent].append(node)
+            for node in range(len(self.size)):
+                ancestors, parent = [node], self.parent[node]
+                while parent is not None:
+                    ancestors.append(parent)
+                    parent = self.parent[parent]
+                self.lineage[node] = frozenset(ancestors)
+                self.exact_cover[node] = bool(self.children[node]) and sum(self.size[child] for child in self.children[node]) == self.size[node]
+
+        self._node_set_cached = lru_cache(maxsize=NODE_SET_CACHE_SIZE)(self._node_set)
+
+    # ------------------------- 节点集合（仅 laminar 时可用） -------------------------
+    def node_set(self, geo_list: Sequence[str]) -> FrozenSet[int]:
+        """geo_list 的规范表示：互不相交的极大节点集合，子节点齐全时上卷为父节点；未知名称忽略。"""
+        if not self.is_laminar:
+            raise ValueError("Geo division is not laminar, node sets are unavailable.")
+        return self._node_set_cached(tuple(geo_list))
+
+    def _node_set(self, geo_list: Tuple[str, ...]) -> FrozenSet[int]:
+        nodes = {self.name_node[geo] for geo in geo_list if geo in self.name_node}
+        # 去掉被集合中其他节点包含的节点
+        nodes = {node for node in nodes if len(self.lineage[node] & nodes) == 1}
+        changed = True
+        while changed:
+            changed = False
+            for parent in {self.parent[node] for node in nodes} - {None}:
+                if self.exact_cover[parent] and nodes.issuperset(self.children[parent]):
+                    nodes.difference_update(self.children[parent])
+                    nodes.add(parent)
+                    changed = True
+        return frozenset(nodes)
+
+    def nodes_size(self, nodes: FrozenSet[int]) -> int:
+        return sum(self.size[node] for node in nodes)
+
+    def nodes_intersection_size(self, nodes_a: FrozenSet[int], nodes_b: FrozenSet[int]) -> int:
+        """两个节点集合的交集站点数：一侧节点被另一侧某节点包含（或相同）时计入其大小。"""
+        size = sum(self.size[node] for node in nodes_a if self.lineage[node] & nodes_b)
+        return size + sum(self.size[node] for node in nodes_b if node not in nodes_a and self.lineage[node] & nodes_a)
+
+    # ------------------------- geo_list 查询（非 laminar 时退回位图） -------------------------
+    def _mask(self, geo_list: Sequence[str]) -> np.ndarray:
+        rows = [self.geo_name_pos[geo] for geo in geo_list if geo in self.geo_name_pos]
+        if not rows:
+            return np.zeros(self.total_size, dtype=bool)
+        return np.logical_or.reduce(self.geo_masks[rows], axis=0)
+
+    def sizes(self, geo_list_a: Sequence[str], geo_list_b: Sequence[str]) -> Tuple[int, int, int]:
+        """返回 (|A|, |B|, |A ∩ B|)，A / B 为两个 geo_list 覆盖的站点集合。"""
+        if self.is_laminar:
+            nodes_a, nodes_b = self.node_set(geo_list_a), self.node_set(geo_list_b)
+            return self.nodes_size(nodes_a), self.nodes_size(nodes_b), self.nodes_intersection_size(nodes_a, nodes_b)
+        mask_a, mask_b = self._mask(geo_list_a), self._mask(geo_list_b)
+        return int(mask_a.sum()), int(mask_b.sum()), int((mask_a & mask_b).sum())
+
+    def geo_list_size(self, geo_list: Sequence[str]) -> int:
+        if self.is_laminar:
+            return self.nodes_size(self.node_set(geo_list))
+        return int(self._mask(geo_list).sum())
+
+    def contains(self, outer_geo_list: Sequence[str], inner_geo_list: Sequence[str]) -> bool:
+        """outer 覆盖的站点是否包含 inner 覆盖的全部站点。"""
+        _, inner_size, intersection = self.sizes(outer_geo_list, inner_geo_list)
+        return intersection == inner_size
+
+    def overlaps(self, geo_list_a: Sequence[str], geo_list_b: Sequence[str]) -> bool:
+        return self.sizes(geo_list_a, geo_list_b)[2] > 0
+
+    def covers_all(self, geo_list: Sequence[str]) -> bool:
+        """geo_list 是否覆盖全部站点（如"全省"）。"""
+        return self.geo_list_size(geo_list) == self.total_size
+
+    def iou(self, geo_list_a: Sequence[str], geo_list_b: Sequence[str]) -> float:
+        """与 set_iou 作用于两侧站点集合的结果一致。"""
+        size_a, size_b, intersection = self.sizes(geo_list_a, geo_list_b)
+        union = size_a + size_b - intersection
+        return intersection / union if union else 1.0
+
+    def complement_iou(self, geo_list_a: Sequence[str], geo_list_b: Sequence[str]) -> float:
+        """两个 geo_list 各自补集（全部站点中未覆盖的部分）之间的 IoU，与 set_iou 作用于两个补集的结果一致。"""
+        size_a, size_b, intersection = self.sizes(geo_list_a, geo_list_b)
+        # 补集的交 = 全集 - 并集，补集的并 = 全集 - 交集
+        complement_union = self.total_size - intersection
+        complement_intersection = self.total_size - (size_a + size_b - intersection)
+        return complement_intersection / complement_union if complement_union else 1.0
@@ -0,0 +1,118 @@
+"""地理划分索引：进程内只解析一次地理划分 CSV，供评估阶段反复查询"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from evaluation.geo_hierarchy import GeoHierarchy
+from util.data_process import GEO_DIVISION_PATH, get_geo_division
+
+STATION_ID_COLUMN = '站号+A:K'
+
+
+class GeoIndex:
+    """
+    地理划分 CSV 的内存索引：
+    - geo_stationid_map：地理名称 -> 站点 ID 列表（按 CSV 行序）；
+    - station_id_set：全部站点 ID；
+    - geo_dict_list：每个划分层级（列名）-> 该层级的地理名称列表；
+    - std_geo_list / std_geo_set：所有标准地理名称；
+    - station_ids / geo_masks：排序后的站点全集，以及每个名称在其上的布尔位图；
+    - hierarchy：名称之间的包含层级（GeoHierarchy），用于不展开站点的并 / 交 / 补与 IoU。
+    构建后的字段视为只读，调用方不要原地修改。
+    """
+
+    def __init__(self, geo_division_df: pd.DataFrame, path: Optional[str] = None, mtime: Optional[float] = None):
+        self.path = path
+        self.mtime = mtime
+
+        station_ids = geo_division_df[STATION_ID_COLUMN].tolist()
+        level_columns = list(geo_division_df.columns[1:])
+
+        # 按列收集名称 -> 行号，替代逐行 iterrows
+        geo_row_map: Dict[str, List[int]] = {}
+        for column in level_columns:
+            for row_idx, geo_name in enumerate(geo_division_df[column].tolist()):
+                if pd.notna(geo_name):
+                    geo_row_map.setdefault(geo_name, []).append(row_idx)
+        # 按行号稳定排序，保持与逐行遍历一致的站点顺序
+        self.geo_stationid_map: Dict[str, List[str]] = {
+            geo_name: [station_ids[row_idx] for row_idx in sorted(rows)]
+            for geo_name, rows in geo_row_map.items()
+        }
+        self.station_id_set: Set[str] = set(station_ids)
+        self.geo_dict_list: Dict[str, List[str]] = {
+            column: geo_division_df[column].dropna().unique().tolist() for column in level_columns
+        }
+        self.std_geo_list: List[str] = [name for names in self.geo_dict_list.values() for name in names]
+        self.std_geo_set: Set[str] = set(self.std_geo_list)
+
+        # 位图：geo_masks[i, j] 表示名称 i 是否覆盖 station_ids[j]
+        self.station_ids: List[str] = sorted(self.station_id_set)
+        station_pos = {station_id: pos for pos, station_id in enumerate(self.station_ids)}
+        self.geo_name_pos: Dict[str, int] = {geo_name: pos for pos, geo_name in enumerate(self.geo_stationid_map)}
+        self.geo_masks = np.zeros((len(self.geo_name_pos), len(self.station_ids)), dtype=bool)
+        for geo_name, ids in self.geo_stationid_map.items():
+            self.geo_masks[self.geo_name_pos[geo_name], [station_pos[station_id] for station_id in ids]] = True
+        self.hierarchy = GeoHierarchy(self.geo_name_pos, self.geo_masks)
+
+    @classmethod
+    def from_csv(cls, path: str = GEO_DIVISION_PATH) -> 'GeoIndex':
+        mtime = os.path.getmtime(path)
+        return cls(get_geo_division(path), path=path, mtime=mtime)
+
+    def geo_list_to_stationid(self, geo_list: List[str]) -> List[str]:
+        """将地理位置名称转换为排好序的站点 ID 列表"""
+        stationid_set = set()
+        for geo in geo_list:
+            if geo in self.geo_stationid_map:
+                stationid_set.update(self.geo_stationid_map[geo])
+        return sorted(stationid_set)
+
+    def geo_list_mask(self, geo_list: List[str]) -> np.ndarray:
+        """将地理位置列表转换为站点位图（各名称位图的按位或），未知名称忽略"""
+        rows = [self.geo_name_pos[geo] for geo in geo_list if geo in self.geo_name_pos]
+        if not rows:
+            return np.zeros(len(self.station_ids), dtype=bool)
+        return np.logical_or.reduce(self.geo_masks[rows], axis=0)
+
+    def geo_list_complement_stationid(self, geo_list: List[str]) -> List[str]:
+        """geo_list 未覆盖的站点 ID 列表（已排序），等价于 sorted(station_id_set - set(geo_list_to_stationid(geo_list)))"""
+        uncovered = np.flatnonzero(~self.geo_list_mask(geo_list))
+        return [self.station_ids[pos] for pos in uncovered]
+
+    def geo_list_list_mask(self, geo_list_list: List[List[str]]) -> np.ndarray:
+        """批量转换，返回形状为 (len(geo_list_list), 站点数) 的位图矩阵"""
+        masks = np.zeros((len(geo_list_list), len(self.station_ids)), dtype=bool)
+        for idx, geo_list in enumerate(geo_list_list):
+            masks[idx] = self.geo_list_mask(geo_list)
+        return masks
+
+
+# ------------------------- 进程级缓存 -------------------------
+_GEO_INDEX_CACHE: Dict[str, GeoIndex] = {}
+_GEO_INDEX_LOCK = threading.Lock()
+
+
+def get_geo_index(path: str = GEO_DIVISION_PATH) -> GeoIndex:
+    """获取进程内共享的 GeoIndex；CSV 的 mtime 变化时自动重建。"""
+    mtime = os.path.getmtime(path)
+    geo_index = _GEO_INDEX_CACHE.get(path)
+    if geo_index is not None and geo_index.mtime == mtime:
+        return geo_index
+    with _GEO_INDEX_LOCK:
+        # 双重检查，避免多线程同时重建
+        geo_index = _GEO_INDEX_CACHE.get(path)
+        if geo_index is None or geo_index.mtime != mtime:
+            geo_index = GeoIndex.from_csv(path)
+            _GEO_INDEX_CACHE[path] = geo_index
+    return geo_index
+
+
+def clear_geo_index_cache() -> None:
+    """清空缓存，下次调用 get_geo_index 时重新读取 CSV。"""
+    with _GEO_INDEX_LOCK:
+        _GEO_INDEX_CACHE.clear()
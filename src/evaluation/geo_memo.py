@@ -0,0 +1,77 @@
+"""地理名称标准化备忘录：跨样本、跨运行复用已确认的 原始名称 -> 标准名称 映射"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+GEO_ERROR_NAME = "地区错误"  # LLM 确认无法匹配时使用的标记
+# 备忘录持久化路径：为 None 时只在进程内复用；设为如 'result/cache/geo_standardize_memo.json' 时跨运行复用
+GEO_MEMO_PATH = None
+AUTOSAVE_EVERY = 50  # 每新增若干条映射自动落盘一次
+
+
+class GeoStandardizeMemo:
+    """
+    线程安全的标准化结果缓存：
+    - 只记录已确认的结果（标准名称或"地区错误"），"error_" 前缀的待定结果不会写入；
+    - path 不为 None 时从磁盘加载，并在新增条目后定期以 JSON 形式写回。
+    """
+
+    def __init__(self, path: Optional[str] = None, autosave_every: int = AUTOSAVE_EVERY):
+        self.path = path
+        self.autosave_every = autosave_every
+        self._memo: Dict[str, str] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as f:
+                self._memo = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._memo)
+
+    def get(self, geo: str) -> Optional[str]:
+        return self._memo.get(geo)
+
+    def lookup(self, geo_list: Iterable[str]) -> Dict[str, str]:
+        """返回 geo_list 中已有记录的 {原始名称: 标准名称}。"""
+        with self._lock:
+            return {geo: self._memo[geo] for geo in geo_list if geo in self._memo}
+
+    def update(self, geo_map: Dict[str, str]) -> None:
+        with self._lock:
+            for ori_geo, std_geo in geo_map.items():
+                if self._memo.get(ori_geo) != std_geo:
+                    self._memo[ori_geo] = std_geo
+                    self._unsaved += 1
+            if self.path is not None and self._unsaved >= self.autosave_every:
+                self._save_locked()
+
+    def save(self) -> None:
+        with self._lock:
+            if self.path is not None and self._unsaved > 0:
+                self._save_locked()
+
+    def _save_locked(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 先写临时文件再替换，避免中断时留下损坏的 JSON
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._memo, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+
+_GEO_MEMO: Optional[GeoStandardizeMemo] = None
+_GEO_MEMO_LOCK = threading.Lock()
+
+
+def get_geo_memo() -> GeoStandardizeMemo:
+    """获取进程内共享的标准化备忘录；GEO_MEMO_PATH 不为 None 时从该文件加载并写回。"""
+    global _GEO_MEMO
+    with _GEO_MEMO_LOCK:
+        if _GEO_MEMO is None:
+            _GEO_MEMO = GeoStandardizeMemo(GEO_MEMO_PATH)
+    return _GEO_MEMO
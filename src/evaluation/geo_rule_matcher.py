@@ -0,0 +1,172 @@
+"""地理名称规则匹配：在调用 LLM 之前用别名表、前后缀剥离与 n-gram 相似度解决大部分简单变体"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from evaluation.geo_index import GeoIndex, get_geo_index
+from util.profiler import PROFILER
+
+# 可选的别名表：{非标准名称: 标准名称}，文件不存在时只使用内置规则
+GEO_ALIAS_PATH = 'data/station_info/geo_alias.json'
+# 不改变地理范围的修饰性后缀 / 前缀（方位词如"北部""南部"会改变范围，交给 LLM 判断）
+GEO_NOISE_SUFFIXES = (
+    '地区', '区域', '一带', '境内', '全境', '各地', '等地', '附近',
+    '气象台', '气象站', '观测站',
+)
+# 含这些片段的名称只覆盖区域的一部分（"大部""部分地区"、方位词"北部""东南部"、"市区""沿海""山区"等），
+# 不能确定地映射到整个标准区域：只接受标准名称 / 别名本身（含剥离修饰后缀后），不参与简称与 n-gram 匹配
+GEO_PARTIAL_MARKERS = (
+    '部分', '大部', '半部',
+    '东部', '西部', '南部', '北部', '中部',
+    '东侧', '西侧', '南侧', '北侧',
+    '市区', '城区', '沿海', '沿江', '山区', '丘陵', '平原',
+)
+GEO_NOISE_PREFIXES = ('广东省', '广东')
+# 标准名称去掉行政区划后缀得到的简称（如"阳山县" -> "阳山"），简称唯一时才参与匹配
+ADMIN_SUFFIXES = ('自治县', '县', '市', '区')
+NGRAM_MIN_SCORE = 0.8   # n-gram（二元组 Dice 系数）匹配的最低相似度
+NGRAM_MIN_MARGIN = 0.1  # 最佳候选需领先第二候选的幅度，否则视为有歧义
+RULE_TIERS = ('exact', 'alias', 'affix', 'short_name', 'ngram')
+
+
+def char_bigrams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def strip_noise_affixes(geo: str) -> str:
+    """反复剥离修饰性前后缀，至少保留两个字符。"""
+    changed = True
+    while changed:
+        changed = False
+        for suffix in GEO_NOISE_SUFFIXES:
+            if geo.endswith(suffix) and len(geo) - len(suffix) >= 2:
+                geo = geo[:-len(suffix)]
+                changed = True
+                break
+        for prefix in GEO_NOISE_PREFIXES:
+            if geo.startswith(prefix) and len(geo) - len(prefix) >= 2:
+                geo = geo[len(prefix):]
+                changed = True
+                break
+    return geo
+
+
+def load_alias_table(path: str = GEO_ALIAS_PATH) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class GeoRuleMatcher:
+    """
+    确定性的地理名称匹配，标准名称本身直接返回（exact），其余依次尝试（含 GEO_PARTIAL_MARKERS 的部分范围名称只到第 2 层）：
+    1. alias：别名表精确命中；
+    2. affix：剥离修饰性前后缀后命中标准名称或别名；
+    3. short_name：命中标准名称的唯一简称；
+    4. ngram：与标准名称的二元组 Dice 相似度不低于 min_score，且领先第二候选 min_margin 以上。
+    都未命中返回 None（交给 LLM）；stats 记录各层命中次数。
+    """
+
+    def __init__(
+        self,
+        std_geo_list: Iterable[str],
+        alias_table: Optional[Dict[str, str]] = None,
+        min_score: float = NGRAM_MIN_SCORE,
+        min_margin: float = NGRAM_MIN_MARGIN,
+    ):
+        self.std_geo_set: Set[str] = set(std_geo_list)
+        self.min_score = min_score
+        self.min_margin = min_margin
+        # 指向非标准名称的别名没有意义，直接丢弃
+        self.alias_table = {alias: std_geo for alias, std_geo in (alias_table or {}).items() if std_geo in self.std_geo_set}
+
+        short_candidates: Dict[str, Set[str]] = defaultdict(set)
+        for std_geo in self.std_geo_set:
+            for suffix in ADMIN_SUFFIXES:
+                if std_geo.endswith(suffix) and len(std_geo) - len(suffix) >= 2:
+                    short_candidates[std_geo[:-len(suffix)]].add(std_geo)
+                    break
+        self.short_names = {
+            short: next(iter(std_geos)) for short, std_geos in short_candidates.items()
+            if len(std_geos) == 1 and short not in self.std_geo_set
+        }
+
+        # 二元组倒排索引：只对共享至少一个二元组的标准名称计算相似度
+        self._bigrams = {std_geo: char_bigrams(std_geo) for std_geo in self.std_geo_set}
+        self._bigram_index: Dict[str, List[str]] = defaultdict(list)
+        for std_geo, bigrams in self._bigrams.items():
+            for bigram in bigrams:
+                self._bigram_index[bigram].append(std_geo)
+
+        self.stats = {tier: 0 for tier in RULE_TIERS + ('miss',)}
+        self._lock = threading.Lock()
+
+    def match(self, geo: str) -> Optional[str]:
+        """返回规则匹配到的标准名称，无法确定时返回 None。"""
+        std_geo, tier = self.match_with_tier(geo)
+        with self._lock:
+            self.stats[tier] += 1
+        PROFILER.count(f'geo_rule.{tier}')
+        return std_geo
+
+    def match_with_tier(self, geo: str) -> Tuple[Optional[str], str]:
+        geo = geo.strip()
+        if geo in self.std_geo_set:
+            return geo, 'exact'
+        if geo in self.alias_table:
+            return self.alias_table[geo], 'alias'
+        stripped = strip_noise_affixes(geo)
+        if stripped != geo:
+            # 修饰后缀中不含部分范围词，剥离后仍精确命中的标准名称 / 别名与原名称范围相同
+            if stripped in self.std_geo_set:
+                return stripped, 'affix'
+            if stripped in self.alias_table:
+                return self.alias_table[stripped], 'affix'
+        if any(marker in stripped for marker in GEO_PARTIAL_MARKERS):
+            return None, 'miss'
+        if stripped in self.short_names:
+            return self.short_names[stripped], 'short_name'
+        std_geo = self.ngram_match(stripped)
+        if std_geo is not None:
+            return std_geo, 'ngram'
+        return None, 'miss'
+
+    def ngram_match(self, geo: str) -> Optional[str]:
+        query = char_bigrams(geo)
+        if not query:
+            return None
+        candidates = {std_geo for bigram in query for std_geo in self._bigram_index.get(bigram, ())}
+        scored = sorted(
+            ((2 * len(query & self._bigrams[std_geo]) / (len(query) + len(self._bigrams[std_geo])), std_geo) for std_geo in candidates),
+            reverse=True,
+        )
+        if not scored or scored[0][0] < self.min_score:
+            return None
+        # 与第二候选过于接近（包括并列）时视为有歧义
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < self.min_margin:
+            return None
+        return scored[0][1]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+_GEO_RULE_MATCHER: Optional[GeoRuleMatcher] = None
+_GEO_RULE_MATCHER_INDEX: Optional[GeoIndex] = None
+_GEO_RULE_MATCHER_LOCK = threading.Lock()
+
+
+def get_geo_rule_matcher() -> GeoRuleMatcher:
+    """获取进程内共享的规则匹配器；地理划分 CSV 重新加载后随之重建。"""
+    global _GEO_RULE_MATCHER, _GEO_RULE_MATCHER_INDEX
+    geo_index = get_geo_index()
+    with _GEO_RULE_MATCHER_LOCK:
+        if _GEO_RULE_MATCHER is None or _GEO_RULE_MATCHER_INDEX is not geo_index:
+            _GEO_RULE_MATCHER = GeoRuleMatcher(geo_index.std_geo_list, load_alias_table())
+            _GEO_RULE_MATCHER_INDEX = geo_index
+    return _GEO_RULE_MATCHER
@@ -0,0 +1,152 @@
+"""标准答案存储：首次使用时才加载，可借助磁盘上的 qid 索引按需读取单条标注"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from util.data_process import dumps_json_line, iter_records, load_records, loads_json
+
+INDEX_SUFFIX = '.qidx'  # 索引文件后缀：<label>.qidx.jsonl 存逐行标注，<label>.qidx.json 存 qid -> 偏移
+# 索引默认写入的缓存目录，不在标注数据目录下生成文件；为 None 时放在标注文件旁
+DEFAULT_INDEX_DIR = 'result/cache/label_index'
+
+
+class LabelStore:
+    """
+    {qid: 标准答案条目} 的惰性存储：
+    - use_index=False：首次访问时整体解析标注 JSON，行为与 get_label_dict 相同；
+    - use_index=True：首次访问时构建（或复用）磁盘索引，之后每个 qid 只读取自己那一行，
+      内存中只保留实际被访问过的标注。
+    标注文件的 mtime / size 变化后索引自动重建。
+    derived() 可为每个 qid 缓存由标注派生的中间结果（如站点集合），整个运行期间只计算一次。
+    使用完毕后调用 close()（或以 with 语句使用）关闭索引文件句柄。
+    """
+
+    def __init__(self, label_path: str, use_index: bool = True, index_dir: Optional[str] = DEFAULT_INDEX_DIR):
+        self.label_path = label_path
+        self.use_index = use_index
+        self.index_dir = index_dir
+        self._labels: Dict[str, Any] = {}
+        self._derived: Dict[Tuple[str, str], Any] = {}
+        self._offsets: Optional[Dict[str, list]] = None
+        self._fd: Optional[int] = None
+        self._fully_loaded = False
+        self._lock = threading.Lock()
+
+    # 进程池会 pickle 该对象：只传路径等配置，文件句柄与缓存在子进程中重新建立
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'label_path': self.label_path, 'use_index': self.use_index, 'index_dir': self.index_dir}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    @property
+    def _index_base(self) -> str:
+        if self.index_dir is None:
+            return self.label_path + INDEX_SUFFIX
+        # 缓存目录中以标注文件绝对路径的哈希区分同名文件
+        path_digest = hashlib.sha1(os.path.abspath(self.label_path).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.index_dir, f"{os.path.basename(self.label_path)}.{path_digest}{INDEX_SUFFIX}")
+
+    def __enter__(self) -> 'LabelStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭索引文件句柄；已读取的标注与派生结果保留，之后再次访问未读取的 qid 会重新打开索引。"""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+                self._offsets = None
+
+    def __getitem__(self, qid: str) -> Dict[str, Any]:
+        return self.get(qid)
+
+    def __contains__(self, qid: str) -> bool:
+        try:
+            self.get(qid)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, qid: str) -> Dict[str, Any]:
+        label = self._labels.get(qid)
+        if label is not None:
+            return label
+        with self._lock:
+            if not self.use_index:
+                if not self._fully_loaded:
+                    self._labels = {item['qid']: item for item in load_records(self.label_path)}
+                    self._fully_loaded = True
+                return self._labels[qid]
+            self._ensure_index_locked()
+            offset, length = self._offsets[qid]
+            # pread 不依赖共享的文件偏移，fork 出的子进程同时读取也不会互相干扰
+            label = loads_json(os.pread(self._fd, length, offset))
+            self._labels[qid] = label
+            return label
+
+    def derived(self, qid: str, name: str, factory: Callable[[Dict[str, Any]], Any]) -> Any:
+        """返回 factory(标注条目) 的缓存结果，同一 (qid, name) 只计算一次。"""
+        key = (qid, name)
+        value = self._derived.get(key)
+        if value is None:
+            value = factory(self.get(qid))
+            self._derived[key] = value
+        return value
+
+    def extracted_info(self, qid: str) -> Dict[str, Any]:
+        return self.get(qid)['extracted_info']
+
+    def csv_data_path(self, qid: str) -> str:
+        return self.get(qid)['input']['csv_data_path']
+
+    def ensure_index(self) -> None:
+        """提前构建索引（例如在创建进程池之前），避免多个子进程重复构建。"""
+        if self.use_index:
+            with self._lock:
+                self._ensure_index_locked()
+
+    def _ensure_index_locked(self) -> None:
+        if self._offsets is not None:
+            return
+        stat = os.stat(self.label_path)
+        source = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        lines_path = self._index_base + '.jsonl'
+        meta_path = self._index_base + '.json'
+
+        meta = None
+        if os.path.exists(meta_path) and os.path.exists(lines_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('source') != source:
+                meta = None
+        if meta is None:
+            meta = self._build_index(lines_path, meta_path, source)
+
+        self._offsets = meta['offsets']
+        self._fd = os.open(lines_path, os.O_RDONLY)
+
+    def _build_index(self, lines_path: str, meta_path: str, source: Dict[str, Any]) -> Dict[str, Any]:
+        """流式读取标注文件，逐条写成 JSONL，同时记录每个 qid 的字节偏移与长度。"""
+        if os.path.dirname(lines_path):
+            os.makedirs(os.path.dirname(lines_path), exist_ok=True)
+        offsets: Dict[str, list] = {}
+        tmp_lines_path = f"{lines_path}.{os.getpid()}.tmp"
+        with open(tmp_lines_path, 'wb') as f:
+            for item in iter_records(self.label_path):
+                line = dumps_json_line(item)
+                offsets[item['qid']] = [f.tell(), len(line)]
+                f.write(line)
+        meta = {'source': source, 'offsets': offsets}
+        tmp_meta_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta_path, 'w') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_lines_path, lines_path)
+        os.replace(tmp_meta_path, meta_path)
+        return meta
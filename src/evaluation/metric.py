@@ -1,8 +1,12 @@
 import math
+import sys
 
-from typing import Any, Dict, List, Tuple
+import numpy as np
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from scipy.optimize import linear_sum_assignment
-from evaluation.util import geo_list_to_stationid
+from evaluation.geo_index import get_geo_index
+from util.profiler import PROFILER
 
 
 def round_half_up(x: float) -> int:
@@ -20,14 +24,31 @@ def set_iou(pred_set: set, label_set: set) -> float:
     return intersection / union
 
 
-def geo_list_iou(pred_geo_list: List[str], label_geo_list: List[str]) -> float:
-    """计算两个地理位置列表的 IOU"""
-    pred_station_ids = geo_list_to_stationid(pred_geo_list)
-    label_station_ids = geo_list_to_stationid(label_geo_list)
-    iou = set_iou(set(pred_station_ids), set(label_station_ids))
+def mask_iou_matrix(pred_masks: np.ndarray, label_masks: np.ndarray) -> np.ndarray:
+    """由两组站点位图一次性计算 IoU 矩阵，语义与逐对 set_iou 一致"""
+    pred_counts = pred_masks.sum(axis=1, dtype=np.int64)
+    label_counts = label_masks.sum(axis=1, dtype=np.int64)
+    # 交集大小即两组位图的内积，并集由容斥得到
+    intersection = pred_masks.astype(np.int64) @ label_masks.T.astype(np.int64)
+    union = pred_counts[:, None] + label_counts[None, :] - intersection
+    iou = np.ones(intersection.shape, dtype=np.float64)
+    np.divide(intersection, union, out=iou, where=union > 0)
     return iou
 
 
+def geo_list_iou(pred_geo_list: List[str], label_geo_list: List[str]) -> float:
+    """计算两个地理位置列表的 IOU；单对查询经层级节点计算，地理划分不是严格层级时退回位图"""
+    return get_geo_index().hierarchy.iou(pred_geo_list, label_geo_list)
+
+
+def geo_list_iou_matrix(pred_geo_list_list: List[List[str]], label_geo_list_list: List[List[str]]) -> np.ndarray:
+    """计算预测与标注两组地理位置列表两两之间的 IoU 矩阵（位图内积，一次矩阵运算得到全部结果）"""
+    geo_index = get_geo_index()
+    pred_masks = geo_index.geo_list_list_mask(pred_geo_list_list)
+    label_masks = geo_index.geo_list_list_mask(label_geo_list_list)
+    return mask_iou_matrix(pred_masks, label_masks)
+
+
 def number_precise_scoring(predicted: float, actual: float) -> float:
     """根据预测值和实际值的差距，返回精度评分"""
     if predicted is None or actual is None:
@@ -73,6 +94,121 @@ def number_range_scoring(predicted_range: Tuple, actual_range: Tuple) -> float:
     return (lower_score + upper_score) / 2
 
 
+############# 向量化版本：对整列 (预测, 实际) 一次打分，结果与上面的标量函数逐位一致
+
+def to_float_array(values: Iterable[Optional[float]]) -> np.ndarray:
+    """将可能含 None 的数值序列转为 float64 数组，None 记为 NaN。"""
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def round_half_up_array(x: np.ndarray) -> np.ndarray:
+    """round_half_up 的数组版本，NaN 原样保留。"""
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return np.where(x >= 0, np.floor(x + 0.5), np.ceil(x - 0.5))
+
+
+def number_precise_scoring_array(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """number_precise_scoring 的数组版本；任一侧为 NaN（即 None）时得 0 分。"""
+    diff = np.abs(np.asarray(actual, dtype=np.float64) - np.asarray(predicted, dtype=np.float64))
+    # NaN 与任何阈值比较都为 False，自然落入 0 分
+    return np.select([diff < 0.09, diff < 0.5, diff < 1.0], [1.0, 0.5, 0.1], default=0.0)
+
+
+def number_round_scoring_array(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """number_round_scoring 的数组版本；任一侧为 NaN（即 None）时得 0 分。"""
+    diff = np.abs(round_half_up_array(actual) - round_half_up_array(predicted))
+    return np.select([diff == 0, diff == 1, diff == 2], [1.0, 0.5, 0.1], default=0.0)
+
+
+def number_range_scoring_array(
+    predicted_lower: np.ndarray,
+    predicted_upper: np.ndarray,
+    actual_lower: np.ndarray,
+    actual_upper: np.ndarray,
+) -> np.ndarray:
+    """number_range_scoring 的数组版本，上下界分别按列传入。"""
+    lower_score = number_round_scoring_array(actual_lower, predicted_lower)
+    upper_score = number_round_scoring_array(actual_upper, predicted_upper)
+    return (lower_score + upper_score) / 2
+
+
+############# 向量化版本：对多组温度一次完成离群值过滤，结果与逐组调用标量函数逐位一致
+
+def _builtin_sum_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    逐行求和，且与内置 sum() 对同一列表的结果逐位一致（按列循环、按行向量化）。
+    np.sum 使用成对求和，结果可能差最后一位，因此这里复刻 sum() 的累加顺序：
+    3.12 之前为顺序累加，3.12 起为 Neumaier 补偿求和。末尾补 0.0 不影响结果。
+    """
+    n_rows, n_cols = matrix.shape
+    total = matrix[:, 0].copy() if n_cols else np.zeros(n_rows)
+    if sys.version_info < (3, 12):
+        for j in range(1, n_cols):
+            total += matrix[:, j]
+        return total
+    compensation = np.zeros(n_rows)
+    for j in range(1, n_cols):
+        x = matrix[:, j]
+        t = total + x
+        compensation += np.where(np.abs(total) >= np.abs(x), (total - t) + x, (x - t) + total)
+        total = t
+    apply = (compensation != 0) & np.isfinite(compensation)
+    total[apply] += compensation[apply]
+    return total
+
+
+def _pad_groups(values: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """将按 lengths 首尾相接的扁平数组展开为补零的 (组数, 最大组长) 矩阵。"""
+    group_ids = np.repeat(np.arange(lengths.size), lengths)
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(values.size) - np.repeat(starts, lengths)
+    matrix = np.zeros((lengths.size, int(lengths.max(initial=0))), dtype=np.float64)
+    matrix[group_ids, positions] = values
+    return matrix, group_ids, positions
+
+
+def remove_outliers_mask(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    对多组温度一次性执行均值 ± 2σ 离群值过滤，返回与 values 对齐的保留掩码。
+    values 为各组首尾相接的扁平数组，lengths 为每组长度（允许为 0）；
+    每组的结果与 stage_2_scoring.remove_outliers 逐位一致。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if values.size == 0:
+        return np.zeros(0, dtype=bool)
+    matrix, group_ids, positions = _pad_groups(values, lengths)
+    counts = np.maximum(lengths, 1)
+    mean = _builtin_sum_rows(matrix) / counts
+    deviation = np.zeros_like(matrix)
+    deviation[group_ids, positions] = (values - mean[group_ids]) ** 2
+    # 与标量版一致：x ** 0.5 走 pow 而非 sqrt
+    std_dev = np.power(_builtin_sum_rows(deviation) / counts, 0.5)
+    return np.abs(values - mean[group_ids]) <= 2 * std_dev[group_ids]
+
+
+def grouped_min_max_without_outliers(values: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    各组去除离群值后的 (最小值, 最大值)，与 get_actual_temp_lower_upper 对应；
+    空组（或全部被过滤）返回 NaN。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    keep = remove_outliers_mask(values, lengths)
+    group_ids = np.repeat(np.arange(lengths.size), lengths)[keep]
+    kept = values[keep]
+    lower = np.full(lengths.size, np.inf)
+    upper = np.full(lengths.size, -np.inf)
+    np.minimum.at(lower, group_ids, kept)
+    np.maximum.at(upper, group_ids, kept)
+    empty = np.bincount(group_ids, minlength=lengths.size) == 0
+    lower[empty] = np.nan
+    upper[empty] = np.nan
+    return lower, upper
+
+
+@PROFILER.timed('metric.geo_list_match_and_iou')
 def geo_list_match_and_iou(pred_geo_list_list: List[List[str]], label_geo_list_list: List[List[str]]) -> Dict[str, Any]:
     """使用匈牙利算法为 geo_list_list 配对并统计 IoU"""
     pred_geo_list_list = pred_geo_list_list or []
@@ -86,18 +222,14 @@ def geo_list_match_and_iou(pred_geo_list_list: List[List[str]], label_geo_list_l
             'avg_iou': 1.0,
         }
 
-    # 构建预测/标注之间的 IoU 矩阵，后续供匈牙利算法挑选最佳配对
-    iou_matrix: List[List[float]] = []
-    for pred_geo_list in pred_geo_list_list:
-        row = []
-        for label_geo_list in label_geo_list_list:
-            row.append(geo_list_iou(pred_geo_list, label_geo_list))
-        iou_matrix.append(row)
+    # 基于站点位图一次性构建预测/标注之间的 IoU 矩阵，后续供匈牙利算法挑选最佳配对
+    iou_matrix = geo_list_iou_matrix(pred_geo_list_list, label_geo_list_list)
 
     # 线性和分配默认求最小值，取 cost=1-IoU 即可将最大 IoU 转化为最小 cost
-    cost_matrix = [[1.0 - iou for iou in row] for row in iou_matrix]
-    if cost_matrix and label_count > 0:
-        row_ind, col_ind = linear_sum_assignment(cost_matrix)
+    cost_matrix = 1.0 - iou_matrix
+    if pred_count > 0 and label_count > 0:
+        with PROFILER.timer('metric.hungarian'):
+            row_ind, col_ind = linear_sum_assignment(cost_matrix)
         assignment_map = {r: c for r, c in zip(row_ind, col_ind)}
     else:
         assignment_map = {}
@@ -118,7 +250,7 @@ def geo_list_match_and_iou(pred_geo_list_list: List[List[str]], label_geo_list_l
         matched_pairs.append({
             'prediction_index': pred_idx,
             'label_index': int(label_idx),
-            'iou': iou_matrix[pred_idx][label_idx],
+            'iou': float(iou_matrix[pred_idx, label_idx]),
         })
 
     total_pairs = max(pred_count, label_count)
@@ -0,0 +1,204 @@
+"""观测数据存储：每个 tmax CSV 只解析一次，按站点 ID 向量化取值"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from util.profiler import PROFILER
+
+DEFAULT_MAX_RESIDENT_DAYS = 64  # 内存中最多同时保留的观测文件（天）数
+DEFAULT_TEMP_RANGE_MEMO_SIZE = 200_000  # 温度区间备忘录最多保留的 (观测文件, 站点集合) 条目数
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """计算文件内容的 sha1，用作缓存键。"""
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+_FILE_HASH_MEMO: Dict[Tuple[str, float, int], str] = {}
+_FILE_HASH_LOCK = threading.Lock()
+
+
+def cached_file_hash(path: str) -> str:
+    """file_hash 的进程内缓存版本，以 (路径, mtime, size) 为键，文件变化后重新计算。"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+    with _FILE_HASH_LOCK:
+        digest = _FILE_HASH_MEMO.get(key)
+    if digest is None:
+        digest = file_hash(path)
+        with _FILE_HASH_LOCK:
+            _FILE_HASH_MEMO[key] = digest
+    return digest
+
+
+class DayObservation:
+    """单个观测文件的列式表示：station_ids 升序排列，tmax 与之按位置对齐；file_hash 仅在落盘缓存时计算，否则为 None。"""
+
+    def __init__(self, station_ids: np.ndarray, tmax: np.ndarray, file_hash: Optional[str] = None):
+        self.station_ids = station_ids
+        self.tmax = tmax
+        self.file_hash = file_hash
+
+    @classmethod
+    def from_csv(cls, csv_path: str, csv_hash: Optional[str] = None) -> 'DayObservation':
+        df = pd.read_csv(csv_path)
+        # stationid 统一转为 str，与地理划分中的站点 ID 对齐
+        df['stationid'] = df['stationid'].astype(str)
+        # 同一站点出现多次时只保留第一条，与逐行筛选取 values[0] 的行为一致
+        df = df.loc[~df['stationid'].duplicated(keep='first')]
+        df = df.sort_values('stationid', kind='stable')
+        station_ids = df['stationid'].to_numpy(dtype=str)
+        tmax = df['tmax'].to_numpy(dtype=np.float64)
+        return cls(station_ids, tmax, csv_hash)
+
+    def gather_tmax(self, station_id_list: Iterable[str]) -> Tuple[List[float], List[str]]:
+        """按输入顺序取出各站点的 tmax，返回 (温度列表, 未找到的站点 ID 列表)。"""
+        query = np.asarray(list(station_id_list), dtype=str)
+        if query.size == 0 or self.station_ids.size == 0:
+            return [], query.tolist()
+        pos = np.searchsorted(self.station_ids, query)
+        pos_clipped = np.minimum(pos, self.station_ids.size - 1)
+        found = self.station_ids[pos_clipped] == query
+        temp_list = self.tmax[pos_clipped[found]].tolist()
+        missing = query[~found].tolist()
+        return temp_list, missing
+
+
+class ObservationStore:
+    """
+    tmax 观测文件的进程内缓存：
+    - 每个 CSV 首次访问时解析为 DayObservation，之后直接复用；条目记录文件的 (mtime, size)，
+      文件被替换或修改后下次访问会重新加载；
+    - 指定 cache_dir 时按文件哈希把列数据落盘为 .npy，再次运行以 mmap 方式加载；
+    - 常驻内存的文件数受 max_resident_days 约束，按 LRU 淘汰。
+    """
+
+    def __init__(self, csv_folder: str, cache_dir: Optional[str] = None, max_resident_days: int = DEFAULT_MAX_RESIDENT_DAYS):
+        self.csv_folder = csv_folder
+        self.cache_dir = cache_dir
+        self.max_resident_days = max_resident_days
+        self._days: 'OrderedDict[str, Tuple[Tuple[float, int], DayObservation]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, csv_data_path: str) -> DayObservation:
+        """获取 csv_data_path（相对 csv_folder）对应的观测数据。"""
+        csv_path = os.path.join(self.csv_folder, csv_data_path)
+        stat = os.stat(csv_path)
+        signature = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            entry = self._days.get(csv_data_path)
+            if entry is not None and entry[0] == signature:
+                self._days.move_to_end(csv_data_path)
+                PROFILER.count('observation_store.hit')
+                return entry[1]
+
+        PROFILER.count('observation_store.miss')
+        with PROFILER.timer('observation_store.load'):
+            day = self._load(csv_path)
+
+        with self._lock:
+            self._days[csv_data_path] = (signature, day)
+            self._days.move_to_end(csv_data_path)
+            while len(self._days) > self.max_resident_days:
+                self._days.popitem(last=False)
+        return day
+
+    def csv_hash(self, csv_data_path: str) -> str:
+        """观测文件内容的 sha1，无需解析 CSV。"""
+        return cached_file_hash(os.path.join(self.csv_folder, csv_data_path))
+
+    def memo_key(self, csv_data_path: str) -> Union[str, Tuple[str, float, int]]:
+        """
+        温度区间备忘录中标识观测文件的键：指定 cache_dir 时为内容 sha1（与落盘缓存一致），
+        否则为 (路径, mtime, size)，与 get() 判断文件变化的依据相同，不必读取文件内容。
+        """
+        if self.cache_dir is not None:
+            return self.csv_hash(csv_data_path)
+        stat = os.stat(os.path.join(self.csv_folder, csv_data_path))
+        return csv_data_path, stat.st_mtime, stat.st_size
+
+    def gather_tmax(self, csv_data_path: str, station_id_list: Iterable[str]) -> Tuple[List[float], List[str]]:
+        return self.get(csv_data_path).gather_tmax(station_id_list)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._days.clear()
+
+    def _load(self, csv_path: str) -> DayObservation:
+        # 只有落盘缓存需要以内容哈希命名，纯内存模式不必为此多读一遍文件
+        if self.cache_dir is None:
+            return DayObservation.from_csv(csv_path)
+
+        csv_hash = cached_file_hash(csv_path)
+        station_path = os.path.join(self.cache_dir, f"{csv_hash}_stationid.npy")
+        tmax_path = os.path.join(self.cache_dir, f"{csv_hash}_tmax.npy")
+        if os.path.exists(station_path) and os.path.exists(tmax_path):
+            return DayObservation(
+                np.load(station_path, mmap_mode='r'),
+                np.load(tmax_path, mmap_mode='r'),
+                csv_hash,
+            )
+
+        day = DayObservation.from_csv(csv_path, csv_hash)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 先写临时文件再改名，避免并发/中断留下半个缓存文件
+        for path, array in ((station_path, day.station_ids), (tmax_path, day.tmax)):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        return day
+
+
+def station_set_fingerprint(sorted_station_ids: List[str]) -> str:
+    """站点集合的规范指纹：对排序后的站点 ID 计算 sha1，与集合的来源（标准名称、补集等）无关。"""
+    return hashlib.sha1('\n'.join(sorted_station_ids).encode('utf-8')).hexdigest()
+
+
+class TempRangeMemo:
+    """
+    {(观测文件键, 站点集合指纹): (去除离群值后的最低温, 最高温, 未找到的站点 ID)} 的进程内备忘录，按 LRU 淘汰；
+    观测文件键由 ObservationStore.memo_key 给出。
+    同一天同一站点集合（如同一个标准名称、同样的"其余地区"补集）在不同样本、不同模型之间只计算一次。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_TEMP_RANGE_MEMO_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[Hashable, str], Tuple[Optional[float], Optional[float], Tuple[str, ...]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[Hashable, str]) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Tuple[Hashable, str]) -> Optional[Tuple[Optional[float], Optional[float], Tuple[str, ...]]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        PROFILER.count('temp_range_memo.hit' if value is not None else 'temp_range_memo.miss')
+        return value
+
+    def set(self, key: Tuple[Hashable, str], value: Tuple[Optional[float], Optional[float], Tuple[str, ...]]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,120 @@
+"""评分结果的持久化缓存：按样本指纹复用 accuracy_score，重复评分时只计算发生变化的样本"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def make_score_fingerprint(
+    qid: str,
+    extracted_info: Dict[str, Any],
+    label_version: str,
+    observation_hash: str,
+    geo_division_hash: str,
+    scorer_version: int,
+) -> str:
+    """
+    评分指纹：影响 accuracy_score 的全部输入。
+    extracted_info 以 sort_keys 规范化，键顺序不同但内容相同的结果视为同一样本。
+    """
+    payload = json.dumps(
+        {
+            'qid': qid,
+            'extracted_info': extracted_info,
+            'label_version': label_version,
+            'observation_hash': observation_hash,
+            'geo_division_hash': geo_division_hash,
+            'scorer_version': scorer_version,
+        },
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def label_version(label: Dict[str, Any]) -> str:
+    """单条标注内容的哈希，标注被修改后对应样本的缓存自动失效。"""
+    payload = json.dumps(label, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ScoreCache:
+    """
+    基于 SQLite 的 {指纹: accuracy_score JSON} 缓存，线程安全；
+    记录 hits / misses / writes 计数，stats() 输出命中率报告。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.counters = {'hits': 0, 'misses': 0, 'writes': 0}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            'fingerprint TEXT PRIMARY KEY, qid TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([fingerprint])[0]
+
+    def get_many(self, fingerprints: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """批量查询，未命中的位置返回 None，顺序与输入一致。"""
+        if not fingerprints:
+            return []
+        found: Dict[str, str] = {}
+        with self._lock:
+            # 分段查询，避免超出 SQLite 的参数个数上限
+            unique = list(dict.fromkeys(fingerprints))
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ','.join('?' * len(part))
+                found.update(self._conn.execute(
+                    f'SELECT fingerprint, value FROM scores WHERE fingerprint IN ({placeholders})', part
+                ).fetchall())
+            hits = sum(1 for fingerprint in fingerprints if fingerprint in found)
+            self.counters['hits'] += hits
+            self.counters['misses'] += len(fingerprints) - hits
+        return [json.loads(found[fingerprint]) if fingerprint in found else None for fingerprint in fingerprints]
+
+    def set(self, fingerprint: str, qid: str, accuracy_score: Dict[str, Any]) -> None:
+        self.set_many([(fingerprint, qid, accuracy_score)])
+
+    def set_many(self, items: Iterable[tuple]) -> None:
+        """批量写入 (指纹, qid, accuracy_score)，一次事务提交。"""
+        now = time.time()
+        rows = [(fingerprint, qid, json.dumps(score, ensure_ascii=False), now) for fingerprint, qid, score in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO scores (fingerprint, qid, value, created_at) VALUES (?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
+            self.counters['writes'] += len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM scores')
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        counters.update({
+            'entries': entries,
+            'hit_rate': counters['hits'] / lookups if lookups else None,
+        })
+        return counters
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,145 @@
+"""Task4 多模型排行榜：共享标注、地理索引与观测缓存，一次运行为目录下所有模型评分并输出对比表"""
+
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# 允许脚本在直接运行时也能加载 src 下的模块
+sys.path.append('src')
+
+from evaluation.observation_store import ObservationStore
+from evaluation.score_cache import ScoreCache
+from evaluation.task4 import stage_2_scoring
+from util.data_process import path_preprocess, save_json
+from util.profiler import PROFILER, profile_report_path
+
+# ------------------------- 默认路径配置 -------------------------
+# 每个模型一个子目录：<RESULT_DIR>/<模型名>/<INPUT_FILE_NAME>
+RESULT_DIR = "/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4"
+INPUT_FILE_NAME = "task4_info_extract_geo_standardize.json"
+OUTPUT_FILE_NAME = "task4_scoring.json"
+LEADERBOARD_OUTPUT_PATH = os.path.join(RESULT_DIR, "leaderboard.csv")
+# 多个模型会反复访问同一批观测文件，排行榜运行时让它们全部常驻内存（一年约 366 个文件）
+LEADERBOARD_RESIDENT_DAYS = 400
+
+
+def discover_model_outputs(result_dir: str = RESULT_DIR, input_file_name: str = INPUT_FILE_NAME) -> Dict[str, str]:
+    """查找 result_dir 下包含阶段 1-2 输出的模型子目录，返回 {模型名: 输入路径}（按模型名排序）。"""
+    model_outputs: Dict[str, str] = {}
+    for model_name in sorted(os.listdir(result_dir)):
+        input_path = os.path.join(result_dir, model_name, input_file_name)
+        if os.path.isfile(input_path):
+            model_outputs[model_name] = input_path
+    return model_outputs
+
+
+def summary_to_row(model_name: str, summary_result: Dict[str, Any]) -> Dict[str, Any]:
+    """把 summary 的嵌套结构展平为对比表中的一行。"""
+    row: Dict[str, Any] = {'model': model_name, 'total_samples': summary_result['total_samples']}
+    row.update(summary_result['geo_accuracy'])
+    row.update(summary_result['temp_accuracy'])
+    return row
+
+
+def score_models(
+    model_outputs: Dict[str, str],
+    workers: int = stage_2_scoring.SCORING_WORKERS,
+    score_cache: Optional[ScoreCache] = None,
+    output_file_name: str = OUTPUT_FILE_NAME,
+    combined: Optional[stage_2_scoring.SummaryAccumulator] = None,
+    observation_store: Optional[ObservationStore] = None,
+) -> List[Dict[str, Any]]:
+    """
+    依次为每个模型执行流式评分，评分结果与 summary 写在各自输入文件旁边：
+    - 标注、地理索引与观测数据只加载一次，按 qid 派生的标注侧站点集合在模型之间复用；
+    - 观测数据使用本次排行榜专用的 observation_store（默认常驻 LEADERBOARD_RESIDENT_DAYS 天），
+      只在评分期间替换 stage_2_scoring 的默认存储，结束后恢复；
+    - workers > 1 时所有模型共用同一个进程池，worker 内的缓存同样跨模型保留；
+    - combined 不为 None 时把各模型的统计合并进去，并以 'model' 分组记录每个模型。
+    返回每个模型一行的对比表。
+    """
+    if observation_store is None:
+        observation_store = ObservationStore(
+            stage_2_scoring.CSV_FOLDER,
+            cache_dir=stage_2_scoring.OBSERVATION_CACHE_DIR,
+            max_resident_days=LEADERBOARD_RESIDENT_DAYS,
+        )
+    with stage_2_scoring.use_observation_store(observation_store):
+        return _score_models(model_outputs, workers, score_cache, output_file_name, combined)
+
+
+def _score_models(
+    model_outputs: Dict[str, str],
+    workers: int,
+    score_cache: Optional[ScoreCache],
+    output_file_name: str,
+    combined: Optional[stage_2_scoring.SummaryAccumulator],
+) -> List[Dict[str, Any]]:
+    label_store = stage_2_scoring.LABEL_STORE
+    # 进程池在替换观测存储之后创建，子进程 fork 时继承同一配置
+    executor = stage_2_scoring.create_scoring_executor(workers, label_store) if workers > 1 else None
+
+    rows: List[Dict[str, Any]] = []
+    try:
+        for model_name, input_path in model_outputs.items():
+            print(f"Scoring model {model_name} ...")
+            output_path = os.path.join(os.path.dirname(input_path), output_file_name)
+            accumulator = stage_2_scoring.make_summary_accumulator()
+            summary_result = stage_2_scoring.accuracy_scoring_stream(
+                input_path, output_path, workers=workers, label_store=label_store, score_cache=score_cache, executor=executor,
+                accumulator=accumulator,
+            )
+            if combined is not None:
+                combined.merge(accumulator, as_group=('model', model_name))
+            save_json(summary_result, output_path.replace('.json', '_summary.json'))
+            rows.append(summary_to_row(model_name, summary_result))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return rows
+
+
+def save_leaderboard(rows: List[Dict[str, Any]], output_path: str = LEADERBOARD_OUTPUT_PATH, sort_by: Optional[str] = None) -> pd.DataFrame:
+    """保存对比表：CSV 便于表格软件查看，同名 .json 便于程序读取；sort_by 为列名时按该列降序排列。"""
+    leaderboard = pd.DataFrame(rows)
+    if sort_by is not None and not leaderboard.empty:
+        leaderboard = leaderboard.sort_values(sort_by, ascending=False, kind='stable')
+    output_path = path_preprocess(output_path)
+    leaderboard.to_csv(output_path, index=False)
+    # 缺失的指标在 JSON 中写为 null
+    records = leaderboard.astype(object).where(leaderboard.notna(), None).to_dict(orient='records')
+    save_json(records, os.path.splitext(output_path)[0] + '.json')
+    return leaderboard
+
+
+############# 主逻辑
+
+def main(
+    result_dir: str = RESULT_DIR,
+    output_path: str = LEADERBOARD_OUTPUT_PATH,
+    workers: int = stage_2_scoring.SCORING_WORKERS,
+    score_cache_path: Optional[str] = stage_2_scoring.SCORE_CACHE_PATH,
+    sort_by: Optional[str] = None,
+) -> None:
+    """命令行入口：为 result_dir 下所有模型评分并写出排行榜。"""
+    model_outputs = discover_model_outputs(result_dir)
+    print(f"Found {len(model_outputs)} models: {list(model_outputs)}")
+    score_cache = ScoreCache(score_cache_path) if score_cache_path is not None else None
+
+    # 所有模型合并后的统计，按模型（以及 SUMMARY_GROUP_BY 中的日期 / 区域）分组
+    combined = stage_2_scoring.make_summary_accumulator()
+    rows = score_models(model_outputs, workers=workers, score_cache=score_cache, combined=combined)
+    leaderboard = save_leaderboard(rows, output_path, sort_by=sort_by)
+    print(leaderboard.to_string(index=False))
+    save_json(combined.result(), os.path.splitext(output_path)[0] + '_summary.json')
+    if score_cache is not None:
+        print("Score cache:", score_cache.stats())
+        score_cache.close()
+    stage_2_scoring.LABEL_STORE.close()
+    PROFILER.dump(profile_report_path(output_path.replace('.csv', '.json')))
+
+
+if __name__ == '__main__':
+    main()
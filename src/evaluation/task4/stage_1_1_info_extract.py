@@ -1,40 +1,85 @@
 """Task4 阶段一-1：调用大模型抽取结构化气象信息"""
 
+import json
+import os
 import sys
+import threading
 
 # 允许脚本以 CLI 方式运行时能够导入 src 目录下的模块
 sys.path.append('src')
 
+from contextlib import nullcontext
 from copy import deepcopy
-from typing import Any, Dict, List
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple
 
-from model.call_api import call_llm_for_data_cleaning_or_analysis
-from model.client import ModelClient
+from model.call_api import (acall_llm_for_data_cleaning_or_analysis,
+                            call_llm_for_data_cleaning_or_analysis)
+from model.client import ModelClient, get_model_client
 from prompt.evaluation_prompt import TASK4_PROMPT
-from util.data_process import load_json, save_json, str_to_json
-from util.multi_thread import run_in_threads
+from util.async_runner import run_in_async, stream_in_async
+from util.data_process import RecordWriter, load_records, str_to_json
+from util.multi_thread import run_in_threads, stream_in_threads
+from util.profiler import PROFILER, profile_report_path
 
 # ------------------------- 全局配置 -------------------------
 MAX_EXTRACTION_ATTEMPTS = 5  # 单条样本最大重试次数，避免无限循环
+MAX_WORKERS = 5  # 线程池模式下的并发数
+USE_ASYNC = False  # 为 True 时改用 asyncio 执行，在途请求数由 ModelClient 的 AIMD 限流器自适应调整
 # 默认输入/输出文件，便于直接运行脚本做快速调试
 DEFAULT_INPUT_PATH = '/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4_1119_test/temp_20251119103446.json'
 DEFAULT_OUTPUT_PATH = '/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4_1119_test/task4_info_extract_by_llm.json'
+# 断点文件：每条样本完成后立即追加一行，重启时据此跳过已成功的 qid
+DEFAULT_CHECKPOINT_PATH = DEFAULT_OUTPUT_PATH.replace('.json', '_checkpoint.jsonl')
+MISSING_CHECKPOINT_ERROR = 'missing from checkpoint'  # 断点中没有记录的样本导出时写入的 error_res
 
 
-def info_extract_by_llm(old_model_result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def info_extract_by_llm(old_model_result: List[Dict[str, Any]], use_async: bool = USE_ASYNC) -> List[Dict[str, Any]]:
     """
     批量执行信息抽取：
     1. 深拷贝输入，避免覆盖上游输出；
-    2. 使用线程池并发处理，加速大批量请求；
+    2. 使用线程池（或 asyncio 自适应并发）处理，加速大批量请求；
     3. 返回带有 extracted_info 字段的新列表。
     """
     model_result = deepcopy(old_model_result)
+    if use_async:
+        # 所有协程共享同一个 client，以便限流器统计全局的 429 与延迟
+        args_list_dict = {"single_result": model_result, "client": get_model_client()}
+        return run_in_async(ainfo_extract_by_llm_single, args_list_dict)
     # run_in_threads 会自动为每个元素调用 info_extract_by_llm_single
     args_list_dict = {"single_result": model_result}
-    results = run_in_threads(info_extract_by_llm_single, args_list_dict, max_workers=5)
+    results = run_in_threads(info_extract_by_llm_single, args_list_dict, max_workers=MAX_WORKERS)
     return results
 
 
+def extraction_attempts(single_result: Dict[str, Any]) -> Generator[Tuple[str, int], Any, None]:
+    """
+    单条样本抽取的重试与校验流程，同步版与协程版共用，两者只在调用 LLM 的方式上不同：
+    - 每次 yield (prompt, 第几次尝试)，调用方请求 LLM 后 send 回输出文本，请求出错时 send 回异常；
+    - 解析并校验通过后写入 extracted_info 并结束；
+    - 重试 MAX_EXTRACTION_ATTEMPTS 次后仍失败，写入 error 信息结束。
+    """
+    # 构造抽取提示词，将原文插入 Prompt
+    prompt = TASK4_PROMPT.EXTRACT_INFO.format(original_text=single_result['model_output'])
+    invalid_payload = None  # 保存最后一次失败的内容，方便排查
+    for attempts in range(1, MAX_EXTRACTION_ATTEMPTS + 1):
+        if attempts > 1:
+            PROFILER.count('stage_1_1.retry')
+            print(f"Retrying extraction for attempt {attempts}...")
+        extracted_info = yield prompt, attempts
+        if isinstance(extracted_info, Exception):
+            # 接口调用失败，记录异常并继续下一次重试
+            print(f"Error calling LLM: {extracted_info}")
+            invalid_payload = str(extracted_info)
+            continue
+        json_res, invalid_payload = parse_extracted_info(extracted_info)
+        if json_res is not None:
+            single_result['extracted_info'] = json_res
+            return
+    # 所有重试均失败，写入错误信息以便后续人工处理
+    single_result['extracted_info'] = {"error_res": invalid_payload}
+
+
+@PROFILER.timed('stage_1_1.info_extract_single')
 def info_extract_by_llm_single(single_result: Dict[str, Any]) -> Dict[str, Any]:
     """
     单条样本的信息抽取流程：
@@ -43,45 +88,60 @@ def info_extract_by_llm_single(single_result: Dict[str, Any]) -> Dict[str, Any]:
     - 检查结构合法性，不符合就重试；
     - 重试 MAX_EXTRACTION_ATTEMPTS 次后仍失败，则记录 error 信息返回。
     """
-    client = ModelClient()  # 每个线程持有独立 client，避免共享状态
+    client = get_model_client()  # 所有线程共享同一个 client 及其连接池（OpenAI client 线程安全）
+    attempts = extraction_attempts(single_result)
+    try:
+        prompt, attempt = next(attempts)
+        while True:
+            try:
+                extracted_info = call_llm_for_data_cleaning_or_analysis(
+                    client=client,
+                    model="deepseek-ai/DeepSeek-V3",
+                    prompt=prompt,
+                    attempt=attempt,
+                )
+            except Exception as e:
+                extracted_info = e
+            prompt, attempt = attempts.send(extracted_info)
+    except StopIteration:
+        return single_result
 
-    attempts = 0
-    invalid_payload = None  # 保存最后一次失败的内容，方便排查
-    while attempts < MAX_EXTRACTION_ATTEMPTS:
-        attempts += 1
-        if attempts > 1:
-            print(f"Retrying extraction for attempt {attempts}...")
 
-        # 构造抽取提示词，将原文插入 Prompt
-        prompt = TASK4_PROMPT.EXTRACT_INFO.format(original_text=single_result['model_output'])
-        try:
-            extracted_info = call_llm_for_data_cleaning_or_analysis(
-                client=client,
-                model="deepseek-ai/DeepSeek-V3",
-                prompt=prompt,
-            )
-        except Exception as e:
-            # 接口调用失败，记录异常并继续下一次重试
-            print(f"Error calling LLM: {e}")
-            invalid_payload = str(e)
-            continue
+@PROFILER.timed('stage_1_1.info_extract_single')
+async def ainfo_extract_by_llm_single(single_result: Dict[str, Any], client: ModelClient) -> Dict[str, Any]:
+    """info_extract_by_llm_single 的协程版本，重试与校验逻辑由 extraction_attempts 共用。"""
+    attempts = extraction_attempts(single_result)
+    try:
+        prompt, attempt = next(attempts)
+        while True:
+            try:
+                extracted_info = await acall_llm_for_data_cleaning_or_analysis(
+                    client=client,
+                    model="deepseek-ai/DeepSeek-V3",
+                    prompt=prompt,
+                    attempt=attempt,
+                )
+            except Exception as e:
+                extracted_info = e
+            prompt, attempt = attempts.send(extracted_info)
+    except StopIteration:
+        return single_result
 
-        try:
-            # 将模型输出转换为 JSON，并校验字段格式
-            json_res = str_to_json(extracted_info)
-            if validate_extracted_info(json_res):
-                single_result['extracted_info'] = json_res
-                return single_result
-            print(f"Invalid extracted_info format: {json_res}")
-            invalid_payload = json_res
-        except Exception as e:
-            # JSON 解析报错，直接记录原始字符串
-            print(f"Error parsing extracted_info: {e}")
-            invalid_payload = extracted_info
 
-    # 所有重试均失败，写入错误信息以便后续人工处理
-    single_result['extracted_info'] = {"error_res": invalid_payload}
-    return single_result
+@PROFILER.timed('stage_1_1.parse')
+def parse_extracted_info(extracted_info: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+    """将模型输出解析为 JSON 并校验格式，返回 (合法结果或 None, 失败时的原始内容)。"""
+    try:
+        # 将模型输出转换为 JSON，并校验字段格式
+        json_res = str_to_json(extracted_info)
+        if validate_extracted_info(json_res):
+            return json_res, None
+        print(f"Invalid extracted_info format: {json_res}")
+        return None, json_res
+    except Exception as e:
+        # JSON 解析报错，直接记录原始字符串
+        print(f"Error parsing extracted_info: {e}")
+        return None, extracted_info
 
 
 def validate_extracted_info(extracted_info: Dict[str, Any]) -> bool:
@@ -138,11 +198,112 @@ def validate_extracted_info(extracted_info: Dict[str, Any]) -> bool:
     return True
 
 
+def is_extraction_done(single_result: Dict[str, Any]) -> bool:
+    """判断一条记录是否已有合法的 extracted_info（error_res 视为未完成）。"""
+    extracted_info = single_result.get('extracted_info')
+    if not isinstance(extracted_info, dict) or 'error_res' in extracted_info:
+        return False
+    return validate_extracted_info(extracted_info)
+
+
+def iter_checkpoint(checkpoint_path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐行读取断点文件，返回 (行首字节偏移, 记录)；进程中断留下的残缺行会被跳过。"""
+    if not os.path.exists(checkpoint_path):
+        return
+    with open(checkpoint_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            line_offset = offset
+            offset += len(line)
+            try:
+                yield line_offset, json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping broken checkpoint line at byte {line_offset}.")
+
+
+def load_finished_qids(checkpoint_path: str) -> set:
+    """收集断点文件中已成功抽取的 qid。"""
+    return {record['qid'] for _, record in iter_checkpoint(checkpoint_path) if is_extraction_done(record)}
+
+
+def info_extract_to_jsonl(model_result: List[Dict[str, Any]], checkpoint_path: str, use_async: bool = USE_ASYNC) -> int:
+    """
+    可断点续跑的批量抽取：
+    1. 跳过断点文件中已有合法 extracted_info 的 qid；
+    2. 每条样本完成后立即追加写入 JSONL 并 flush，进程中断最多损失在途请求；
+    3. 结果不在内存中累积，返回本次写入的记录数。
+    """
+    finished_qids = load_finished_qids(checkpoint_path)
+    pending = [single_result for single_result in model_result if single_result['qid'] not in finished_qids]
+    print(f"{len(finished_qids)} samples already extracted, {len(pending)} remaining.")
+    if os.path.dirname(checkpoint_path):
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+
+    write_lock = threading.Lock()
+    with open(checkpoint_path, 'a') as f:
+        # 上次中断可能留下不完整的最后一行，先补换行，避免与新记录粘连
+        if f.tell() > 0:
+            with open(checkpoint_path, 'rb') as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b'\n':
+                    f.write('\n')
+        def _append(single_result: Dict[str, Any]) -> None:
+            line = json.dumps(single_result, ensure_ascii=False) + '\n'
+            with write_lock:
+                f.write(line)
+                f.flush()
+
+        # 浅拷贝单条记录即可：抽取只会新增 extracted_info 字段，不修改上游数据
+        if use_async:
+            client = get_model_client()
+            kwargs_iter = ({"single_result": dict(single_result), "client": client} for single_result in pending)
+            return stream_in_async(ainfo_extract_by_llm_single, kwargs_iter, _append, total=len(pending))
+        kwargs_iter = ({"single_result": dict(single_result)} for single_result in pending)
+        return stream_in_threads(info_extract_by_llm_single, kwargs_iter, _append, max_workers=MAX_WORKERS, total=len(pending))
+
+
+def export_checkpoint_to_json(
+    checkpoint_path: str,
+    model_result: List[Dict[str, Any]],
+    output_path: str,
+) -> Tuple[str, List[str], List[str]]:
+    """
+    将断点文件整理为 output_path 扩展名对应格式的结果文件（.json 与 save_json 格式相同）：
+    同一 qid 取最后一次写入的记录，按 model_result 的顺序输出；只在内存中保留行偏移，逐条读出写入。
+    每个输入样本都会输出一条，保证与下游阶段的条数一致：
+    - 抽取失败（extracted_info 含 error_res）的记录原样保留，视为未完成；
+    - 断点中缺失的 qid 以输入样本补齐，extracted_info 记为 {"error_res": MISSING_CHECKPOINT_ERROR}。
+    返回 (结果文件路径, 缺失的 qid 列表, 失败的 qid 列表)。
+    """
+    qid_offset = {record['qid']: offset for offset, record in iter_checkpoint(checkpoint_path)}
+    missing_qids: List[str] = []
+    failed_qids: List[str] = []
+    # 断点文件不存在时 qid_offset 为空，所有样本都按缺失处理
+    with (open(checkpoint_path, 'rb') if qid_offset else nullcontext()) as src, RecordWriter(output_path) as writer:
+        for single_result in model_result:
+            qid = single_result['qid']
+            if qid not in qid_offset:
+                missing_qids.append(qid)
+                writer.write(dict(single_result, extracted_info={"error_res": MISSING_CHECKPOINT_ERROR}))
+                continue
+            src.seek(qid_offset[qid])
+            record = json.loads(src.readline())
+            if not is_extraction_done(record):
+                failed_qids.append(qid)
+            writer.write(record)
+    if missing_qids:
+        print(f"{len(missing_qids)} qids missing from checkpoint, exported as not done: {missing_qids}")
+    if failed_qids:
+        print(f"{len(failed_qids)} qids failed extraction, exported as not done: {failed_qids}")
+    return writer.file_path, missing_qids, failed_qids
+
+
 def main():
-    """命令行入口：读取默认输入，执行抽取并写入结果"""
-    model_result = load_json(DEFAULT_INPUT_PATH)
-    model_result_with_extract_info = info_extract_by_llm(model_result)
-    save_json(model_result_with_extract_info, DEFAULT_OUTPUT_PATH)
+    """命令行入口：读取默认输入，执行可断点续跑的抽取，最后整理为 JSON 结果"""
+    model_result = load_records(DEFAULT_INPUT_PATH)
+    info_extract_to_jsonl(model_result, DEFAULT_CHECKPOINT_PATH)
+    export_checkpoint_to_json(DEFAULT_CHECKPOINT_PATH, model_result, DEFAULT_OUTPUT_PATH)
+    PROFILER.dump(profile_report_path(DEFAULT_OUTPUT_PATH))
 
 
 if __name__ == '__main__':
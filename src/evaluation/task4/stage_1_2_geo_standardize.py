@@ -6,48 +6,107 @@ import sys
 sys.path.append('src')
 
 from copy import deepcopy
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
 
-from evaluation.util import geo_standardize
-from util.data_process import load_json, save_json
+from evaluation.geo_memo import GeoStandardizeMemo, get_geo_memo
+from evaluation.geo_rule_matcher import get_geo_rule_matcher
+from evaluation.util import geo_standardize, get_geo_set
+from util.data_process import load_records, save_records
 from util.multi_thread import run_in_threads
+from util.profiler import PROFILER, profile_report_path
 
 # ------------------------- 默认路径配置 -------------------------
 DEFAULT_INPUT_PATH = '/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4_1119_test/task4_info_extract_by_llm.json'
 DEFAULT_OUTPUT_PATH = '/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4_1119_test/task4_info_extract_geo_standardize.json'
+GEO_BATCH_SIZE = 40  # 跨样本合并后每个 LLM 请求携带的地理名称数
+MAX_WORKERS = 5  # 线程池并发数
 
 
 def geo_standardize_batch(old_model_result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     批量为 extracted_info 中的地理字段添加 std_geo：
     1. 深拷贝输入，避免污染上游数据；
-    2. 使用线程池加速对每条样本的处理；
-    3. 将 geo_standardize_single 的输出重新组合成列表。
+    2. 先汇总全部样本中尚未确认的地理名称，去重后按 GEO_BATCH_SIZE 分块并发交给 LLM，结果写入全局备忘录；
+    3. 再逐条调用 geo_standardize_single，此时名称基本都能直接从备忘录命中；
+       预取中重试后仍失败的名称记在 failed_geo 中，逐条处理时不再请求 LLM。
     """
     model_result = deepcopy(old_model_result)
-    args_list_dict = {"single_result": model_result}
-    results = run_in_threads(geo_standardize_single, args_list_dict, max_workers=5)
+    memo = get_geo_memo()
+    failed_geo: Set[str] = set()
+    prefetch_geo_standardize(model_result, memo, failed_geo=failed_geo)
+    if failed_geo:
+        print(f"Geo names still unresolved after prefetch: {len(failed_geo)}, kept as error_ without further requests.")
+    args_list_dict = {"single_result": model_result, "memo": memo, "failed_geo": failed_geo}
+    results = run_in_threads(geo_standardize_single, args_list_dict, max_workers=MAX_WORKERS)
+    memo.save()
     return results
 
 
-def geo_standardize_single(single_result: Dict[str, Any]) -> Dict[str, Any]:
+@PROFILER.timed('stage_1_2.prefetch')
+def prefetch_geo_standardize(
+    model_result: List[Dict[str, Any]],
+    memo: GeoStandardizeMemo,
+    batch_size: int = GEO_BATCH_SIZE,
+    failed_geo: Optional[Set[str]] = None,
+) -> None:
+    """
+    收集所有样本中既不在标准表、规则也无法确定、且不在备忘录中的名称，去重后按 batch_size 切块：
+    每块只发送一次请求（标准地理参考表在每个请求中只出现一次），
+    各名称的校验与重试仍由 geo_standardize / geo_standardize_by_llm 负责，确认的结果写入备忘录，
+    重试后仍未确认的名称加入 failed_geo。
+    """
+    std_geo_set = get_geo_set()
+    rule_matcher = get_geo_rule_matcher()
+    unseen_geo = []
+    for single_result in model_result:
+        for geo in collect_geo_list(single_result['extracted_info']):
+            geo = geo.strip()
+            if geo not in std_geo_set:
+                unseen_geo.append(geo)
+    # 规则能确定的名称在逐样本处理时直接解决，这里只做判断、不计入规则统计
+    unseen_geo = [geo for geo in dict.fromkeys(unseen_geo) if rule_matcher.match_with_tier(geo)[0] is None]
+    # 已在备忘录中的名称不再请求
+    known_geo = memo.lookup(unseen_geo)
+    unseen_geo = [geo for geo in unseen_geo if geo not in known_geo]
+
+    geo_batches = [unseen_geo[i:i + batch_size] for i in range(0, len(unseen_geo), batch_size)]
+    print(f"Unseen geo names: {len(unseen_geo)}, sent to LLM in {len(geo_batches)} batches of up to {batch_size}.")
+    if geo_batches:
+        run_in_threads(geo_standardize, {"geo_list": geo_batches, "memo": memo, "failed_geo": failed_geo}, max_workers=MAX_WORKERS)
+
+
+def collect_geo_list(single_info: Dict[str, Any]) -> List[str]:
+    """收集 specific_regions 与 max_temp 中出现过的所有地理描述（去重、保持顺序）；抽取失败的记录返回空列表。"""
+    geo_list: List[str] = []
+    if 'error_res' in single_info:
+        return geo_list
+    for region in single_info['specific_regions']:
+        geo_list.extend(region.get('geo', []))
+    if single_info['max_temp'] is not None:
+        geo_list.extend(single_info['max_temp'].get('geo', []))
+    return list(dict.fromkeys(geo_list))
+
+
+@PROFILER.timed('stage_1_2.geo_standardize_single')
+def geo_standardize_single(
+    single_result: Dict[str, Any],
+    memo: Optional[GeoStandardizeMemo] = None,
+    failed_geo: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
     """
     单条样本的地理标准化：
-    - 收集 specific_regions 与 max_temp 中所有地理描述，去重后调用 geo_standardize；
+    - 收集 specific_regions 与 max_temp 中所有地理描述，去重后调用 geo_standardize（优先命中备忘录，
+      failed_geo 中的名称不再请求 LLM）；
     - 根据原始 -> 标准化映射补充 std_geo 字段；
-    - 返回带有 std_geo 的 single_result。
+    - 返回带有 std_geo 的 single_result；抽取失败（含 error_res）的记录原样返回，保证条数与上游一致。
     """
     single_info = single_result['extracted_info']
+    if 'error_res' in single_info:
+        return single_result
 
-    geo_set = set()
     # 收集所有出现过的地理描述，减少重复调用标准化接口
-    for region in single_info['specific_regions']:
-        geo_set.update(region.get('geo', []))
-    if single_info['max_temp'] is not None:
-        geo_set.update(single_info['max_temp'].get('geo', []))
-
-    geo_list = list(geo_set)
-    std_geo_list = geo_standardize(geo_list)
+    geo_list = collect_geo_list(single_info)
+    std_geo_list = geo_standardize(geo_list, memo=memo, failed_geo=failed_geo)
     ori_std_geo_map = {ori_geo: std_geo for ori_geo, std_geo in zip(geo_list, std_geo_list)}
 
     # specific_regions 中每个 geo 列表补充 std_geo
@@ -63,9 +122,11 @@ def geo_standardize_single(single_result: Dict[str, Any]) -> Dict[str, Any]:
 
 def main():
     """命令行入口：读取默认输入，执行地理标准化并写入结果"""
-    model_result = load_json(DEFAULT_INPUT_PATH)
+    model_result = load_records(DEFAULT_INPUT_PATH)
     geo_standardized_result = geo_standardize_batch(model_result)
-    save_json(geo_standardized_result, DEFAULT_OUTPUT_PATH)
+    save_records(geo_standardized_result, DEFAULT_OUTPUT_PATH)
+    print(f"Geo rule matcher stats: {get_geo_rule_matcher().get_stats()}")
+    PROFILER.dump(profile_report_path(DEFAULT_OUTPUT_PATH))
 
 
 if __name__ == '__main__':
@@ -2,20 +2,30 @@
 
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from copy import deepcopy
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from functools import cached_property
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-import pandas as pd
+import numpy as np
 from tqdm import tqdm
 
 # 允许脚本在直接运行时也能加载 src 下的模块
 sys.path.append('src')
 
-from evaluation.metric import (geo_list_iou, geo_list_match_and_iou,
-                               number_precise_scoring, number_range_scoring,
-                               set_iou)
-from evaluation.util import geo_list_to_stationid, get_station_id_set
-from util.data_process import load_json, save_json
+from evaluation.aggregator import DEFAULT_QUANTILES, MetricAggregator
+from evaluation.metric import (geo_list_iou, geo_list_match_and_iou, grouped_min_max_without_outliers,
+                               number_precise_scoring, number_precise_scoring_array, number_range_scoring,
+                               number_range_scoring_array, to_float_array)
+from evaluation.geo_index import get_geo_index
+from evaluation.label_store import LabelStore
+from evaluation.observation_store import ObservationStore, TempRangeMemo, cached_file_hash, station_set_fingerprint
+from evaluation.score_cache import ScoreCache, label_version, make_score_fingerprint
+from evaluation.util import geo_list_to_stationid
+from util.data_process import RecordWriter, iter_records, load_records, save_json, save_records
+from util.profiler import PROFILER, profile_report_path
 
 # ------------------------- 默认路径配置 -------------------------
 CSV_FOLDER = "/home/kaiyu/Project/WeatherEvaluateSystem/data/task4/2024/tmax"
@@ -23,99 +33,429 @@ LABEL_JSON_PATH = "/home/kaiyu/Project/WeatherEvaluateSystem/data/newspaper/task
 DEFAULT_INPUT_PATH = "/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4/Qwen2.5-VL-7B-Instruct/task4_info_extract_geo_standardize.json"
 DEFAULT_OUTPUT_PATH = "/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4/Qwen2.5-VL-7B-Instruct/task4_scoring.json"
 SUMMARY_OUTPUT_PATH = DEFAULT_OUTPUT_PATH.replace('.json', '_summary.json')
-
-
-def get_label_dict(label_path: str) -> Dict[str, Any]:
+# 观测数据 .npy 缓存目录，为 None 时只在内存中缓存
+OBSERVATION_CACHE_DIR: Optional[str] = None
+# 为 True 时逐条读写输入输出（内存占用与样本数无关），默认与原先一样整体加载
+STREAM_SCORING = False
+SCORING_WORKERS = 1  # 评分进程数，>1 时启用进程池并行评分
+SCORING_CHUNKSIZE = 32  # 每次分发给单个进程的样本数
+# 评分缓存（SQLite）路径，为 None 时不缓存；修改 summary 或新增汇总指标后重跑只需重新计算发生变化的样本
+SCORE_CACHE_PATH: Optional[str] = None
+SCORER_VERSION = 1  # 单条评分逻辑（accuracy_scoring_single 及其依赖）变化时递增，使旧缓存全部失效
+# summary 额外输出的分组统计（可选 'date' / 'region'，见 SUMMARY_GROUP_FUNCS），为空时只输出整体平均分
+SUMMARY_GROUP_BY: Tuple[str, ...] = ()
+SUMMARY_SKETCH_BINS: Optional[int] = None  # 不为 None 时为每项指标维护该桶数的直方图，summary 中给出分位数
+# 评分前为 标准地理名称 × 标注涉及的观测文件 预先计算温度区间，批量评分时大部分区域直接查表
+PRECOMPUTE_TEMP_RANGES = False
+# 预计算时把同一观测文件的全部站点集合拼接后一次完成离群值过滤（metric.grouped_min_max_without_outliers），
+# 结果与逐个调用 compute_temp_range 逐位一致；为 False 时逐个计算
+VECTORIZED_TEMP_RANGES = True
+
+
+def get_label_dict(label_path: str = LABEL_JSON_PATH) -> Dict[str, Any]:
     """加载标准答案，构建 {qid: 标准答案条目} 的查询字典。"""
-    label_data = load_json(label_path)
+    label_data = load_records(label_path)
     label_dict: Dict[str, Any] = {}
     for item in label_data:
         label_dict[item['qid']] = item
     return label_dict
 
 
-LABEL_DICT = get_label_dict(LABEL_JSON_PATH)
+# 标准答案在首次评分时才加载（按 qid 索引按需读取），导入本模块不再解析标注文件
+LABEL_STORE = LabelStore(LABEL_JSON_PATH)
+OBSERVATION_STORE = ObservationStore(CSV_FOLDER, cache_dir=OBSERVATION_CACHE_DIR)
+# (观测文件, 站点集合) -> 去除离群值后的温度区间；进程池 fork 时子进程继承已有条目
+TEMP_RANGE_MEMO = TempRangeMemo()
+
+
+def resolve_label_store(label_store: Optional[LabelStore]) -> LabelStore:
+    """未显式传入 label_store 时使用模块默认的 LABEL_STORE。"""
+    return LABEL_STORE if label_store is None else label_store
 
 
-def accuracy_scoring(model_result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+@contextmanager
+def use_observation_store(observation_store: ObservationStore) -> Iterator[ObservationStore]:
+    """
+    在 with 块内以 observation_store 替换模块默认的 OBSERVATION_STORE，退出时恢复原值；
+    需要子进程使用同一配置时，进程池应在块内创建（fork 时继承）。
+    """
+    global OBSERVATION_STORE
+    previous = OBSERVATION_STORE
+    OBSERVATION_STORE = observation_store
+    try:
+        yield observation_store
+    finally:
+        OBSERVATION_STORE = previous
+
+
+def accuracy_scoring(model_result: List[Dict[str, Any]], label_store: Optional[LabelStore] = None, score_cache: Optional[ScoreCache] = None) -> List[Dict[str, Any]]:
     """
     批量执行评分：
     1. 深拷贝输入，避免覆盖上游数据；
-    2. 为每条样本添加 accuracy_score 字段；
+    2. 为每条样本添加 accuracy_score 字段（传入 score_cache 时未变化的样本直接复用缓存）；
     3. 返回带评分的新列表。
     """
     scored_result = deepcopy(model_result)
-    for single_result in tqdm(scored_result, desc="Scoring accuracy"):
-        # 每个样本单独计算得分，保证评分的可追溯性
-        single_result['accuracy_score'] = accuracy_scoring_single(single_result)
+    # 每个样本单独计算得分，保证评分的可追溯性
+    for _ in tqdm(iter_scored_records(scored_result, label_store=label_store, score_cache=score_cache), desc="Scoring accuracy", total=len(scored_result)):
+        pass
     return scored_result
 
 
-def summary(model_result: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """汇总所有样本的平均得分，便于整体评估模型表现。"""
-    def _append_value(container: List[float], value: Optional[float]) -> None:
-        if value is None:
-            print("Warning: None value encountered in scoring summary.")
-            return
-        container.append(float(value))
+class SummaryAccumulator:
+    """
+    以累加和的方式逐条汇总得分，内存占用与样本数无关：
+    - update() 每次吸收一条带 accuracy_score 的样本，result() 输出与 summary() 相同结构的平均分；
+    - group_by 为 {分组名: key_func}，key_func(single_result) 返回该样本所属的分组键（或键列表，样本可同时属于多组），
+      result() 额外给出每个分组键下的平均分；
+    - 各分片 / 进程的 accumulator 可用 merge() 合并，结果与单次遍历一致（浮点累加顺序不同可能有末位差异）；
+    - stats() 给出每项指标的计数、均值、标准差、最值及分位数（sketch_bins 不为 None 时）。
+    """
 
-    def _average(values: List[float]) -> Optional[float]:
-        return sum(values) / len(values) if values else None
+    GEO_METRICS = ('max_temp_geo_iou', 'other_regions_geo_iou', 'specific_regions_geo_avg_iou')
+    TEMP_METRICS = ('max_temp_score', 'other_regions_range_score', 'specific_regions_range_score')
 
-    # 用 list 收集各项得分，最后计算平均值
-    geo_metrics = {
-        'max_temp_geo_iou': [],
-        'other_regions_geo_iou': [],
-        'specific_regions_geo_avg_iou': [],
-    }
-    temp_metrics = {
-        'max_temp_score': [],
-        'other_regions_range_score': [],
-        'specific_regions_range_score': [],
-    }
+    def __init__(self, group_by: Optional[Dict[str, Callable[[Dict[str, Any]], Any]]] = None, sketch_bins: Optional[int] = None):
+        self.group_by = dict(group_by or {})
+        self.sketch_bins = sketch_bins
+        self.total = self._new_aggregator()
+        self.groups: Dict[str, Dict[Any, MetricAggregator]] = {name: {} for name in self.group_by}
 
-    # 遍历所有样本，收集各项得分
-    for single_result in model_result:
+    def _new_aggregator(self) -> MetricAggregator:
+        return MetricAggregator(self.GEO_METRICS + self.TEMP_METRICS, self.sketch_bins)
+
+    @property
+    def total_samples(self) -> int:
+        return self.total.total_samples
+
+    @staticmethod
+    def _value(value: Optional[float]) -> Optional[float]:
+        if value is None:
+            print("Warning: None value encountered in scoring summary.")
+            return None
+        return float(value)
+
+    def extract_metrics(self, single_result: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        """取出一条样本参与汇总的各项得分，缺失的记为 None。"""
         # 提取 accuracy_score 字段
         accuracy_score = single_result.get('accuracy_score') or {}
         geo_accuracy = accuracy_score.get('geo_accuracy') or {}
         temp_accuracy = accuracy_score.get('temp_accuracy') or {}
 
         # 收集地理维度得分
-        _append_value(geo_metrics['max_temp_geo_iou'], geo_accuracy.get('max_temp_geo_iou'))
-        _append_value(geo_metrics['other_regions_geo_iou'], geo_accuracy.get('other_regions_geo_iou'))
         specific_geo_score = geo_accuracy.get('specific_regions_geo_iou') or {}
-        _append_value(geo_metrics['specific_regions_geo_avg_iou'], specific_geo_score.get('avg_iou'))
+        values = {
+            'max_temp_geo_iou': self._value(geo_accuracy.get('max_temp_geo_iou')),
+            'other_regions_geo_iou': self._value(geo_accuracy.get('other_regions_geo_iou')),
+            'specific_regions_geo_avg_iou': self._value(specific_geo_score.get('avg_iou')),
+        }
 
         # 收集温度维度得分
-        _append_value(temp_metrics['max_temp_score'], temp_accuracy.get('max_temp_score'))
+        values['max_temp_score'] = self._value(temp_accuracy.get('max_temp_score'))
         other_temp_score = temp_accuracy.get('other_regions_temp_score') or {}
-        _append_value(temp_metrics['other_regions_range_score'], other_temp_score.get('range_score'))
+        values['other_regions_range_score'] = self._value(other_temp_score.get('range_score'))
         # 对 specific_regions 先计算平均分数
         specific_region_scores = []
         for region_score in temp_accuracy.get('specific_regions_temp_scores') or []:
-            _append_value(specific_region_scores, region_score.get('range_score'))
-        _append_value(temp_metrics['specific_regions_range_score'], _average(specific_region_scores))
+            range_score = region_score.get('range_score')
+            if range_score is None:
+                print("Warning: None value encountered in scoring summary.")
+                continue
+            specific_region_scores.append(float(range_score))
+        specific_average = sum(specific_region_scores) / len(specific_region_scores) if specific_region_scores else None
+        values['specific_regions_range_score'] = self._value(specific_average)
+        return values
+
+    def update(self, single_result: Dict[str, Any]) -> None:
+        values = self.extract_metrics(single_result)
+        self.total.add(values)
+        for name, key_func in self.group_by.items():
+            keys = key_func(single_result)
+            for key in (keys if isinstance(keys, (list, tuple, set, frozenset)) else [keys]):
+                group = self.groups[name].get(key)
+                if group is None:
+                    group = self.groups[name][key] = self._new_aggregator()
+                group.add(values)
+
+    def merge(self, other: 'SummaryAccumulator', as_group: Optional[Tuple[str, Any]] = None) -> None:
+        """
+        合并另一个 accumulator 的整体与分组统计；
+        as_group=(分组名, 键) 时把 other 的整体统计同时记为该分组下的一组（如多模型汇总时按模型分组）。
+        """
+        self.total.merge(other.total)
+        for name, groups in other.groups.items():
+            own_groups = self.groups.setdefault(name, {})
+            for key, group in groups.items():
+                own_groups.setdefault(key, self._new_aggregator()).merge(group)
+        if as_group is not None:
+            name, key = as_group
+            self.groups.setdefault(name, {}).setdefault(key, self._new_aggregator()).merge(other.total)
+
+    def _averages(self, aggregator: MetricAggregator) -> Dict[str, Any]:
+        return {
+            'total_samples': aggregator.total_samples,
+            'geo_accuracy': {name: aggregator.mean(name) for name in self.GEO_METRICS},
+            'temp_accuracy': {name: aggregator.mean(name) for name in self.TEMP_METRICS},
+        }
 
-    return {
-        'total_samples': len(model_result),
-        'geo_accuracy': {
-            'max_temp_geo_iou': _average(geo_metrics['max_temp_geo_iou']),
-            'other_regions_geo_iou': _average(geo_metrics['other_regions_geo_iou']),
-            'specific_regions_geo_avg_iou': _average(geo_metrics['specific_regions_geo_avg_iou']),
-        },
-        'temp_accuracy': {
-            'max_temp_score': _average(temp_metrics['max_temp_score']),
-            'other_regions_range_score': _average(temp_metrics['other_regions_range_score']),
-            'specific_regions_range_score': _average(temp_metrics['specific_regions_range_score']),
+    def result(self) -> Dict[str, Any]:
+        result = self._averages(self.total)
+        if self.groups:
+            result['groups'] = {
+                name: {str(key): self._averages(groups[key]) for key in sorted(groups, key=str)}
+                for name, groups in self.groups.items()
+            }
+        if self.sketch_bins is not None:
+            result['stats'] = self.stats()
+        return result
+
+    def stats(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        return {
+            'total': self.total.to_dict(quantiles),
+            'groups': {
+                name: {str(key): groups[key].to_dict(quantiles) for key in sorted(groups, key=str)}
+                for name, groups in self.groups.items()
+            },
         }
-    }
 
 
-def accuracy_scoring_single(single_result: Dict[str, Any]) -> Dict[str, Any]:
-    """对单个抽取结果进行准确率评分"""
-    geo_accuracy_score = geo_accuracy_scoring(single_result)
-    temp_accuracy_score = temp_accuracy_scoring(single_result)
+def group_by_date(single_result: Dict[str, Any], label_store: Optional[LabelStore] = None) -> str:
+    """按标注的观测文件名分组（如 20240701.csv -> 20240701）。"""
+    csv_data_path = resolve_label_store(label_store).csv_data_path(single_result['qid'])
+    return os.path.splitext(os.path.basename(csv_data_path))[0]
+
+
+def _label_top_regions(label: Dict[str, Any]) -> List[str]:
+    geo_index = get_geo_index()
+    # 地理划分 CSV 最后一列为最高层级（片区）
+    top_level = list(geo_index.geo_dict_list)[-1]
+    extracted_info = label['extracted_info']
+    label_geo = [geo for std_geo in get_std_geo_list(extracted_info) for geo in std_geo]
+    if extracted_info.get('max_temp') is not None:
+        label_geo.extend(extracted_info['max_temp'].get('std_geo', []))
+    if not label_geo:
+        return []
+    return [region for region in geo_index.geo_dict_list[top_level] if geo_index.hierarchy.overlaps([region], label_geo)]
+
+
+def group_by_region(single_result: Dict[str, Any], label_store: Optional[LabelStore] = None) -> List[str]:
+    """按标注中 specific_regions / max_temp 覆盖到的最高层级区域（片区）分组，一条样本可属于多个区域。"""
+    return resolve_label_store(label_store).derived(single_result['qid'], 'summary_top_regions', _label_top_regions)
+
+
+# SUMMARY_GROUP_BY 可用的分组；按模型分组见 leaderboard（各模型的 accumulator 以 merge(as_group=...) 合并）
+SUMMARY_GROUP_FUNCS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'date': group_by_date,
+    'region': group_by_region,
+}
+
+
+def make_summary_accumulator(group_by: Iterable[str] = SUMMARY_GROUP_BY, sketch_bins: Optional[int] = SUMMARY_SKETCH_BINS) -> SummaryAccumulator:
+    """按分组名（SUMMARY_GROUP_FUNCS 中的键）创建 accumulator。"""
+    return SummaryAccumulator({name: SUMMARY_GROUP_FUNCS[name] for name in group_by}, sketch_bins)
+
+
+def summary(model_result: Iterable[Dict[str, Any]], group_by: Iterable[str] = SUMMARY_GROUP_BY) -> Dict[str, Any]:
+    """汇总所有样本的平均得分，便于整体评估模型表现；group_by 非空时附带分组平均分。"""
+    accumulator = make_summary_accumulator(group_by)
+    # 遍历所有样本，累加各项得分
+    for single_result in model_result:
+        accumulator.update(single_result)
+    return accumulator.result()
+
+
+def accuracy_scoring_stream(
+    input_path: str,
+    output_path: str,
+    workers: int = SCORING_WORKERS,
+    label_store: Optional[LabelStore] = None,
+    score_cache: Optional[ScoreCache] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    accumulator: Optional[SummaryAccumulator] = None,
+) -> Dict[str, Any]:
+    """
+    流式评分：逐条读取输入，评分后立即写出，同时累加 summary，
+    内存中只保留当前样本（并行时为当前一批样本）。返回 summary 结果；
+    accumulator 默认由 make_summary_accumulator() 创建，传入时调用方可在之后继续合并其中的统计。
+    """
+    if accumulator is None:
+        accumulator = make_summary_accumulator()
+    with RecordWriter(output_path) as writer:
+        scored_records = iter_scored_records(iter_records(input_path), workers, label_store=label_store, score_cache=score_cache, executor=executor)
+        for single_result in tqdm(scored_records, desc="Scoring accuracy"):
+            accumulator.update(single_result)
+            writer.write(single_result)
+    return accumulator.result()
+
+
+def _init_scoring_worker(label_store: LabelStore) -> None:
+    """
+    进程池初始化：每个 worker 预先构建一次地理索引，并把 label_store 设为本进程默认的标注存储，
+    之后的各批任务（以及复用同一进程池的多个模型）共享其中已读取的标注与派生的站点集合。
+    fork 时子进程继承了主进程 PROFILER 中已有的统计，先清空，回传的增量才只包含本进程的记录。
+    """
+    global LABEL_STORE
+    PROFILER.reset()
+    LABEL_STORE = label_store
+    get_geo_index()
+
+
+def create_scoring_executor(workers: int, label_store: Optional[LabelStore] = None) -> ProcessPoolExecutor:
+    """创建评分进程池（子进程在返回前已全部启动）；可传给 iter_scored_records / accuracy_scoring_stream 在多次评分之间复用。"""
+    label_store = resolve_label_store(label_store)
+    # 在 fork 子进程前建好 qid 索引，子进程只需按需读取各自用到的标注
+    label_store.ensure_index()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_scoring_worker, initargs=(label_store,))
+    # fork 方式下进程池在首次提交任务时才一次性创建全部子进程；立即提交一个空任务，
+    # 让 fork 发生在调用方启动其他线程之前，避免子进程继承其他线程持有的锁而死锁
+    executor.submit(_warm_up_scoring_worker).result()
+    return executor
+
+
+def _warm_up_scoring_worker() -> None:
+    """空任务，仅用于促使进程池立即创建子进程。"""
+
+
+def _score_chunk_in_worker(batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """子进程中评分一批样本，连同本进程自上次回传以来的 PROFILER 增量一起返回。"""
+    accuracy_scores = accuracy_scoring_batch(batch)
+    return accuracy_scores, PROFILER.snapshot(clear=True)
+
+
+def score_in_executor(executor: ProcessPoolExecutor, batch: List[Dict[str, Any]], chunksize: int = SCORING_CHUNKSIZE) -> List[Dict[str, Any]]:
+    """
+    在评分进程池中按 chunksize 分片评分，按输入顺序返回 accuracy_score 列表；
+    子进程记录的计时与计数随每个分片回传，并入主进程的 PROFILER。
+    """
+    chunks = [batch[i:i + chunksize] for i in range(0, len(batch), chunksize)]
+    accuracy_scores = []
+    for chunk_scores, profile_snapshot in executor.map(_score_chunk_in_worker, chunks):
+        PROFILER.merge(profile_snapshot)
+        accuracy_scores.extend(chunk_scores)
+    return accuracy_scores
+
+
+def accuracy_scoring_parallel(
+    model_result: List[Dict[str, Any]],
+    workers: Optional[int] = None,
+    chunksize: int = SCORING_CHUNKSIZE,
+    label_store: Optional[LabelStore] = None,
+    score_cache: Optional[ScoreCache] = None,
+) -> List[Dict[str, Any]]:
+    """
+    accuracy_scoring 的多进程版本：样本按 chunksize 分片交给进程池，
+    结果按输入顺序写回，与串行评分完全一致。
+    """
+    workers = workers or os.cpu_count()
+    scored_result = deepcopy(model_result)
+    scored_records = iter_scored_records(scored_result, workers, chunksize, label_store=label_store, score_cache=score_cache)
+    for _ in tqdm(scored_records, desc="Scoring accuracy", total=len(scored_result)):
+        pass
+    return scored_result
+
+
+def score_fingerprint(single_result: Dict[str, Any], label_store: Optional[LabelStore] = None) -> str:
+    """
+    单条样本的评分指纹：qid、extracted_info、标注内容、观测 CSV 与地理划分 CSV 的哈希以及 SCORER_VERSION，
+    任一变化都会得到新的指纹。观测文件只计算哈希，不需要解析。
+    """
+    label_store = resolve_label_store(label_store)
+    qid = single_result['qid']
+    return make_score_fingerprint(
+        qid,
+        single_result['extracted_info'],
+        label_store.derived(qid, 'label_version', label_version),
+        OBSERVATION_STORE.csv_hash(label_store.csv_data_path(qid)),
+        cached_file_hash(get_geo_index().path),
+        SCORER_VERSION,
+    )
+
+
+def score_batch(
+    batch: List[Dict[str, Any]],
+    score_func: Callable[[List[Dict[str, Any]]], Iterable[Dict[str, Any]]],
+    label_store: LabelStore,
+    score_cache: Optional[ScoreCache] = None,
+) -> None:
+    """为一批样本写入 accuracy_score：先查评分缓存，只把未命中的样本交给 score_func，算完再写回缓存。"""
+    if score_cache is None:
+        pending = batch
+    else:
+        fingerprints = [score_fingerprint(single_result, label_store) for single_result in batch]
+        pending, pending_fingerprints = [], []
+        for single_result, fingerprint, cached_score in zip(batch, fingerprints, score_cache.get_many(fingerprints)):
+            if cached_score is None:
+                pending.append(single_result)
+                pending_fingerprints.append(fingerprint)
+            else:
+                single_result['accuracy_score'] = cached_score
+        PROFILER.count('score_cache.hit', len(batch) - len(pending))
+        PROFILER.count('score_cache.miss', len(pending))
+    if not pending:
+        return
+    # 进程池模式下单条评分在子进程中执行，这里的计时覆盖整批（含进程间传输）
+    with PROFILER.timer('stage_2.score_batch'):
+        for single_result, accuracy_score in zip(pending, score_func(pending)):
+            single_result['accuracy_score'] = accuracy_score
+    if score_cache is not None:
+        score_cache.set_many(
+            (fingerprint, single_result['qid'], single_result['accuracy_score'])
+            for fingerprint, single_result in zip(pending_fingerprints, pending)
+        )
+
+
+def iter_scored_records(
+    records: Iterable[Dict[str, Any]],
+    workers: int = 1,
+    chunksize: int = SCORING_CHUNKSIZE,
+    label_store: Optional[LabelStore] = None,
+    score_cache: Optional[ScoreCache] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    逐条产出带 accuracy_score 的样本，保持输入顺序：
+    workers <= 1 时串行评分；否则按批提交进程池，每批大小固定，避免一次性读入全部输入。
+    传入 score_cache 时按批查询 / 写回评分缓存，只有未命中的样本才会真正评分。
+    executor 为由 create_scoring_executor(workers, label_store) 创建的进程池时直接复用，调用方负责关闭。
+    """
+    label_store = resolve_label_store(label_store)
+    records = iter(records)
+
+    def _iter_batches(batch_size: int, score_func) -> Iterable[Dict[str, Any]]:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            score_batch(batch, score_func, label_store, score_cache)
+            yield from batch
+
+    if workers <= 1:
+        yield from _iter_batches(chunksize, lambda batch: accuracy_scoring_batch(batch, label_store))
+        return
+
+    # 只回传 accuracy_score 与性能统计增量，减少进程间序列化开销；worker 使用初始化时传入的 label_store
+    def _score_in_pool(pool: ProcessPoolExecutor) -> Iterable[Dict[str, Any]]:
+        return _iter_batches(workers * chunksize * 4, lambda batch: score_in_executor(pool, batch, chunksize))
+
+    if executor is not None:
+        yield from _score_in_pool(executor)
+        return
+    with create_scoring_executor(workers, label_store) as executor:
+        yield from _score_in_pool(executor)
+
+
+@PROFILER.timed('stage_2.accuracy_scoring_single')
+def accuracy_scoring_single(
+    single_result: Dict[str, Any],
+    label_store: Optional[LabelStore] = None,
+    score_temps: bool = True,
+) -> Dict[str, Any]:
+    """对单个抽取结果进行准确率评分；score_temps=False 时只求实际温度，温度得分留空（None）由 rescore_temp_accuracy 整批补齐"""
+    label_store = resolve_label_store(label_store)
+    # 预测侧的站点集合每条样本只推导一次，地理与温度评分共享
+    pred_station_sets = RegionStationSets(single_result['extracted_info'])
+    geo_accuracy_score = geo_accuracy_scoring(single_result, label_store, pred_station_sets)
+    temp_accuracy_score = temp_accuracy_scoring(single_result, label_store, pred_station_sets, score_temps=score_temps)
     accuracy_score = {
         'geo_accuracy': geo_accuracy_score,
         'temp_accuracy': temp_accuracy_score,
@@ -123,19 +463,75 @@ def accuracy_scoring_single(single_result: Dict[str, Any]) -> Dict[str, Any]:
     return accuracy_score
 
 
-def geo_accuracy_scoring(single_result: Dict[str, Any]) -> Dict[str, float]:
+@PROFILER.timed('stage_2.accuracy_scoring_batch')
+def accuracy_scoring_batch(batch: List[Dict[str, Any]], label_store: Optional[LabelStore] = None) -> List[Dict[str, Any]]:
+    """
+    accuracy_scoring_single 的批量版本，结果与逐条调用一致：
+    地理得分与实际温度区间逐条计算，温度得分由 rescore_temp_accuracy 对整批一次完成。
+    """
+    label_store = resolve_label_store(label_store)
+    accuracy_scores = [accuracy_scoring_single(single_result, label_store, score_temps=False) for single_result in batch]
+    rescore_temp_accuracy(batch, accuracy_scores, label_store)
+    return accuracy_scores
+
+
+def rescore_temp_accuracy(
+    records: List[Dict[str, Any]],
+    accuracy_scores: List[Dict[str, Any]],
+    label_store: Optional[LabelStore] = None,
+) -> None:
+    """
+    按 records 中的预测温度与 accuracy_scores 中已有的实际温度，整批重算 max_temp_score 与各区域 range_score（原地写回）：
+    全部 (预测, 实际) 对拼成列后各调用一次数组内核，与标量函数逐位一致；不读取观测文件，
+    评分规则调整后也可直接用于已有结果的重新打分。
+    """
+    label_store = resolve_label_store(label_store)
+    pred_max_temps, label_max_temps = [], []
+    region_scores, pred_lowers, pred_uppers, actual_lowers, actual_uppers = [], [], [], [], []
+    for single_result, accuracy_score in zip(records, accuracy_scores):
+        extracted_info = single_result['extracted_info']
+        temp_accuracy_score = accuracy_score['temp_accuracy']
+        pred_max_temps.append((extracted_info.get('max_temp') or {}).get('tmax', None))
+        label_max_temps.append((label_store.extracted_info(single_result['qid']).get('max_temp') or {}).get('tmax', None))
+        regions = [(extracted_info.get('other_regions') or {}, temp_accuracy_score['other_regions_temp_score'])]
+        regions.extend(zip(extracted_info.get('specific_regions', []), temp_accuracy_score['specific_regions_temp_scores']))
+        for region_info, region_score in regions:
+            region_scores.append(region_score)
+            pred_lowers.append(region_info.get('tmax_min', None))
+            pred_uppers.append(region_info.get('tmax_max', None))
+            actual_lowers.append(region_score['actual_tmax_min'])
+            actual_uppers.append(region_score['actual_tmax_max'])
+
+    max_temp_scores = number_precise_scoring_array(to_float_array(pred_max_temps), to_float_array(label_max_temps)).tolist()
+    range_scores = number_range_scoring_array(
+        to_float_array(pred_lowers), to_float_array(pred_uppers), to_float_array(actual_lowers), to_float_array(actual_uppers),
+    ).tolist()
+    for accuracy_score, max_temp_score in zip(accuracy_scores, max_temp_scores):
+        accuracy_score['temp_accuracy']['max_temp_score'] = max_temp_score
+    for region_score, range_score in zip(region_scores, range_scores):
+        region_score['range_score'] = range_score
+
+
+@PROFILER.timed('stage_2.geo_accuracy_scoring')
+def geo_accuracy_scoring(
+    single_result: Dict[str, Any],
+    label_store: Optional[LabelStore] = None,
+    pred_station_sets: Optional['RegionStationSets'] = None,
+) -> Dict[str, float]:
     """计算地理维度的三个子项 IoU 分数。"""
     single_result_extracted_info = single_result['extracted_info']
+    if pred_station_sets is None:
+        pred_station_sets = RegionStationSets(single_result_extracted_info)
     # 根据 qid 获取标准答案的抽取结果
-    label_extracted_info = LABEL_DICT[single_result['qid']]['extracted_info']
+    label_store = resolve_label_store(label_store)
+    label_extracted_info = label_store.extracted_info(single_result['qid'])
     # 计算 max_temp 部分的地理准确率
     single_max_temp = single_result_extracted_info.get('max_temp') or {}
     label_max_temp = label_extracted_info.get('max_temp') or {}
     max_temp_geo_iou = geo_list_iou(single_max_temp.get('std_geo', []), label_max_temp.get('std_geo', []))
-    # 依靠 station id 的集合计算 other_temp 的 IoU
-    label_other_station_id = get_other_station_id(label_extracted_info)
-    single_result_other_station_id = get_other_station_id(single_result_extracted_info)
-    other_regions_geo_iou = set_iou(label_other_station_id, single_result_other_station_id)
+    # other 区域为未覆盖站点，其 IoU 即两侧覆盖范围补集的 IoU
+    label_covered_geo = get_label_station_sets(single_result['qid'], label_store).covered_geo
+    other_regions_geo_iou = get_geo_index().hierarchy.complement_iou(label_covered_geo, pred_station_sets.covered_geo)
     # 计算 specific_regions 部分的地理准确率
     single_result_geo_list_list = get_std_geo_list(single_result_extracted_info)
     label_geo_list_list = get_std_geo_list(label_extracted_info)
@@ -158,43 +554,82 @@ def get_std_geo_list(extracted_info: Dict[str, Any]) -> List[List[str]]:
     return geo_list_list
 
 
+class RegionStationSets:
+    """
+    由一条 extracted_info 推导出的地理范围，供地理与温度评分共享：
+    - covered_geo：specific_regions 与 max_temp 的全部标准名称，other 区域即其补集；
+    - specific_regions：每个 specific region 的站点 ID 列表（已排序）；
+    - other / other_sorted：其余站点（全集减去以上两者）及其排序列表。
+    站点列表在首次访问时才展开；other 的 IoU 由 GeoHierarchy 在节点上计算，标注侧通常无需展开。
+    """
+
+    def __init__(self, extracted_info: Dict[str, Any]):
+        self.specific_geo: List[List[str]] = [region.get('std_geo', []) for region in extracted_info.get('specific_regions', [])]
+        max_temp_geo = (extracted_info.get('max_temp') or {}).get('std_geo', [])
+        self.covered_geo: List[str] = [geo for geo_list in self.specific_geo for geo in geo_list] + list(max_temp_geo)
+
+    @cached_property
+    def specific_regions(self) -> List[List[str]]:
+        return [geo_list_to_stationid(geo_list) for geo_list in self.specific_geo]
+
+    @cached_property
+    def other_sorted(self) -> List[str]:
+        # 所有站点减去已出现的站点即为 other station
+        return get_geo_index().geo_list_complement_stationid(self.covered_geo)
+
+    @cached_property
+    def other(self) -> Set[str]:
+        return set(self.other_sorted)
+
+
+def get_label_station_sets(qid: str, label_store: Optional[LabelStore] = None) -> RegionStationSets:
+    """标注侧的站点集合按 qid 缓存在 label_store 中，整个运行期间只推导一次。"""
+    return resolve_label_store(label_store).derived(
+        qid, 'region_station_sets', lambda label: RegionStationSets(label['extracted_info'])
+    )
+
+
 def get_other_station_id(extracted_info: Dict[str, Any]) -> Set[str]:
     """获取除 specific_regions / max_temp 外其余站点对应的 station id 集合。"""
-    stationid_without_other: Set[str] = set()
-    # 收集 specific_regions 占用的 station id
-    for region in extracted_info.get('specific_regions', []):
-        stationid_without_other.update(geo_list_to_stationid(region.get('std_geo', [])))
-    # 以及 max_temp 所覆盖的站点
-    max_temp_geo = (extracted_info.get('max_temp') or {}).get('std_geo', [])
-    stationid_without_other.update(geo_list_to_stationid(max_temp_geo))
-    # 所有站点减去已出现的站点即为 other station
-    other_station_id = get_station_id_set() - stationid_without_other
-    return other_station_id
+    return RegionStationSets(extracted_info).other
 
 
-def temp_accuracy_scoring(single_result: Dict[str, Any]) -> Dict[str, Any]:
-    """计算温度维度的单值与区间得分。"""
+@PROFILER.timed('stage_2.temp_accuracy_scoring')
+def temp_accuracy_scoring(
+    single_result: Dict[str, Any],
+    label_store: Optional[LabelStore] = None,
+    pred_station_sets: Optional[RegionStationSets] = None,
+    score_temps: bool = True,
+) -> Dict[str, Any]:
+    """计算温度维度的单值与区间得分；score_temps=False 时只求实际温度区间，得分记为 None。"""
     qid = single_result['qid']
     single_result_extracted_info = single_result['extracted_info']
+    if pred_station_sets is None:
+        pred_station_sets = RegionStationSets(single_result_extracted_info)
     # 根据 qid 获取标准答案的抽取结果
-    label_extracted_info = LABEL_DICT[qid]['extracted_info']
+    label_store = resolve_label_store(label_store)
+    label_extracted_info = label_store.extracted_info(qid)
     # 计算 max_temp 部分的温度准确率
     single_max_temp = (single_result_extracted_info.get('max_temp') or {}).get('tmax', None)
     label_max_temp = (label_extracted_info.get('max_temp') or {}).get('tmax', None)
-    max_temp_score = number_precise_scoring(single_max_temp, label_max_temp)
+    max_temp_score = number_precise_scoring(single_max_temp, label_max_temp) if score_temps else None
     # 计算 other_temp 部分的温度准确率
     other_regions_temp_score = get_range_score_for_temp_by_station_id_list(
-        get_other_station_id(single_result_extracted_info), # 获取 other 部分的站点 id
+        pred_station_sets.other_sorted, # 获取 other 部分的站点 id，排序保证温度求和顺序与进程无关
         single_result_extracted_info.get('other_regions', {}) if single_result_extracted_info.get('other_regions') else {},
-        qid
+        qid,
+        label_store,
+        score_temps,
     )
     # 计算 specific_regions 部分的温度准确率
     specific_regions_temp_scores = []
-    for region in single_result_extracted_info.get('specific_regions', []):
+    for region, region_station_ids in zip(single_result_extracted_info.get('specific_regions', []), pred_station_sets.specific_regions):
         region_temp_score = get_range_score_for_temp_by_station_id_list(
-            geo_list_to_stationid(region.get('std_geo', [])),
+            region_station_ids,
             region,
-            qid
+            qid,
+            label_store,
+            score_temps,
         )
         specific_regions_temp_scores.append(region_temp_score)
     
@@ -210,15 +645,19 @@ def get_range_score_for_temp_by_station_id_list(
     station_id_list: Iterable[str],
     region_info: Dict[str, Any],
     qid: str,
+    label_store: Optional[LabelStore] = None,
+    score_temps: bool = True,
 ) -> Dict[str, Optional[float]]:
-    """根据站点集合计算实际温度区间，并与模型区间作 number_range_scoring。"""
-    actual_temp_lower, actual_temp_upper = get_actual_temp_lower_upper(station_id_list, qid)
+    """根据站点集合计算实际温度区间，并与模型区间作 number_range_scoring（score_temps=False 时得分记为 None）。"""
+    actual_temp_lower, actual_temp_upper = get_actual_temp_lower_upper(station_id_list, qid, label_store)
     pred_temp_lower = region_info.get('tmax_min', None)
     pred_temp_upper = region_info.get('tmax_max', None)
-    range_score = number_range_scoring(
-        (pred_temp_lower, pred_temp_upper),
-        (actual_temp_lower, actual_temp_upper)
-    )
+    range_score = None
+    if score_temps:
+        range_score = number_range_scoring(
+            (pred_temp_lower, pred_temp_upper),
+            (actual_temp_lower, actual_temp_upper)
+        )
     return {
         'actual_tmax_min': actual_temp_lower,
         'actual_tmax_max': actual_temp_upper,
@@ -229,31 +668,92 @@ def get_range_score_for_temp_by_station_id_list(
 def get_actual_temp_lower_upper(
     station_id_list: Iterable[str],
     qid: str,
+    label_store: Optional[LabelStore] = None,
 ) -> Tuple[Optional[float], Optional[float]]:
-    """从站点列表获取实际温度的上下界（去除离群值后）。"""
-    temp_list = get_actual_temp_list(station_id_list, qid)
+    """
+    从站点列表获取实际温度的上下界（去除离群值后）。
+    站点按 ID 排序后参与计算，结果以 (观测文件键, 站点集合指纹) 为键记入 TEMP_RANGE_MEMO，重复的组合直接查表；
+    观测文件键见 ObservationStore.memo_key，未启用落盘缓存时不读取文件内容。
+    """
+    temp_csv_path = resolve_label_store(label_store).csv_data_path(qid)
+    station_ids = sorted(station_id_list)
+    key = (OBSERVATION_STORE.memo_key(temp_csv_path), station_set_fingerprint(station_ids))
+    temp_range = TEMP_RANGE_MEMO.get(key)
+    if temp_range is None:
+        temp_range = compute_temp_range(temp_csv_path, station_ids)
+        TEMP_RANGE_MEMO.set(key, temp_range)
+    temp_lower, temp_upper, missing_station_ids = temp_range
+    for station_id in missing_station_ids:
+        print(f"Station ID {station_id} not found in CSV for QID {qid}.")
+    return temp_lower, temp_upper
+
+
+@PROFILER.timed('stage_2.compute_temp_range')
+def compute_temp_range(temp_csv_path: str, station_ids: List[str]) -> Tuple[Optional[float], Optional[float], Tuple[str, ...]]:
+    """按给定顺序取出站点温度，去除离群值后返回 (最低温, 最高温, 未找到的站点 ID)。"""
+    temp_list, missing_station_ids = OBSERVATION_STORE.gather_tmax(temp_csv_path, station_ids)
     temp_list_no_outliers = remove_outliers(temp_list)
     if len(temp_list_no_outliers) == 0:
-        return None, None
-    return min(temp_list_no_outliers), max(temp_list_no_outliers)
-
-
-def get_actual_temp_list(station_id_list: Iterable[str], qid: str) -> List[float]:
-    """读取对应 csv，提取 stationid 的 tmax 序列。"""
-    # 加载 csv 数据
-    temp_csv_path = LABEL_DICT[qid]['input']['csv_data_path']
-    csv_path = os.path.join(CSV_FOLDER, temp_csv_path)
-    df = pd.read_csv(csv_path)
-    # df 的 stationid 列转为 str
-    df['stationid'] = df['stationid'].astype(str)
-    # 按照 stationid 筛选
-    temp_list = []
-    for station_id in station_id_list:
-        temp_value = df.loc[df['stationid'] == station_id, 'tmax'].values
-        if len(temp_value) > 0:
-            temp_list.append(float(temp_value[0]))
+        return None, None, tuple(missing_station_ids)
+    return min(temp_list_no_outliers), max(temp_list_no_outliers), tuple(missing_station_ids)
+
+
+@PROFILER.timed('stage_2.compute_temp_ranges_batch')
+def compute_temp_ranges_batch(
+    temp_csv_path: str,
+    station_id_lists: List[List[str]],
+) -> List[Tuple[Optional[float], Optional[float], Tuple[str, ...]]]:
+    """compute_temp_range 的批量版本：各站点集合的温度首尾相接，一次完成离群值过滤与区间计算。"""
+    gathered = [OBSERVATION_STORE.gather_tmax(temp_csv_path, station_ids) for station_ids in station_id_lists]
+    values = np.array([temp for temp_list, _ in gathered for temp in temp_list], dtype=np.float64)
+    lengths = np.array([len(temp_list) for temp_list, _ in gathered], dtype=np.int64)
+    lower, upper = grouped_min_max_without_outliers(values, lengths)
+    temp_ranges = []
+    for (_, missing_station_ids), temp_lower, temp_upper in zip(gathered, lower.tolist(), upper.tolist()):
+        # 空组（或全部被过滤）为 NaN，对应标量版的 (None, None)
+        if np.isnan(temp_lower):
+            temp_ranges.append((None, None, tuple(missing_station_ids)))
+        else:
+            temp_ranges.append((temp_lower, temp_upper, tuple(missing_station_ids)))
+    return temp_ranges
+
+
+def precompute_temp_ranges(
+    csv_data_paths: Iterable[str],
+    geo_names: Optional[Iterable[str]] = None,
+    vectorized: bool = VECTORIZED_TEMP_RANGES,
+) -> int:
+    """
+    预先为每个 标准地理名称 × 观测文件 计算温度区间并写入 TEMP_RANGE_MEMO（geo_names 默认为全部标准名称），
+    之后只含单个标准名称的区域评分直接查表。应在创建评分进程池之前调用，子进程随 fork 继承。返回新计算的条目数。
+    """
+    geo_index = get_geo_index()
+    station_sets = {}
+    for geo_name in (geo_index.std_geo_list if geo_names is None else geo_names):
+        station_ids = geo_index.geo_list_to_stationid([geo_name])
+        station_sets.setdefault(station_set_fingerprint(station_ids), station_ids)
+    computed = 0
+    for temp_csv_path in dict.fromkeys(csv_data_paths):
+        csv_key = OBSERVATION_STORE.memo_key(temp_csv_path)
+        pending = [(fingerprint, station_ids) for fingerprint, station_ids in station_sets.items() if (csv_key, fingerprint) not in TEMP_RANGE_MEMO]
+        if vectorized:
+            temp_ranges = compute_temp_ranges_batch(temp_csv_path, [station_ids for _, station_ids in pending])
         else:
-            print(f"Station ID {station_id} not found in CSV for QID {qid}.")
+            temp_ranges = [compute_temp_range(temp_csv_path, station_ids) for _, station_ids in pending]
+        for (fingerprint, _), temp_range in zip(pending, temp_ranges):
+            TEMP_RANGE_MEMO.set((csv_key, fingerprint), temp_range)
+        computed += len(pending)
+    return computed
+
+
+@PROFILER.timed('stage_2.get_actual_temp_list')
+def get_actual_temp_list(station_id_list: Iterable[str], qid: str, label_store: Optional[LabelStore] = None) -> List[float]:
+    """从观测缓存中按 stationid 取出对应 csv 的 tmax 序列。"""
+    temp_csv_path = resolve_label_store(label_store).csv_data_path(qid)
+    # 观测数据每个 csv 只解析一次，这里是一次向量化的按站点取值
+    temp_list, missing_station_ids = OBSERVATION_STORE.gather_tmax(temp_csv_path, station_id_list)
+    for station_id in missing_station_ids:
+        print(f"Station ID {station_id} not found in CSV for QID {qid}.")
     return temp_list
 
 
@@ -273,20 +773,46 @@ def remove_outliers(temp_list: List[float]) -> List[float]:
 
 ############# 主逻辑
 
-def main(input_path: str = DEFAULT_INPUT_PATH, output_path: str = DEFAULT_OUTPUT_PATH, summary_output_path: str = SUMMARY_OUTPUT_PATH) -> None:
-    """命令行入口：读取默认输入，执行评分并写入结果。"""
-    # 加载 json 数据
-    model_result = load_json(input_path)
-
-    # 逐条打分并附在原始结果中
-    model_result_with_accuracy_score = accuracy_scoring(model_result)
-    summary_result = summary(model_result_with_accuracy_score)
+def main(
+    input_path: str = DEFAULT_INPUT_PATH,
+    output_path: str = DEFAULT_OUTPUT_PATH,
+    summary_output_path: str = SUMMARY_OUTPUT_PATH,
+    stream: bool = STREAM_SCORING,
+    workers: int = SCORING_WORKERS,
+    score_cache_path: Optional[str] = SCORE_CACHE_PATH,
+) -> None:
+    """
+    命令行入口：读取默认输入，执行评分并写入结果；
+    stream=True（或 STREAM_SCORING = True）时逐条读写，内存占用恒定，默认整体加载；workers > 1 时使用多进程并行评分；
+    score_cache_path 不为 None 时复用未变化样本的评分，并在结束时打印命中率。
+    """
+    score_cache = ScoreCache(score_cache_path) if score_cache_path is not None else None
+    if PRECOMPUTE_TEMP_RANGES:
+        csv_data_paths = [label['input']['csv_data_path'] for label in iter_records(LABEL_JSON_PATH)]
+        print(f"Precomputed {precompute_temp_ranges(csv_data_paths)} temperature ranges.")
+    if stream:
+        summary_result = accuracy_scoring_stream(input_path, output_path, workers=workers, score_cache=score_cache)
+    else:
+        # 加载输入数据（格式由扩展名决定）
+        model_result = load_records(input_path)
+
+        # 逐条打分并附在原始结果中
+        if workers > 1:
+            model_result_with_accuracy_score = accuracy_scoring_parallel(model_result, workers=workers, score_cache=score_cache)
+        else:
+            model_result_with_accuracy_score = accuracy_scoring(model_result, score_cache=score_cache)
+        summary_result = summary(model_result_with_accuracy_score)
 
-    # 保存 json 数据
-    save_json(model_result_with_accuracy_score, output_path)
+        # 保存评分结果（格式由扩展名决定）
+        save_records(model_result_with_accuracy_score, output_path)
     
     # 保存 summary 文件
     print("Summary scores:", summary_result)
+    if score_cache is not None:
+        print("Score cache:", score_cache.stats())
+        score_cache.close()
+    LABEL_STORE.close()
+    PROFILER.dump(profile_report_path(output_path))
     save_json(summary_result, summary_output_path)
 
 if __name__ == '__main__':
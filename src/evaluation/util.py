@@ -1,80 +1,107 @@
-import pandas as pd
+from evaluation.geo_index import get_geo_index
+from evaluation.geo_memo import GEO_ERROR_NAME, GeoStandardizeMemo, get_geo_memo
+from evaluation.geo_rule_matcher import get_geo_rule_matcher
 from model.call_api import call_llm_for_data_cleaning_or_analysis
 from prompt.evaluation_prompt import UTIL_PROMPT
-from util.data_process import get_geo_division, str_to_json
+from util.data_process import str_to_json
+from util.profiler import PROFILER
 
 
 def get_geo_stationid_map() -> dict[str, list[str]]:
     """获取地理位置名称到站点ID的映射字典"""
-    geo_division_df = get_geo_division()
-    # 遍历所有列，收集地理位置名称和对应的站点ID
-    geo_stationid_map = {}
-    for _, row in geo_division_df.iterrows():
-        station_id = row['站号+A:K']
-        for column in geo_division_df.columns[1:]:
-            geo_name = row[column]
-            # 若非空
-            if pd.notna(geo_name):
-                if geo_name not in geo_stationid_map:
-                    geo_stationid_map[geo_name] = []
-                geo_stationid_map[geo_name].append(station_id)
-    return geo_stationid_map
+    return get_geo_index().geo_stationid_map
 
 
 def get_geo_dict_list():
     """获取地理位置名称列表"""
-    geo_division_df = get_geo_division()
-    # 遍历所有列，收集地理位置名称（跳过第一列）
-    std_geo_dict_list = {}
-    for column in geo_division_df.columns[1:]:
-        std_geo_dict_list[column] = geo_division_df[column].dropna().unique().tolist()
-    return std_geo_dict_list
+    return get_geo_index().geo_dict_list
 
 
 def get_geo_list():
-    geo_dict_list = get_geo_dict_list()
-    std_geo_list = []
-    for _, names in geo_dict_list.items():
-        std_geo_list.extend(names)
-    return std_geo_list
+    return get_geo_index().std_geo_list
 
 
-def get_station_id_set():
-    """获取所有站点ID的集合"""
-    geo_division_df = get_geo_division()
-    station_id_set = set(geo_division_df['站号+A:K'].tolist())
-    return station_id_set
-
+def get_geo_set():
+    """获取标准地理位置名称集合，用于 O(1) 判断是否已标准化"""
+    return get_geo_index().std_geo_set
 
-def geo_standardize(geo_list: list[str]) -> list[str]:
-    """对地理位置名称进行标准化处理"""
-    from model.client import ModelClient
 
-    client = ModelClient()
-    # 加载标准化的地理位置名称列表和字典
-    std_geo_list = get_geo_list()
-    std_geo_dict_list = get_geo_dict_list()
-
-    # 去掉多余空格，记录所有未匹配到标准表的地理位置索引
+def get_station_id_set():
+    """获取所有站点ID的集合"""
+    return get_geo_index().station_id_set
+
+
+def geo_standardize(
+    geo_list: list[str],
+    memo: GeoStandardizeMemo = None,
+    use_rules: bool = True,
+    failed_geo: set[str] = None,
+) -> list[str]:
+    """
+    对地理位置名称进行标准化处理：标准表 -> 规则匹配（别名、前后缀、简称、n-gram）-> 备忘录 -> LLM，
+    只有前几层都无法确定的名称才会请求 LLM。
+    failed_geo 为本次运行中 LLM 重试后仍未确认的名称集合：其中的名称直接返回 error_ 结果、不再请求，
+    新的失败名称会加入该集合（备忘录只记录已确认的结果，避免同一名称在每条样本中重复请求）。
+    """
+    if memo is None:
+        memo = get_geo_memo()
+    # 加载标准化的地理位置名称集合和字典
+    std_geo_set = get_geo_set()
+    rule_matcher = get_geo_rule_matcher() if use_rules else None
+
+    # 去掉多余空格，先查标准表与规则，再查备忘录，记录仍未匹配的地理位置索引
     not_standardized_idx = []
     geo_list = [geo.strip() for geo in geo_list]
     for idx, geo in enumerate(geo_list):
-        if geo not in std_geo_list:
+        if geo in std_geo_set:
+            PROFILER.count('geo_standardize.already_standard')
+            continue
+        rule_std_geo = rule_matcher.match(geo) if rule_matcher is not None else None
+        if rule_std_geo is not None:
+            geo_list[idx] = rule_std_geo
+    memo_hits = memo.lookup(geo for geo in geo_list if geo not in std_geo_set)
+    for idx, geo in enumerate(geo_list):
+        if geo in std_geo_set:
+            continue
+        memo_std_geo = memo_hits.get(geo)
+        # 标准表更新后，备忘录中失效的名称需重新标准化
+        if memo_std_geo is not None and (memo_std_geo in std_geo_set or memo_std_geo == GEO_ERROR_NAME):
+            PROFILER.count('geo_memo.hit')
+            geo_list[idx] = memo_std_geo
+        elif failed_geo is not None and geo in failed_geo:
+            PROFILER.count('geo_standardize.known_failed')
+            geo_list[idx] = f"error_{geo}"
+        else:
+            PROFILER.count('geo_memo.miss')
             not_standardized_idx.append(idx)
-    
-    not_standardized_geo = [geo_list[idx] for idx in not_standardized_idx]
 
-    # 对未标准化的地理位置名称进行处理
-    # print(f"未标准化的地理位置名称: {not_standardized_geo}")
-    llm_standardized_geo = geo_standardize_by_llm(client, std_geo_list, std_geo_dict_list, not_standardized_geo)
+    if not not_standardized_idx:
+        return geo_list
 
-    for i, idx in enumerate(not_standardized_idx):
-        geo_list[idx] = llm_standardized_geo[i]
+    # 只把去重后的未知名称交给 LLM
+    not_standardized_geo = list(dict.fromkeys(geo_list[idx] for idx in not_standardized_idx))
+    # print(f"未标准化的地理位置名称: {not_standardized_geo}")
+    from model.client import get_model_client
+
+    client = get_model_client()
+    llm_standardized_geo = geo_standardize_by_llm(client, std_geo_set, get_geo_dict_list(), not_standardized_geo)
+    llm_geo_map = dict(zip(not_standardized_geo, llm_standardized_geo))
+    # 只有确认过的结果才写入备忘录，error_ 前缀的留待下次重试
+    memo.update({
+        ori_geo: std_geo for ori_geo, std_geo in llm_geo_map.items()
+        if std_geo in std_geo_set or std_geo == GEO_ERROR_NAME
+    })
+    if failed_geo is not None:
+        failed_geo.update(ori_geo for ori_geo, std_geo in llm_geo_map.items() if std_geo not in std_geo_set and std_geo != GEO_ERROR_NAME)
+
+    for idx in not_standardized_idx:
+        geo_list[idx] = llm_geo_map[geo_list[idx]]
     
     return geo_list
 
 
-def geo_standardize_by_llm(client, std_geo_list, std_geo_dict_list, geo_list: list[str]) -> list[str]:
+@PROFILER.timed('geo_standardize.by_llm')
+def geo_standardize_by_llm(client, std_geo_set, std_geo_dict_list, geo_list: list[str]) -> list[str]:
     """将自然语言描述转化为结构化 JSON"""
     prompt = UTIL_PROMPT.GEO_STANDARDIZE  # 固定提示词模板
 
@@ -89,6 +116,8 @@ def geo_standardize_by_llm(client, std_geo_list, std_geo_dict_list, geo_list: li
 
     while not finish_process and attempts < max_attempts:
         attempts += 1
+        if attempts > 1:
+            PROFILER.count('geo_standardize.retry')
         try:
             # 调用模型进行地理位置名称标准化
             orgnized_prompt = prompt.format(geo_list={"ori_geo": res_geo_list}, std_geo_dict_list=std_geo_dict_list)
@@ -97,15 +126,19 @@ def geo_standardize_by_llm(client, std_geo_list, std_geo_dict_list, geo_list: li
                 client=client,
                 model="deepseek-ai/DeepSeek-V3",
                 prompt=orgnized_prompt,
+                attempt=attempts,
             )
 
             response_json = str_to_json(response)
             llm_std_geo = response_json['std_geo']
+            # 批量请求时若返回条数对不上，无法确定对应关系，整批重试
+            if len(llm_std_geo) != len(res_geo_list):
+                raise ValueError(f"Expected {len(res_geo_list)} std_geo, got {len(llm_std_geo)}.")
             
             # 检查模型规范化的地理位置名称是否在标准列表中
             new_res_geo_list = []
             for ori_geo, std_geo in zip(res_geo_list, llm_std_geo):
-                if std_geo in std_geo_list or std_geo == "地区错误":
+                if std_geo in std_geo_set or std_geo == GEO_ERROR_NAME:
                     geo_map_dict[ori_geo] = std_geo
                 else:
                     new_res_geo_list.append(ori_geo)
@@ -124,11 +157,5 @@ def geo_standardize_by_llm(client, std_geo_list, std_geo_dict_list, geo_list: li
 
 def geo_list_to_stationid(geo_list: list[str]) -> list[str]:
     """将地理位置名称转换为对应的站点ID列表"""
-    geo_stationid_map = get_geo_stationid_map()
-    stationid_set = set()
-    for geo in geo_list:
-        if geo in geo_stationid_map:
-            stationid_set.update(geo_stationid_map[geo])
     # 从小到大排序返回站点ID列表
-    stationid_list = sorted(list(stationid_set))
-    return stationid_list
+    return get_geo_index().geo_list_to_stationid(geo_list)
@@ -1,9 +1,24 @@
-def call_llm_for_data_cleaning_or_analysis(client, model, prompt):
+def call_llm_for_data_cleaning_or_analysis(client, model, prompt, attempt=1):
     response = client.chat_with_prompt_return_text(
         model=model,
         prompt=prompt,
         temperature=1.0,
         response_format={'type': 'json_object'},
+        # 调用方校验失败后重试时 attempt 递增，缓存不会回放上一次的无效响应
+        cache_attempt=attempt,
     )
 
-    return response
\ No newline at end of file
+    return response
+
+
+async def acall_llm_for_data_cleaning_or_analysis(client, model, prompt, attempt=1):
+    response = await client.achat_with_prompt_return_text(
+        model=model,
+        prompt=prompt,
+        temperature=1.0,
+        response_format={'type': 'json_object'},
+        # 调用方校验失败后重试时 attempt 递增，缓存不会回放上一次的无效响应
+        cache_attempt=attempt,
+    )
+
+    return response
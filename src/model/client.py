@@ -1,43 +1,303 @@
+import asyncio
+import random
+import threading
 import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
 
-from openai import OpenAI, RateLimitError
+import httpx
+from openai import (APIConnectionError, AsyncOpenAI, InternalServerError,
+                    OpenAI, RateLimitError)
+from openai.types.chat import ChatCompletion
+from model.response_cache import CACHE_MODE_REPLAY, CacheMissError, ResponseCache, get_response_cache
+from util.async_runner import AdaptiveConcurrencyLimiter, register_loop_cleanup
 from util.config import load_config
+from util.profiler import PROFILER
+
+MAX_ATTEMPTS = 5           # 单个请求的最大尝试次数
+BACKOFF_BASE_SECOND = 1.0  # 指数退避的初始等待
+BACKOFF_MAX_SECOND = 60.0  # 单次等待上限
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)  # 同步与异步请求共用的可重试错误
+# HTTP 连接池默认参数，可在 config.yaml 的 llm_api.xxx.http_pool 节点覆盖
+DEFAULT_HTTP_POOL = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "timeout": 600.0,
+}
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """从 429 响应头中解析服务端建议的等待时间（retry-after-ms / retry-after）。"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    # retry-after 也可能是 HTTP 日期格式
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt: int, retry_after: Optional[float] = None) -> float:
+    """带抖动的指数退避；服务端给出 Retry-After 时以其为准再加少量抖动。"""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX_SECOND) + random.uniform(0, BACKOFF_BASE_SECOND)
+    delay = min(BACKOFF_MAX_SECOND, BACKOFF_BASE_SECOND * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_pending_seconds(error: Exception, attempt: int) -> float:
+    """
+    同步 / 异步请求共用的重试规则（error 为 RETRYABLE_ERRORS 之一）：返回第 attempt 次失败后的等待秒数并记录重试计数。
+    429 按 Retry-After / 指数退避等待；连接错误与 5xx 视为瞬时错误，按指数退避等待。
+    """
+    if isinstance(error, RateLimitError):
+        PROFILER.count('llm.retry.rate_limited')
+        pending_second = backoff_seconds(attempt, retry_after_seconds(error))
+        print(f"Rate limit exceeded. Pending for {pending_second:.1f} second...")
+    else:
+        PROFILER.count('llm.retry.transient')
+        pending_second = backoff_seconds(attempt)
+        print(f"Transient API error: {error}. Pending for {pending_second:.1f} second...")
+    return pending_second
+
+
+class HttpPoolStats:
+    """通过 httpx 事件钩子统计请求数与在途请求数，线程安全。"""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, response: httpx.Response) -> None:
+        with self._lock:
+            self.responses += 1
+
+    async def aon_request(self, request: httpx.Request) -> None:
+        self.on_request(request)
+
+    async def aon_response(self, response: httpx.Response) -> None:
+        self.on_response(response)
+
+
+def _connection_counts(http_client: Any) -> Dict[str, int]:
+    """读取 httpx 底层连接池（httpcore）中的连接数，取不到时返回空字典。"""
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    return {
+        "connections": len(connections),
+        "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+    }
 
 
 class ModelClient:
-    def __init__(self, api_type: str = None):
-        self.config = self.load_api_config(api_type=api_type)
+    def __init__(self, api_type: str = None, cache: ResponseCache = None):
+        config = load_config()
+        self.config = self.load_api_config(api_type=api_type, config=config)
+        # 同一 client 的所有请求共享一个 httpx 连接池，复用 keep-alive 连接
+        self.http_pool = {**DEFAULT_HTTP_POOL, **(self.config.get("http_pool") or {})}
+        self.pool_stats_counter = HttpPoolStats()
+        self.http_client = httpx.Client(
+            limits=self._http_limits(),
+            timeout=self.http_pool["timeout"],
+            event_hooks={
+                "request": [self.pool_stats_counter.on_request],
+                "response": [self.pool_stats_counter.on_response],
+            },
+        )
+        # 重试交给 _chat_with_messages，与异步路径使用同一套规则
         self.client = OpenAI(
             api_key=self.config["api_key"], 
-            base_url=self.config["base_url"]
+            base_url=self.config["base_url"],
+            max_retries=0,
+            http_client=self.http_client,
+        )
+        # 响应缓存为可选项：显式传入，或在 config.yaml 中配置 llm_cache 节点
+        if cache is None and config.get("llm_cache"):
+            cache = get_response_cache(config["llm_cache"])
+        self.cache = cache
+        # 异步路径：AsyncOpenAI 绑定事件循环，按需创建；并发上限由 AIMD 限流器自适应调整
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        concurrency = self.config.get("concurrency") or {}
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=concurrency.get("initial", 5),
+            min_limit=concurrency.get("min", 1),
+            max_limit=concurrency.get("max", 64),
+            latency_target=concurrency.get("latency_target"),
+            decrease_factor=concurrency.get("decrease_factor", 0.5),
+            latency_decrease_factor=concurrency.get("latency_decrease_factor", 0.9),
         )
 
-    def load_api_config(self, api_type: str = None) -> dict:
-        config = load_config()
+    def _http_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.http_pool["max_connections"],
+            max_keepalive_connections=self.http_pool["max_keepalive_connections"],
+            keepalive_expiry=self.http_pool["keepalive_expiry"],
+        )
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """连接池统计：请求/响应计数、在途数、当前连接数及限流器状态。"""
+        counter = self.pool_stats_counter
+        stats = {
+            "requests": counter.requests,
+            "responses": counter.responses,
+            "in_flight": counter.requests - counter.responses,
+            "limits": {key: self.http_pool[key] for key in ("max_connections", "max_keepalive_connections", "keepalive_expiry")},
+            "async_limit": self.limiter.limit,
+        }
+        stats.update(_connection_counts(self.http_client))
+        return stats
+
+    def load_api_config(self, api_type: str = None, config: dict = None) -> dict:
+        if config is None:
+            config = load_config()
         if api_type is None:
             api_type = config["llm_api"]["default"]
         api_config = config["llm_api"][api_type]
         return api_config
 
-    def chat_with_messages(self, model: str, messages: list, **kwargs) -> dict:
-        PENDING_SECOND = 5
-        MAX_ATTEMPTS = 5
+    def _cache_lookup(self, model: str, messages: list, kwargs: Dict[str, Any], attempt: int) -> Tuple[Optional[str], Optional[ChatCompletion]]:
+        """返回 (缓存 key, 命中的响应)；未配置缓存时 key 为 None，回放模式未命中时抛出 CacheMissError。"""
+        if self.cache is None:
+            return None, None
+        # 相同 (model, messages, kwargs, attempt) 的请求直接复用缓存中的响应
+        key = ResponseCache.make_key(model, messages, kwargs, attempt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            PROFILER.count('llm_cache.hit')
+            return key, ChatCompletion.model_validate_json(cached)
+        PROFILER.count('llm_cache.miss')
+        if self.cache.mode == CACHE_MODE_REPLAY:
+            raise CacheMissError(f"No cached response for request {key} in replay mode.")
+        return key, None
+
+    def _cache_store(self, key: Optional[str], response: ChatCompletion) -> None:
+        if key is not None:
+            self.cache.set(key, response.model_dump_json())
+
+    def chat_with_messages(self, model: str, messages: list, cache_attempt: int = 1, **kwargs) -> dict:
+        """cache_attempt 为调用方重试的序号，只参与缓存 key，不发送给接口。"""
+        key, cached = self._cache_lookup(model, messages, kwargs, cache_attempt)
+        if cached is not None:
+            return cached
+        response = self._chat_with_messages(model=model, messages=messages, **kwargs)
+        self._cache_store(key, response)
+        return response
+
+    def _chat_with_messages(self, model: str, messages: list, **kwargs) -> dict:
         attempts = 0
         while attempts < MAX_ATTEMPTS:
             try:
                 attempts += 1
-                response = self.client.chat.completions.create(
+                with PROFILER.timer('llm.request'):
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **kwargs
+                    )
+                PROFILER.add_usage(getattr(response, 'usage', None))
+                return response
+            except RETRYABLE_ERRORS as e:
+                time.sleep(retry_pending_seconds(e, attempts))
+        raise RuntimeError("Maximum retry attempts reached for chat completion request.")
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """
+        获取绑定当前事件循环的 AsyncOpenAI：每个循环只创建一个，并登记在循环结束前关闭，
+        run_in_async 每次新建循环时不会遗留上一个循环的连接池。
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # 重试交给 _achat_with_messages，便于限流器感知每一次 429
+            async_http_client = httpx.AsyncClient(
+                limits=self._http_limits(),
+                timeout=self.http_pool["timeout"],
+                event_hooks={
+                    "request": [self.pool_stats_counter.aon_request],
+                    "response": [self.pool_stats_counter.aon_response],
+                },
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.config["api_key"],
+                base_url=self.config["base_url"],
+                max_retries=0,
+                http_client=async_http_client,
+            )
+            self._async_loop = loop
+            register_loop_cleanup(self.aclose)
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """关闭绑定当前事件循环的异步连接池。"""
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            async_client, self._async_client, self._async_loop = self._async_client, None, None
+            await async_client.close()
+
+    async def achat_with_messages(self, model: str, messages: list, cache_attempt: int = 1, **kwargs) -> dict:
+        key, cached = self._cache_lookup(model, messages, kwargs, cache_attempt)
+        if cached is not None:
+            return cached
+        response = await self._achat_with_messages(model=model, messages=messages, **kwargs)
+        self._cache_store(key, response)
+        return response
+
+    async def _achat_with_messages(self, model: str, messages: list, **kwargs) -> dict:
+        client = self.get_async_client()
+        for attempts in range(1, MAX_ATTEMPTS + 1):
+            await self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = await client.chat.completions.create(
                     model=model,
                     messages=messages,
                     **kwargs
                 )
+                latency = time.monotonic() - start
+                self.limiter.on_success(latency)
+                PROFILER.observe('llm.request', latency)
+                PROFILER.add_usage(getattr(response, 'usage', None))
                 return response
-            except RateLimitError:
-                # 若 429 rate limiting 错误，则暂停重试
-                print(f"Rate limit exceeded. Pending for {PENDING_SECOND} second...")
-                time.sleep(PENDING_SECOND)
+            except RETRYABLE_ERRORS as e:
+                # 429 时额外收缩并发上限
+                if isinstance(e, RateLimitError):
+                    self.limiter.on_rate_limited()
+                pending_second = retry_pending_seconds(e, attempts)
+            finally:
+                await self.limiter.release()
+            await asyncio.sleep(pending_second)
         raise RuntimeError("Maximum retry attempts reached for chat completion request.")
-    
+
+    async def achat_with_prompt(self, model: str, prompt: str, **kwargs) -> dict:
+        messages = [{"role": "user", "content": prompt}]
+        return await self.achat_with_messages(model=model, messages=messages, **kwargs)
+
+    async def achat_with_prompt_return_text(self, model: str, prompt: str, **kwargs) -> str:
+        response = await self.achat_with_prompt(model=model, prompt=prompt, **kwargs)
+        return response.choices[0].message.content
+
     def chat_with_messages_return_text(self, model: str, messages: list, **kwargs) -> str:
         response = self.chat_with_messages(model=model, messages=messages, **kwargs)
         return response.choices[0].message.content
@@ -50,3 +310,43 @@ class ModelClient:
     def chat_with_prompt_return_text(self, model: str, prompt: str, **kwargs) -> str:
         response = self.chat_with_prompt(model=model, prompt=prompt, **kwargs)
         return response.choices[0].message.content
+
+
+# ------------------------- 进程级 client 注册表 -------------------------
+_MODEL_CLIENTS: Dict[str, ModelClient] = {}
+_MODEL_CLIENTS_LOCK = threading.Lock()
+_DEFAULT_API_TYPE: Optional[str] = None  # config.yaml 中 llm_api.default 的值，首次需要时读取
+
+
+def resolve_api_type(api_type: str = None) -> str:
+    """api_type 为 None 时解析为 config.yaml 中的默认 api_type，使显式传入默认名称与不传共用同一个 client。"""
+    global _DEFAULT_API_TYPE
+    if api_type is not None:
+        return api_type
+    if _DEFAULT_API_TYPE is None:
+        _DEFAULT_API_TYPE = load_config()["llm_api"]["default"]
+    return _DEFAULT_API_TYPE
+
+
+def get_model_client(api_type: str = None) -> ModelClient:
+    """
+    按 api_type 获取进程内共享的 ModelClient（线程安全）：
+    config.yaml 只在首次创建时解析，所有调用方共享同一个 HTTP 连接池与限流器。
+    """
+    key = resolve_api_type(api_type)
+    client = _MODEL_CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _MODEL_CLIENTS_LOCK:
+        client = _MODEL_CLIENTS.get(key)
+        if client is None:
+            client = ModelClient(api_type=key)
+            _MODEL_CLIENTS[key] = client
+    return client
+
+
+def get_client_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """返回注册表中每个 client 的连接池统计。"""
+    with _MODEL_CLIENTS_LOCK:
+        clients = dict(_MODEL_CLIENTS)
+    return {key: client.pool_stats() for key, client in clients.items()}
@@ -0,0 +1,281 @@
+"""
+本地 OpenAI 兼容的 mock 服务：按规则（或预置回复）生成 chat.completions 响应，
+可注入延迟、429 与格式错误的 JSON，用于离线压测阶段一的并发、重试与缓存行为。
+
+命令行启动（之后把 config.yaml 中某个 llm_api 节点的 base_url 指向输出的地址）：
+    python -m src.model.mock_server --port 8000 --latency lognormal:0.8,0.5 --rate-limit 0.05 --malformed 0.02
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+INPUT_MARKER = '# 输入:\n'
+OUTPUT_MARKER = '\n\n# 输出:'
+# 与 benchmark fixtures 约定的非标准后缀，去掉后即为标准名称
+GEO_NAME_SUFFIXES = ('地区', '一带', '大部')
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+DEFAULT_RETRY_AFTER_MS = 200  # 注入 429 时返回的 retry-after-ms
+
+
+def extract_prompt_input(prompt: str) -> str:
+    """取出 prompt 末尾 "# 输入:" 与 "# 输出:" 之间的内容（两类 Task4 prompt 结构相同）。"""
+    start = prompt.rfind(INPUT_MARKER)
+    if start < 0:
+        return prompt
+    start += len(INPUT_MARKER)
+    end = prompt.find(OUTPUT_MARKER, start)
+    return prompt[start:end if end >= 0 else len(prompt)].strip()
+
+
+def strip_geo_suffix(geo: str) -> str:
+    for suffix in GEO_NAME_SUFFIXES:
+        if geo.endswith(suffix):
+            return geo[:-len(suffix)]
+    return geo
+
+
+def mock_completion_content(prompt: str) -> str:
+    """
+    按 prompt 类型生成回复：
+    - 地理标准化（输入为 {'ori_geo': [...]}）：去掉常见后缀后原样返回 std_geo；
+    - 信息抽取：输入本身是抽取结果 JSON（基准数据）时直接返回，否则返回各字段为空的合法结构。
+    """
+    payload = extract_prompt_input(prompt)
+    if payload.startswith("{'ori_geo'"):
+        geo_list = ast.literal_eval(payload)['ori_geo']
+        return json.dumps({'std_geo': [strip_geo_suffix(geo) for geo in geo_list]}, ensure_ascii=False)
+    try:
+        json.loads(payload)
+        return payload
+    except ValueError:
+        return json.dumps({'specific_regions': [], 'other_regions': None, 'max_temp': None})
+
+
+def build_chat_completion(model: str, content: str, prompt: str) -> Dict[str, Any]:
+    """构造 chat.completion 响应体，usage 以字符数近似 token 数。"""
+    return {
+        'id': f'mock-{time.time_ns()}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {
+            'prompt_tokens': len(prompt),
+            'completion_tokens': len(content),
+            'total_tokens': len(prompt) + len(content),
+        },
+    }
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """
+    解析延迟分布描述（单位：秒）：
+    fixed:0.2 | uniform:0.1,0.5 | exponential:0.3（均值）| lognormal:0.5,0.4（中位数, sigma）
+    """
+    dist, _, params = spec.partition(':')
+    if dist not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution {dist}, expected one of {LATENCY_DISTRIBUTIONS}.")
+    return dist, tuple(float(value) for value in params.split(',') if value)
+
+
+def sample_latency(latency: Tuple[str, Tuple[float, ...]], rng: random.Random) -> float:
+    dist, params = latency
+    if dist == 'fixed':
+        return params[0] if params else 0.0
+    if dist == 'uniform':
+        return rng.uniform(params[0], params[1])
+    if dist == 'exponential':
+        return rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    return rng.lognormvariate(math.log(params[0]), params[1])
+
+
+class MockOpenAIServer:
+    """
+    在后台线程中运行的 mock 服务，实现 POST /v1/chat/completions 与 GET /v1/stats：
+    - latency：float（固定秒数）或 parse_latency 的结果 / 描述字符串；
+    - rate_limit_rate：按概率返回 429（带 retry-after-ms）；max_concurrency 不为 None 时在途请求超过该值也返回 429；
+    - malformed_rate：按概率返回截断的、无法解析的 JSON；
+    - canned_responses：{prompt 输入部分: 回复内容}，命中时优先于规则生成。
+    每个请求的随机决策只由 (seed, prompt, 该 prompt 第几次出现) 决定，与线程调度无关，重试结果可复现。
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: Any = 0.0,
+        rate_limit_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        max_concurrency: Optional[int] = None,
+        retry_after_ms: Optional[int] = DEFAULT_RETRY_AFTER_MS,
+        canned_responses: Optional[Dict[str, str]] = None,
+        seed: int = 0,
+    ):
+        if isinstance(latency, str):
+            latency = parse_latency(latency)
+        elif not isinstance(latency, tuple):
+            latency = ('fixed', (float(latency),))
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.max_concurrency = max_concurrency
+        self.retry_after_ms = retry_after_ms
+        self.canned_responses = canned_responses or {}
+        self.seed = seed
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'malformed': 0, 'in_flight': 0, 'peak_in_flight': 0}
+        self._prompt_seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    @property
+    def request_count(self) -> int:
+        return self.stats['requests']
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/stats'):
+                    self._send_json(200, server.get_stats())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                self._send_json(*server.handle_chat(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _request_rng(self, prompt: str) -> random.Random:
+        """同一 prompt 的第 n 次请求总是得到同一个随机序列。"""
+        with self._lock:
+            occurrence = self._prompt_seen.get(prompt, 0)
+            self._prompt_seen[prompt] = occurrence + 1
+        digest = hashlib.sha256(f'{self.seed}\x00{occurrence}\x00{prompt}'.encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def handle_chat(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """处理一次 chat.completions 请求，返回 (HTTP 状态码, 响应体, 额外响应头)。"""
+        prompt = body['messages'][-1]['content']
+        rng = self._request_rng(prompt)
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+            over_capacity = self.max_concurrency is not None and self.stats['in_flight'] > self.max_concurrency
+        try:
+            if over_capacity or rng.random() < self.rate_limit_rate:
+                self._count('rate_limited')
+                headers = {'retry-after-ms': str(self.retry_after_ms)} if self.retry_after_ms is not None else {}
+                error = {'error': {'message': 'Rate limit exceeded (mock).', 'type': 'rate_limit_error', 'code': 'rate_limit_exceeded'}}
+                return 429, error, headers
+
+            time.sleep(sample_latency(self.latency, rng))
+            payload = extract_prompt_input(prompt)
+            content = self.canned_responses.get(payload)
+            if content is None:
+                content = mock_completion_content(prompt)
+            if rng.random() < self.malformed_rate:
+                # 截断回复，模拟模型输出不完整的 JSON
+                self._count('malformed')
+                content = content[:max(1, len(content) // 2)]
+            else:
+                self._count('ok')
+            return 200, build_chat_completion(body.get('model', 'mock'), content, prompt), {}
+        finally:
+            with self._lock:
+                self.stats['in_flight'] -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+    def start(self) -> 'MockOpenAIServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'MockOpenAIServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible mock server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', default='fixed:0', help='fixed:S | uniform:LO,HI | exponential:MEAN | lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='probability of answering 429')
+    parser.add_argument('--max-concurrency', type=int, default=None, help='answer 429 when more requests are in flight')
+    parser.add_argument('--malformed', type=float, default=0.0, help='probability of returning truncated JSON')
+    parser.add_argument('--canned', default=None, help='JSON file of {prompt input: response content}')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    canned_responses = None
+    if args.canned is not None:
+        with open(args.canned) as f:
+            canned_responses = json.load(f)
+    server = MockOpenAIServer(
+        host=args.host, port=args.port, latency=args.latency, rate_limit_rate=args.rate_limit,
+        malformed_rate=args.malformed, max_concurrency=args.max_concurrency,
+        canned_responses=canned_responses, seed=args.seed,
+    )
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""LLM 响应的持久化缓存：按 (model, messages, kwargs) 内容哈希存取，基于 SQLite"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CACHE_MODE_READWRITE = 'readwrite'  # 命中直接返回，未命中请求接口并写入
+CACHE_MODE_REPLAY = 'replay'        # 只读回放：未命中直接报错，不发起网络请求
+CACHE_MODES = (CACHE_MODE_READWRITE, CACHE_MODE_REPLAY)
+EVICT_EVERY_WRITES = 100  # 每写入若干条检查一次淘汰条件
+
+
+class CacheMissError(RuntimeError):
+    """回放模式下请求未命中缓存。"""
+
+
+class ResponseCache:
+    """
+    线程安全的 LLM 响应缓存：
+    - key 为请求内容的 sha256，value 为响应 JSON 字符串；
+    - 支持按条数 / 总字节数 / 存活时间淘汰（按最近访问时间从旧到新）；
+    - 记录 hits / misses / writes / evictions 计数。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = CACHE_MODE_READWRITE,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode}, expected one of {CACHE_MODES}.")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.counters = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+
+        if mode == CACHE_MODE_REPLAY:
+            # 回放模式以只读方式打开，保证不会改动已有缓存
+            uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_accessed_at ON responses (accessed_at)')
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> 'ResponseCache':
+        """由 config.yaml 中的 llm_cache 节点构造缓存。"""
+        max_age_days = cache_config.get('max_age_days')
+        return cls(
+            path=cache_config['path'],
+            mode=cache_config.get('mode', CACHE_MODE_READWRITE),
+            max_entries=cache_config.get('max_entries'),
+            max_bytes=cache_config.get('max_bytes'),
+            max_age_seconds=max_age_days * 86400 if max_age_days is not None else None,
+        )
+
+    @staticmethod
+    def make_key(model: str, messages: list, kwargs: Dict[str, Any], attempt: int = 1) -> str:
+        """attempt 为调用方的第几次尝试：重试时换一个 key，避免校验失败的响应被原样回放；第一次尝试的 key 保持不变。"""
+        request = {'model': model, 'messages': messages, 'kwargs': kwargs}
+        if attempt > 1:
+            request['attempt'] = attempt
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and self.max_age_seconds is not None and now - row[1] > self.max_age_seconds:
+                # 已过期的条目视为未命中；回放模式下不改动缓存文件
+                if self.mode != CACHE_MODE_REPLAY:
+                    self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self._conn.commit()
+                    self.counters['evictions'] += 1
+                row = None
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits'] += 1
+            if self.mode != CACHE_MODE_REPLAY:
+                self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        if self.mode == CACHE_MODE_REPLAY:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value.encode('utf-8')), now, now),
+            )
+            self._conn.commit()
+            self.counters['writes'] += 1
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= EVICT_EVERY_WRITES:
+                self._evict_locked(now)
+
+    def evict(self) -> int:
+        """按配置的条数 / 字节数 / 存活时间淘汰条目，返回淘汰数量。"""
+        if self.mode == CACHE_MODE_REPLAY:
+            return 0
+        with self._lock:
+            return self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float) -> int:
+        self._writes_since_evict = 0
+        evicted = 0
+        if self.max_age_seconds is not None:
+            evicted += self._conn.execute(
+                'DELETE FROM responses WHERE created_at < ?', (now - self.max_age_seconds,)
+            ).rowcount
+        if self.max_entries is not None:
+            evicted += self._conn.execute(
+                'DELETE FROM responses WHERE key IN ('
+                'SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            ).rowcount
+        if self.max_bytes is not None:
+            # 从最近访问的条目开始累加大小，超出预算的旧条目全部删除
+            total = 0
+            stale_keys = []
+            for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at DESC'):
+                total += size
+                if total > self.max_bytes:
+                    stale_keys.append((key,))
+            self._conn.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+            evicted += len(stale_keys)
+        self._conn.commit()
+        self.counters['evictions'] += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total_bytes = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        counters.update({
+            'entries': entries,
+            'bytes': total_bytes,
+            'hit_rate': counters['hits'] / lookups if lookups else None,
+        })
+        return counters
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ------------------------- 进程级缓存实例 -------------------------
+_RESPONSE_CACHES: Dict[str, ResponseCache] = {}
+_RESPONSE_CACHES_LOCK = threading.Lock()
+
+
+def get_response_cache(cache_config: Dict[str, Any]) -> ResponseCache:
+    """同一缓存文件在进程内只打开一次，供多个 ModelClient 共享。"""
+    path = os.path.abspath(cache_config['path'])
+    with _RESPONSE_CACHES_LOCK:
+        cache = _RESPONSE_CACHES.get(path)
+        if cache is None:
+            cache = ResponseCache.from_config(cache_config)
+            _RESPONSE_CACHES[path] = cache
+    return cache
@@ -1 +1,138 @@
-# TODO
\ No newline at end of file
+"""Task4 端到端流水线：信息抽取 -> 地理标准化 -> 评分，三个阶段通过有界队列重叠执行"""
+
+import sys
+
+# 使脚本在 CLI 下运行时也能加载项目内模块
+sys.path.append('src')
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional
+
+from tqdm import tqdm
+
+from evaluation.geo_memo import get_geo_memo
+from evaluation.geo_rule_matcher import get_geo_rule_matcher
+from evaluation.label_store import LabelStore
+from evaluation.score_cache import ScoreCache
+from evaluation.task4.stage_1_1_info_extract import info_extract_by_llm_single, is_extraction_done
+from evaluation.task4.stage_1_2_geo_standardize import geo_standardize_single
+from evaluation.task4.stage_2_scoring import (SCORING_CHUNKSIZE, accuracy_scoring_batch, create_scoring_executor,
+                                              make_summary_accumulator, resolve_label_store, score_batch,
+                                              score_in_executor)
+from task.task_base import DEFAULT_QUEUE_SIZE, PipelineStage, StreamingPipeline
+from util.data_process import RecordWriter, iter_records, save_json
+from util.profiler import PROFILER, profile_report_path
+
+# ------------------------- 默认路径配置 -------------------------
+# 输入与阶段 1-1 相同（含 model_output 的模型原始输出），输出与阶段 2 相同
+DEFAULT_INPUT_PATH = '/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4_1119_test/temp_20251119103446.json'
+DEFAULT_OUTPUT_PATH = '/home/kaiyu/Project/WeatherEvaluateSystem/result/evaluation/task4_1119_test/task4_scoring.json'
+SUMMARY_OUTPUT_PATH = DEFAULT_OUTPUT_PATH.replace('.json', '_summary.json')
+SCORE_CACHE_PATH = None  # 评分缓存路径，含义同 stage_2_scoring.SCORE_CACHE_PATH
+EXTRACT_WORKERS = 5  # 信息抽取并发数（LLM 请求）
+STANDARDIZE_WORKERS = 5  # 地理标准化并发数（规则 / 备忘录未命中时请求 LLM）
+SCORING_WORKERS = 1  # 评分并发数，>1 时评分交给进程池执行
+SCORING_BATCH_SIZE = 32  # 评分阶段每次取出的最多样本数（只合并队列中已就绪的样本，不等待凑满）
+QUEUE_SIZE = DEFAULT_QUEUE_SIZE  # 阶段之间队列的容量
+
+
+def extract_stage(single_result: Dict[str, Any]) -> Dict[str, Any]:
+    """信息抽取；重试后仍失败的样本保留 error_res 继续向下游传递，与分阶段运行一样计入评分。"""
+    single_result = info_extract_by_llm_single(dict(single_result))
+    if not is_extraction_done(single_result):
+        print(f"Extraction failed for qid {single_result.get('qid')}, kept with error_res.")
+    return single_result
+
+
+def make_scoring_stage(
+    label_store: LabelStore,
+    score_cache: Optional[ScoreCache] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    chunksize: int = SCORING_CHUNKSIZE,
+):
+    """
+    构造评分阶段的批处理函数（配合 PipelineStage 的 batch_size）：整批查评分缓存、未命中的样本一次评分并写回。
+    executor 不为 None 时整批提交到进程池，每 chunksize 条一次进程间往返，子进程的性能统计随结果并回主进程。
+    """
+    if executor is None:
+        def score_func(batch):
+            return accuracy_scoring_batch(batch, label_store)
+    else:
+        def score_func(batch):
+            return score_in_executor(executor, batch, chunksize=chunksize)
+
+    def scoring_stage(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        score_batch(batch, score_func, label_store, score_cache)
+        return batch
+
+    return scoring_stage
+
+
+def run_task4_pipeline(
+    records: Iterable[Dict[str, Any]],
+    output_path: str,
+    extract_workers: int = EXTRACT_WORKERS,
+    standardize_workers: int = STANDARDIZE_WORKERS,
+    scoring_workers: int = SCORING_WORKERS,
+    scoring_batch_size: int = SCORING_BATCH_SIZE,
+    queue_size: int = QUEUE_SIZE,
+    label_store: Optional[LabelStore] = None,
+    score_cache: Optional[ScoreCache] = None,
+    total: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    流式执行 Task4 全流程：每条样本抽取完成后立即标准化、评分并写出，不再经由中间 JSON 文件。
+    - 输出按完成顺序写入，字段与分阶段运行的结果一致；抽取失败的样本保留 error_res 照常计入评分，条数与输入一致；
+    - 评分进程池在流水线线程启动前创建并启动全部子进程，评分阶段把队列中已就绪的样本合并成批提交；
+    - 跨样本的地理名称批量预取在流式模式下不适用，名称按条经规则层 / 备忘录 / LLM 解决，重试后仍失败的名称不再重复请求；
+    返回 summary 结果与流水线统计 {'summary': ..., 'pipeline': ...}。
+    """
+    label_store = resolve_label_store(label_store)
+    # 本次运行中 LLM 重试后仍未确认的地理名称，后续样本遇到时不再请求
+    failed_geo = set()
+    # 进程池须在任何流水线线程启动之前 fork 出全部子进程（create_scoring_executor 返回前已完成）
+    executor = create_scoring_executor(scoring_workers, label_store) if scoring_workers > 1 else None
+    pipeline = StreamingPipeline([
+        PipelineStage('extract', extract_stage, workers=extract_workers),
+        PipelineStage('geo_standardize', partial(geo_standardize_single, failed_geo=failed_geo), workers=standardize_workers),
+        PipelineStage('scoring', make_scoring_stage(label_store, score_cache, executor), workers=scoring_workers,
+                      batch_size=scoring_batch_size),
+    ], queue_size=queue_size)
+
+    accumulator = make_summary_accumulator()
+    try:
+        with RecordWriter(output_path) as writer:
+            for single_result in tqdm(pipeline.run(records), desc="Task4 pipeline", total=total):
+                accumulator.update(single_result)
+                writer.write(single_result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        get_geo_memo().save()
+    return {'summary': accumulator.result(), 'pipeline': pipeline.get_stats()}
+
+
+def main(
+    input_path: str = DEFAULT_INPUT_PATH,
+    output_path: str = DEFAULT_OUTPUT_PATH,
+    summary_output_path: str = SUMMARY_OUTPUT_PATH,
+    score_cache_path: Optional[str] = SCORE_CACHE_PATH,
+) -> None:
+    """命令行入口：从模型原始输出一次跑完抽取、标准化与评分，写出评分结果与 summary"""
+    score_cache = ScoreCache(score_cache_path) if score_cache_path is not None else None
+    result = run_task4_pipeline(iter_records(input_path), output_path, score_cache=score_cache)
+
+    print("Summary scores:", result['summary'])
+    print("Pipeline stats:", result['pipeline'])
+    print(f"Geo rule matcher stats: {get_geo_rule_matcher().get_stats()}")
+    if score_cache is not None:
+        print("Score cache:", score_cache.stats())
+        score_cache.close()
+    resolve_label_store(None).close()
+    PROFILER.dump(profile_report_path(output_path))
+    save_json(result['summary'], summary_output_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,190 @@
-# TODO
\ No newline at end of file
+"""通用的流式流水线：各阶段由各自的线程池处理，阶段之间用有界队列连接，记录就绪即流向下一阶段"""
+
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from util.profiler import PROFILER
+
+DEFAULT_QUEUE_SIZE = 16  # 阶段之间队列的容量，上游过快时阻塞，内存占用与总记录数无关
+_QUEUE_POLL_SECONDS = 0.1  # 阻塞读写队列时检查中止标志的间隔
+
+# 队列结束标记：上游全部处理完后放入，同一阶段的各 worker 依次传递
+_END = object()
+
+
+class PipelineStage:
+    """
+    流水线中的一个阶段：func(record) 返回处理后的记录，返回 None 表示丢弃该记录；
+    workers 为该阶段的并发线程数，抛出异常的记录会打印异常并丢弃，不影响其他记录。
+    batch_size > 1 时 func 接收记录列表并返回等长的结果列表：worker 取到一条记录后，
+    再顺带取出上游队列中已就绪的记录（至多 batch_size 条）一起处理，不为凑满一批而等待。
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, batch_size: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stats = {'processed': 0, 'dropped': 0, 'errors': 0, 'busy_seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def process(self, record: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            with PROFILER.timer(f'pipeline.{self.name}'):
+                result = self.func(record)
+        except Exception as e:
+            print(f"Error in pipeline stage {self.name}: {e}")
+            traceback.print_exception(type(e), e, e.__traceback__)
+            self._add('errors')
+            result = None
+        else:
+            self._add('processed' if result is not None else 'dropped')
+        with self._lock:
+            self.stats['busy_seconds'] += time.perf_counter() - start
+        return result
+
+    def process_batch(self, records: List[Any]) -> List[Any]:
+        """batch_size > 1 时使用：整批交给 func，出错时整批丢弃。"""
+        start = time.perf_counter()
+        try:
+            with PROFILER.timer(f'pipeline.{self.name}'):
+                results = list(self.func(records))
+        except Exception as e:
+            print(f"Error in pipeline stage {self.name}: {e}")
+            traceback.print_exception(type(e), e, e.__traceback__)
+            self._add('errors', len(records))
+            results = [None] * len(records)
+        else:
+            for result in results:
+                self._add('processed' if result is not None else 'dropped')
+        with self._lock:
+            self.stats['busy_seconds'] += time.perf_counter() - start
+        return results
+
+    def _add(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += value
+        PROFILER.count(f'pipeline.{self.name}.{name}', value)
+
+
+class StreamingPipeline:
+    """
+    将多个 PipelineStage 串成流水线：
+    - 输入由单独的线程逐条放入第一个队列，每个阶段的 worker 从上游队列取记录、处理后放入下游队列；
+    - 队列容量为 queue_size，慢阶段会反压上游，在途记录数有上限；
+    - run() 以完成顺序产出最后一个阶段的结果，整体耗时接近最慢的阶段而不是各阶段之和；
+    - 调用方提前停止迭代（或抛出异常）时，所有线程在下一次读写队列时退出。
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = DEFAULT_QUEUE_SIZE):
+        if not stages:
+            raise ValueError("StreamingPipeline requires at least one stage.")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats: Dict[str, Any] = {}
+        self._stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_QUEUE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _feed(self, records: Iterable[Any], out_queue: queue.Queue) -> None:
+        try:
+            for record in records:
+                if not self._put(out_queue, record):
+                    return
+        except Exception as e:
+            print(f"Error reading pipeline input: {e}")
+            traceback.print_exception(type(e), e, e.__traceback__)
+        self._put(out_queue, _END)
+
+    def _work(self, stage: PipelineStage, in_queue: queue.Queue, out_queue: queue.Queue, exited: List[int], lock: threading.Lock) -> None:
+        while True:
+            record = self._get(in_queue)
+            if record is _END:
+                # 把结束标记还给同阶段的其他 worker；最后一个退出的 worker 通知下游
+                self._put(in_queue, _END)
+                with lock:
+                    exited[0] += 1
+                    is_last = exited[0] == stage.workers
+                if is_last:
+                    self._put(out_queue, _END)
+                return
+            if stage.batch_size <= 1:
+                results = [stage.process(record)]
+            else:
+                results = stage.process_batch(self._drain(in_queue, [record], stage.batch_size))
+            for result in results:
+                if result is not None and not self._put(out_queue, result):
+                    return
+
+    def _drain(self, in_queue: queue.Queue, batch: List[Any], batch_size: int) -> List[Any]:
+        """从上游队列中取出已就绪的记录补充到 batch（至多 batch_size 条）；遇到结束标记时放回，由下一次读取处理。"""
+        while len(batch) < batch_size:
+            try:
+                record = in_queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is _END:
+                self._put(in_queue, _END)
+                break
+            batch.append(record)
+        return batch
+
+    def run(self, records: Iterable[Any]) -> Iterator[Any]:
+        self._stop.clear()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(records, queues[0]), name='pipeline-feed', daemon=True)]
+        for idx, stage in enumerate(self.stages):
+            exited, lock = [0], threading.Lock()
+            for worker_idx in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[idx], queues[idx + 1], exited, lock),
+                    name=f'pipeline-{stage.name}-{worker_idx}', daemon=True,
+                ))
+
+        start = time.perf_counter()
+        first_result_seconds = None
+        output_count = 0
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                result = self._get(queues[-1])
+                if result is _END:
+                    break
+                if first_result_seconds is None:
+                    first_result_seconds = time.perf_counter() - start
+                output_count += 1
+                yield result
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.stats = {
+                'outputs': output_count,
+                'elapsed_seconds': time.perf_counter() - start,
+                'first_result_seconds': first_result_seconds,
+                'stages': {stage.name: dict(stage.stats, workers=stage.workers) for stage in self.stages},
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """最近一次 run() 结束后的统计：输出数、总耗时、首条结果耗时与各阶段处理 / 丢弃 / 出错次数和忙碌时间。"""
+        return dict(self.stats)
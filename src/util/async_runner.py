@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+import traceback
+import weakref
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from tqdm import tqdm
+
+from util.multi_thread import expand_args_list_dict
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD 方式自适应调整并发上限：
+    - 请求成功且延迟正常时加性增长（每个"窗口"约 +1）；
+    - 遇到 429 时按 decrease_factor、延迟超过 latency_target 时按 latency_decrease_factor 乘性下降；
+    - cooldown 秒内只下降一次，避免同一批并发的 429 把上限打到底。
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: Optional[float] = None,
+        decrease_factor: float = 0.5,
+        latency_decrease_factor: float = 0.9,
+        cooldown: float = 1.0,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.latency_decrease_factor = latency_decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.stats = {'success': 0, 'rate_limited': 0, 'slow': 0, 'peak_limit': initial_limit}
+        self._last_decrease = 0.0
+        # asyncio.Condition 绑定事件循环，这里按循环懒创建
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            self.stats['success'] += 1
+            if self.latency_target is not None and latency > self.latency_target:
+                self.stats['slow'] += 1
+                self._decrease(self.latency_decrease_factor)
+                return
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.stats['peak_limit'] = max(self.stats['peak_limit'], int(self.limit))
+
+    def on_rate_limited(self) -> None:
+        with self._lock:
+            self.stats['rate_limited'] += 1
+            self._decrease(self.decrease_factor)
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+
+# 事件循环 -> 循环结束前需要执行的异步清理（如关闭绑定该循环的 HTTP 连接池）
+_LOOP_CLEANUPS: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[Callable[[], Awaitable[None]]]]' = weakref.WeakKeyDictionary()
+_LOOP_CLEANUPS_LOCK = threading.Lock()
+
+
+def register_loop_cleanup(cleanup: Callable[[], Awaitable[None]]) -> None:
+    """为当前事件循环登记一个清理协程函数，由 run_in_async / stream_in_async 在循环关闭前调用。"""
+    loop = asyncio.get_running_loop()
+    with _LOOP_CLEANUPS_LOCK:
+        _LOOP_CLEANUPS.setdefault(loop, []).append(cleanup)
+
+
+async def run_loop_cleanups() -> None:
+    """执行并清空当前事件循环登记的清理，单个清理失败只打印异常。"""
+    with _LOOP_CLEANUPS_LOCK:
+        cleanups = _LOOP_CLEANUPS.pop(asyncio.get_running_loop(), [])
+    for cleanup in cleanups:
+        try:
+            await cleanup()
+        except Exception as e:
+            print(f"Error during event loop cleanup: {e}")
+
+
+def run_in_async(coro_func, args_list_dict: dict, max_concurrency: int = 64):
+    """
+    run_in_threads 的协程版本：参数展开规则与返回顺序一致，异常同样以字符串形式写入结果。
+    实际在途请求数由 ModelClient 上的 AdaptiveConcurrencyLimiter 控制，
+    max_concurrency 只是同时调度的协程数上限。
+    """
+    args_list = expand_args_list_dict(args_list_dict)
+
+    async def _run_all():
+        results = [None] * len(args_list)
+        queue: asyncio.Queue = asyncio.Queue()
+        for idx, kwargs in enumerate(args_list):
+            queue.put_nowait((idx, kwargs))
+        progress = tqdm(desc="Processing", total=len(args_list))
+
+        async def _worker():
+            while True:
+                try:
+                    idx, kwargs = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results[idx] = await coro_func(**kwargs)
+                except Exception as e:
+                    print(f"Error during task execution: {e}")
+                    traceback.print_exception(type(e), e, e.__traceback__)
+                    results[idx] = f"{type(e)}, {str(e)}"
+                progress.update(1)
+
+        workers = [asyncio.create_task(_worker()) for _ in range(min(max_concurrency, len(args_list)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            await run_loop_cleanups()
+        progress.close()
+        return results
+
+    return asyncio.run(_run_all())
+
+
+def stream_in_async(coro_func, kwargs_iter: Iterable[dict], on_result: Callable, max_concurrency: int = 64, total: Optional[int] = None) -> int:
+    """
+    stream_in_threads 的协程版本：任务按需从 kwargs_iter 读取，完成后立即 on_result(result)，
+    失败的任务只打印异常。返回成功完成的任务数。
+    """
+    kwargs_iter = iter(kwargs_iter)
+
+    async def _run_all():
+        finished = 0
+        progress = tqdm(desc="Processing", total=total)
+
+        async def _worker():
+            nonlocal finished
+            # 单线程事件循环内 next() 不会被并发调用
+            for kwargs in kwargs_iter:
+                try:
+                    result = await coro_func(**kwargs)
+                except Exception as e:
+                    print(f"Error during task execution: {e}")
+                    traceback.print_exception(type(e), e, e.__traceback__)
+                else:
+                    on_result(result)
+                    finished += 1
+                progress.update(1)
+
+        try:
+            await asyncio.gather(*[asyncio.create_task(_worker()) for _ in range(max_concurrency)])
+        finally:
+            await run_loop_cleanups()
+        progress.close()
+        return finished
+
+    return asyncio.run(_run_all())
@@ -0,0 +1,26 @@
+"""
+结果文件格式转换：按扩展名在 JSON 数组 / JSONL / Parquet 之间转换已有的阶段输出。
+
+    python -m src.util.convert_records result/.../task4_scoring.json result/.../task4_scoring.parquet
+"""
+
+import argparse
+import sys
+
+# 使脚本在 CLI 下运行时也能加载项目内模块
+sys.path.append('src')
+
+from util.data_process import convert_records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Convert stage outputs between .json / .jsonl / .parquet')
+    parser.add_argument('input_path')
+    parser.add_argument('output_path', nargs='+', help='one or more output files, format chosen by extension')
+    args = parser.parse_args()
+    for output_path in args.output_path:
+        print(f"{args.input_path} -> {convert_records(args.input_path, output_path)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,27 @@
 import json
 import os
+import textwrap
 import yaml
 import pandas as pd
 
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
 from .file_timestamp import get_timestamp
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时 JSONL 退回标准库 json
+    orjson = None
+
+GEO_DIVISION_PATH = 'data/station_info/地理划分_去除空列.csv'
+# Parquet 中额外展开为 "a.b.c" 标量列的字段，便于直接做列式分析
+PARQUET_FLATTEN_FIELDS = ('extracted_info', 'accuracy_score')
+PARQUET_READ_BATCH_SIZE = 1024  # 流式读取 Parquet 时每批的行数
+PARQUET_ROW_GROUP_SIZE = 1000  # 写 Parquet 时每攒够若干条写出一个 row group，内存中最多缓存这么多条
+# 首个 row group 确定 schema 后，新出现的字段、缺失的字段或类型不符的值记在该 JSON 列中，读回时还原
+PARQUET_OVERFLOW_COLUMN = '_record_overflow'
+PARTIAL_SUFFIX = '.partial'  # RecordWriter 写入中的临时文件后缀，成功关闭后改名为目标路径
+
 
 def path_preprocess(path: str) -> str:
     # 若已存在该路径，则报错
@@ -28,16 +45,403 @@ def save_json(data, file_path: str) -> str:
     return file_path
 
 def load_jsonl(file_path: str) -> list:
-    with open(file_path, 'r') as f:
-        return [json.loads(line) for line in f]
+    return list(iter_jsonl(file_path))
         
 def save_jsonl(data: list, file_path: str) -> str:
     file_path = path_preprocess(file_path)
-    with open(file_path, 'w') as f:
+    with open(file_path, 'wb') as f:
         for item in data:
-            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+            f.write(dumps_json_line(item))
     return file_path
 
+
+def _json_default(value: Any) -> Any:
+    # numpy 标量 / 数组等 orjson 不直接支持的类型
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps_json_line(record: Any) -> bytes:
+    """序列化为一行紧凑 JSON（含换行符）；有 orjson 时使用 orjson（NaN 会写为 null）。"""
+    if orjson is not None:
+        return orjson.dumps(record, default=_json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+
+
+def loads_json(data: Any) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def iter_json_array(file_path: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """逐条解析顶层为数组的 JSON 文件，内存中只保留当前元素及一个读缓冲"""
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r') as f:
+        buf = f.read(chunk_size)
+        eof = len(buf) == 0
+        pos = 0
+        started = False
+        while True:
+            # 跳过空白与分隔符
+            while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ',')):
+                pos += 1
+            if pos < len(buf):
+                if not started:
+                    if buf[pos] != '[':
+                        raise ValueError(f"{file_path} is not a JSON array.")
+                    started = True
+                    pos += 1
+                    continue
+                if buf[pos] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    # 元素后必须紧跟分隔符，否则可能是被截断的数字等，读入更多数据后再确认
+                    if eof or (end < len(buf) and (buf[end].isspace() or buf[end] in ',]')):
+                        yield item
+                        pos = end
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                raise ValueError(f"Unexpected end of JSON array in {file_path}.")
+            # 丢弃已消费内容并补充数据
+            chunk = f.read(chunk_size)
+            eof = len(chunk) == 0
+            buf = buf[pos:] + chunk
+            pos = 0
+
+
+def iter_jsonl(file_path: str) -> Iterator[Any]:
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads_json(line)
+
+
+class JsonArrayWriter:
+    """JSON 数组，格式与 save_json（indent=4）的输出完全一致。"""
+
+    def __init__(self, file_path: str):
+        self._f = open(file_path, 'w')
+        self._f.write('[')
+        self._count = 0
+
+    def write(self, record: Any) -> None:
+        self._f.write('\n' if self._count == 0 else ',\n')
+        self._f.write(textwrap.indent(json.dumps(record, indent=4, ensure_ascii=False), '    '))
+        self._count += 1
+
+    def close(self) -> None:
+        self._f.write('\n]' if self._count else ']')
+        self._f.close()
+
+    def abort(self) -> None:
+        """出错时关闭文件但不写结尾的 ]，不完整的结果无法被当作合法 JSON 读取。"""
+        self._f.close()
+
+
+class JsonlWriter:
+    """每条一行紧凑 JSON。"""
+
+    def __init__(self, file_path: str):
+        self._f = open(file_path, 'wb')
+
+    def write(self, record: Any) -> None:
+        self._f.write(dumps_json_line(record))
+
+    def close(self) -> None:
+        self._f.close()
+
+    def abort(self) -> None:
+        self._f.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Reading or writing .parquet files requires pyarrow (pip install pyarrow).") from e
+    return pyarrow
+
+
+def flatten_record_field(value: Any, prefix: str) -> Dict[str, Any]:
+    """将嵌套 dict 展开为 {"prefix.a.b": 标量}；列表等非标量叶子序列化为 JSON 字符串。"""
+    if isinstance(value, dict):
+        flat: Dict[str, Any] = {}
+        for key, item in value.items():
+            flat.update(flatten_record_field(item, f"{prefix}.{key}"))
+        return flat
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return {prefix: value}
+    return {prefix: json.dumps(value, ensure_ascii=False, default=_json_default)}
+
+
+def _is_plain_column(values: List[Any]) -> bool:
+    """所有值都存在且为同一种标量类型（或 None）时按原类型存列，否则整列存 JSON 文本以保证无损还原。"""
+    kinds = {type(value) for value in values if value is not None}
+    return len(kinds) <= 1 and kinds <= {str, bool, int, float}
+
+
+def _flat_column(values: List[Any]) -> List[Any]:
+    """展开列只用于分析：数值统一为 float，混合类型转为字符串。"""
+    if all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in values):
+        return [None if value is None else float(value) for value in values]
+    if all(value is None or isinstance(value, str) for value in values):
+        return values
+    return [None if value is None else json.dumps(value, ensure_ascii=False) for value in values]
+
+
+_PARQUET_PLAIN_TYPES = {str: 'string', bool: 'bool_', int: 'int64', float: 'float64'}
+
+
+class ParquetWriter:
+    """
+    Parquet 列式格式：
+    - 每个顶层字段一列，嵌套或类型不一致的字段存为 JSON 文本列（列名记录在文件元数据中），读回时无损还原；
+    - PARQUET_FLATTEN_FIELDS 中的字段另外展开为 "extracted_info.max_temp.tmax" 等标量列，供 pandas / SQL 直接分析；
+    - 每 row_group_size 条写出一个 row group，schema 由第一个 row group 确定；
+      之后出现的新字段、缺失字段或与列类型不符的值写入 PARQUET_OVERFLOW_COLUMN，读回时还原。
+    """
+
+    def __init__(self, file_path: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        _import_pyarrow()
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+        self._records: List[Dict[str, Any]] = []
+        self._writer = None
+        self._schema = None
+        self._top_columns: List[str] = []
+        self._plain_types: Dict[str, type] = {}  # 按原类型存储的顶层列 -> Python 类型
+        self._flat_numeric: Dict[str, bool] = {}  # 展开列 -> 是否为数值列
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._records.append(record)
+        if len(self._records) >= self.row_group_size:
+            self._flush()
+
+    def close(self) -> None:
+        if self._records or self._writer is None:
+            self._flush()
+        self._writer.close()
+
+    def abort(self) -> None:
+        """出错时只关闭已写出的 row group，缓存中的记录丢弃。"""
+        self._records = []
+        if self._writer is not None:
+            self._writer.close()
+
+    def _init_schema(self, records: List[Dict[str, Any]]) -> None:
+        pa = _import_pyarrow()
+        self._top_columns = list(dict.fromkeys(key for record in records for key in record))
+        fields = []
+        json_columns = []
+        for name in self._top_columns:
+            values = [record.get(name) for record in records]
+            kinds = {type(value) for value in values if value is not None}
+            # 全部存在且为同一种标量类型时按原类型存列，否则（含全为 None）存 JSON 文本
+            if all(name in record for record in records) and _is_plain_column(values) and kinds:
+                self._plain_types[name] = kinds.pop()
+                fields.append(pa.field(name, getattr(pa, _PARQUET_PLAIN_TYPES[self._plain_types[name]])()))
+            else:
+                json_columns.append(name)
+                fields.append(pa.field(name, pa.string()))
+        fields.append(pa.field(PARQUET_OVERFLOW_COLUMN, pa.string()))
+
+        flat_rows = [self._flat_row(record) for record in records]
+        for name in dict.fromkeys(key for row in flat_rows for key in row):
+            values = [row.get(name) for row in flat_rows]
+            self._flat_numeric[name] = any(value is not None for value in values) and all(
+                value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in values
+            )
+            fields.append(pa.field(name, pa.float64() if self._flat_numeric[name] else pa.string()))
+
+        metadata = {
+            b'record_columns': json.dumps(self._top_columns).encode(),
+            b'record_json_columns': json.dumps(json_columns).encode(),
+            b'record_overflow_column': PARQUET_OVERFLOW_COLUMN.encode(),
+        }
+        self._schema = pa.schema(fields, metadata=metadata)
+        self._writer = pa.parquet.ParquetWriter(self.file_path, self._schema)
+
+    @staticmethod
+    def _flat_row(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for field in PARQUET_FLATTEN_FIELDS if isinstance(record.get(field), dict)
+                for key, value in flatten_record_field(record[field], field).items()}
+
+    def _flush(self) -> None:
+        pa = _import_pyarrow()
+        records, self._records = self._records, []
+        if self._schema is None:
+            self._init_schema(records)
+        top_columns = set(self._top_columns)
+        columns: Dict[str, List[Any]] = {name: [] for name in self._schema.names}
+        for record in records:
+            overflow: Dict[str, Any] = {}
+            for name in self._top_columns:
+                plain_type = self._plain_types.get(name)
+                if name not in record:
+                    # 缺失的字段：JSON 列存 null（值为 None 时存 "null"），按原类型存的列在 overflow 中记录
+                    columns[name].append(None)
+                    if plain_type is not None:
+                        overflow.setdefault('missing', []).append(name)
+                elif plain_type is None:
+                    columns[name].append(json.dumps(record[name], ensure_ascii=False, default=_json_default))
+                elif record[name] is None or type(record[name]) is plain_type:
+                    columns[name].append(record[name])
+                else:
+                    columns[name].append(None)
+                    overflow.setdefault('values', {})[name] = record[name]
+            for name, value in record.items():
+                if name not in top_columns:
+                    overflow.setdefault('values', {})[name] = value
+            columns[PARQUET_OVERFLOW_COLUMN].append(
+                json.dumps(overflow, ensure_ascii=False, default=_json_default) if overflow else None
+            )
+
+            # 展开列只用于分析：不在 schema 中的新展开列忽略，类型不符的值转为字符串或置空
+            flat_row = self._flat_row(record)
+            for name, numeric in self._flat_numeric.items():
+                value = flat_row.get(name)
+                if numeric:
+                    columns[name].append(float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None)
+                else:
+                    columns[name].append(value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+        self._writer.write_table(pa.table(columns, schema=self._schema))
+
+
+def iter_parquet(file_path: str) -> Iterator[Dict[str, Any]]:
+    """按批读取 ParquetWriter 写出的文件，只读取原始字段列，还原为与写入时相同的记录。"""
+    pa = _import_pyarrow()
+    parquet_file = pa.parquet.ParquetFile(file_path)
+    metadata = parquet_file.schema_arrow.metadata or {}
+    overflow_column = None
+    if b'record_columns' in metadata:
+        top_columns = json.loads(metadata[b'record_columns'])
+        json_columns = set(json.loads(metadata[b'record_json_columns']))
+        if b'record_overflow_column' in metadata:
+            overflow_column = metadata[b'record_overflow_column'].decode()
+    else:
+        # 其他工具写出的 Parquet：按原样逐行读取所有列
+        top_columns, json_columns = parquet_file.schema_arrow.names, set()
+    read_columns = top_columns + ([overflow_column] if overflow_column is not None else [])
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_READ_BATCH_SIZE, columns=read_columns):
+        for row in batch.to_pylist():
+            record = {}
+            for name in top_columns:
+                value = row[name]
+                if name not in json_columns:
+                    record[name] = value
+                elif value is not None:
+                    record[name] = json.loads(value)
+            if overflow_column is not None and row[overflow_column] is not None:
+                overflow = json.loads(row[overflow_column])
+                for name in overflow.get('missing', []):
+                    del record[name]
+                record.update(overflow.get('values', {}))
+            yield record
+
+
+class RecordFormat(NamedTuple):
+    reader: Callable[[str], Iterator[Dict[str, Any]]]
+    writer: Callable[[str], Any]
+
+
+# 扩展名 -> 读写实现；未登记的扩展名按 JSON 数组处理
+RECORD_FORMATS: Dict[str, RecordFormat] = {
+    '.json': RecordFormat(iter_json_array, JsonArrayWriter),
+    '.jsonl': RecordFormat(iter_jsonl, JsonlWriter),
+    '.parquet': RecordFormat(iter_parquet, ParquetWriter),
+}
+
+
+def register_record_format(ext: str, reader: Callable[[str], Iterator[Dict[str, Any]]], writer: Callable[[str], Any]) -> None:
+    """登记新的记录格式；writer(file_path) 返回带 write(record) / close() / abort() 的对象。"""
+    RECORD_FORMATS[ext.lower()] = RecordFormat(reader, writer)
+
+
+def get_record_format(file_path: str) -> RecordFormat:
+    return RECORD_FORMATS.get(os.path.splitext(file_path)[1].lower(), RECORD_FORMATS['.json'])
+
+
+def iter_records(file_path: str) -> Iterator[Dict[str, Any]]:
+    """按扩展名逐条读取结果文件（见 RECORD_FORMATS）：.jsonl 按行解析，.parquet 按批读取，其余按 JSON 数组流式解析"""
+    return get_record_format(file_path).reader(file_path)
+
+
+def load_records(file_path: str) -> List[Dict[str, Any]]:
+    return list(iter_records(file_path))
+
+
+def save_records(records: Iterable[Dict[str, Any]], file_path: str) -> str:
+    """按扩展名写出记录列表，返回实际写入的路径；.json 的输出与 save_json 完全一致。"""
+    with RecordWriter(file_path) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.file_path
+
+
+def load_records_frame(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    以 DataFrame 读取结果文件，extracted_info / accuracy_score 展开为 "a.b.c" 列；
+    Parquet 只读取 columns 指定的列，JSON / JSONL 需完整解析后再展开。
+    """
+    if get_record_format(file_path).reader is iter_parquet:
+        pa = _import_pyarrow()
+        if columns is None:
+            columns = [name for name in pa.parquet.read_schema(file_path).names if name != PARQUET_OVERFLOW_COLUMN]
+        return pa.parquet.read_table(file_path, columns=columns).to_pandas()
+    frame = pd.json_normalize(load_records(file_path), sep='.')
+    return frame[columns] if columns is not None else frame
+
+
+class RecordWriter:
+    """
+    逐条写出结果文件，格式由扩展名决定（见 RECORD_FORMATS）：
+    - .jsonl：每条一行紧凑 JSON（优先使用 orjson）；
+    - .parquet：列式存储，extracted_info / accuracy_score 额外展开为标量列；
+    - 其余：JSON 数组，格式与 save_json（indent=4）的输出完全一致。
+    写入过程中内容落在 <file_path>.partial，close() 成功后才改名为 file_path；
+    with 语句中抛出异常时调用 abort()，不会留下看似完整的结果文件。
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = path_preprocess(file_path)
+        self.partial_path = self.file_path + PARTIAL_SUFFIX
+        self.count = 0
+        self._writer = get_record_format(self.file_path).writer(self.partial_path)
+
+    def write(self, record: Any) -> None:
+        self._writer.write(record)
+        self.count += 1
+
+    def close(self) -> None:
+        """写完结尾并改名为目标路径。"""
+        self._writer.close()
+        os.replace(self.partial_path, self.file_path)
+
+    def abort(self) -> None:
+        """中途出错时调用：不写结尾、不改名，已写出的部分保留在 partial_path 供排查。"""
+        self._writer.abort()
+        if os.path.exists(self.partial_path):
+            print(f"Writing {self.file_path} failed after {self.count} records, partial output left at {self.partial_path}.")
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def convert_records(input_path: str, output_path: str) -> str:
+    """在不同记录格式之间转换（如 .json -> .parquet），逐条读取，返回实际写入的路径。"""
+    return save_records(iter_records(input_path), output_path)
+
+
 def load_yaml(file_path: str) -> dict:
     with open(file_path, 'r') as f:
         return yaml.safe_load(f)
@@ -45,7 +449,6 @@ def load_yaml(file_path: str) -> dict:
 def str_to_json(json_str: str) -> dict:
     return json.loads(json_str)
 
-def get_geo_division():
-    geo_division_path = 'data/station_info/地理划分_去除空列.csv'
+def get_geo_division(geo_division_path: str = GEO_DIVISION_PATH):
     geo_division_df = pd.read_csv(geo_division_path, dtype=str)
     return geo_division_df
\ No newline at end of file
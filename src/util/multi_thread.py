@@ -1,8 +1,10 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import traceback
+from typing import Callable, Iterable, Optional
 from tqdm import tqdm
 
-def run_in_threads(func, args_list_dict: dict, max_workers: int = 5):
+def expand_args_list_dict(args_list_dict: dict) -> list:
+    """将 {参数名: 列表或常量} 展开为逐个任务的 kwargs 列表"""
     # 验证每个 arg 的数量
     args_len = 1
     for key, value in args_list_dict.items():
@@ -21,6 +23,11 @@ def run_in_threads(func, args_list_dict: dict, max_workers: int = 5):
             else:
                 cur_arg[key] = value
         args_list.append(cur_arg)
+    return args_list
+
+
+def run_in_threads(func, args_list_dict: dict, max_workers: int = 5):
+    args_list = expand_args_list_dict(args_list_dict)
 
     results = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -40,4 +47,42 @@ def run_in_threads(func, args_list_dict: dict, max_workers: int = 5):
                 print(f"Error during task execution: {e}")
                 traceback.print_exception(type(e), e, e.__traceback__)
                 results.append(f"{type(e)}, {str(e)}")
-    return results
\ No newline at end of file
+    return results
+
+
+def stream_in_threads(func, kwargs_iter: Iterable[dict], on_result: Callable, max_workers: int = 5, total: Optional[int] = None) -> int:
+    """
+    流式版本的 run_in_threads：
+    - 按需从 kwargs_iter 取任务，在途任务数不超过 2 * max_workers，内存占用与总任务数无关；
+    - 每个任务完成后立即以完成顺序调用 on_result(result)，结果不在此处保留；
+    - 执行失败的任务只打印异常、不回调。返回成功完成的任务数。
+    """
+    max_pending = max_workers * 2
+    finished = 0
+    kwargs_iter = iter(kwargs_iter)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, tqdm(desc="Processing", total=total) as progress:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            # 补充任务直到达到在途上限
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    kwargs = next(kwargs_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(func, **kwargs))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                progress.update(1)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error during task execution: {e}")
+                    traceback.print_exception(type(e), e, e.__traceback__)
+                    continue
+                on_result(result)
+                finished += 1
+    return finished
@@ -0,0 +1,184 @@
+"""运行期性能统计：按名称记录调用次数、耗时分布与计数器，运行结束后输出 JSON 报告"""
+
+import asyncio
+import copy
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from util.data_process import save_json
+
+# 耗时直方图的桶上界（秒），最后一个桶收集超过最大上界的调用
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class TimerStat:
+    """单个计时项的累计统计：次数、总耗时、最小/最大值以及按 LATENCY_BUCKETS 划分的直方图。"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        for idx, upper in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper:
+                self.buckets[idx] += 1
+                return
+        self.buckets[-1] += 1
+
+    def merge(self, other: 'TimerStat') -> None:
+        """并入另一份统计（如进程池子进程回传的快照）。"""
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        histogram = {f"<={upper}": n for upper, n in zip(LATENCY_BUCKETS, self.buckets)}
+        histogram[f">{LATENCY_BUCKETS[-1]}"] = self.buckets[-1]
+        return {
+            'count': self.count,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else None,
+            'min_seconds': self.min if self.count else None,
+            'max_seconds': self.max,
+            'histogram': histogram,
+        }
+
+
+class Profiler:
+    """
+    线程安全的计时 / 计数注册表：
+    - timer(name) 上下文管理器与 timed(name) 装饰器（同时支持普通函数与协程）记录耗时；
+    - count(name, value) 累加计数器，约定以 "xxx.hit" / "xxx.miss" 成对记录缓存命中，报告中自动给出命中率；
+    - add_usage(usage) 累加 LLM 响应中的 token 用量。
+    统计只在当前进程内有效；进程池子进程以 snapshot(clear=True) 取出本进程的增量随结果回传，
+    主进程调用 merge(snapshot) 汇总（见 stage_2_scoring.score_in_executor）。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._timers: Dict[str, TimerStat] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            stat = self._timers.get(name)
+            if stat is None:
+                stat = self._timers[name] = TimerStat()
+            stat.add(seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_usage(self, usage: Any, prefix: str = 'llm.tokens') -> None:
+        """累加 OpenAI 响应的 usage（prompt / completion / total tokens），usage 为 None 时忽略。"""
+        if usage is None:
+            return
+        for field in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+            value = getattr(usage, field, None)
+            if value is not None:
+                self.count(f"{prefix}.{field}", value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        """装饰器：记录被装饰函数每次调用的耗时（异常退出同样计入）。"""
+        def decorator(func: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            timers = {name: stat.to_dict() for name, stat in sorted(self._timers.items())}
+            counters = dict(sorted(self._counters.items()))
+        hit_rates = {}
+        for name, hits in counters.items():
+            if not name.endswith('.hit'):
+                continue
+            prefix = name[:-len('.hit')]
+            lookups = hits + counters.get(f"{prefix}.miss", 0)
+            hit_rates[prefix] = hits / lookups if lookups else None
+        return {
+            'started_at': self.started_at,
+            'elapsed_seconds': time.time() - self.started_at,
+            'timers': timers,
+            'counters': counters,
+            'hit_rates': hit_rates,
+        }
+
+    def dump(self, path: str) -> str:
+        """将报告写为 JSON，返回实际写入的路径（同名文件已存在时追加时间戳）。"""
+        return save_json(self.report(), path)
+
+    def snapshot(self, clear: bool = False) -> Dict[str, Any]:
+        """可 pickle 的原始统计 {'timers': {name: TimerStat}, 'counters': {...}}；clear=True 时取出后清空，用于回传增量。"""
+        with self._lock:
+            snapshot = {'timers': self._timers, 'counters': self._counters}
+            if clear:
+                self._timers, self._counters = {}, {}
+            else:
+                snapshot = {'timers': copy.deepcopy(self._timers), 'counters': dict(self._counters)}
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """并入 snapshot() 的结果，计时项与计数器逐项累加。"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, other in snapshot['timers'].items():
+                stat = self._timers.get(name)
+                if stat is None:
+                    stat = self._timers[name] = TimerStat()
+                stat.merge(other)
+            for name, value in snapshot['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+
+# 进程内共享的默认实例，各模块直接使用
+PROFILER = Profiler()
+
+
+def profile_report_path(output_path: str) -> str:
+    """由阶段输出路径推导性能报告路径：xxx.json -> xxx_profile.json。"""
+    return output_path.replace('.json', '_profile.json') if output_path.endswith('.json') else f"{output_path}_profile.json"
@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+import tempfile
+
+# 测试在临时目录下运行（地理划分按相对路径读取），模块路径需为绝对路径
+sys.path.append(os.path.abspath('src'))
+sys.path.append(os.path.abspath('benchmark'))
+
+from fixtures import generate_fixture
+from evaluation.geo_index import clear_geo_index_cache, get_geo_index
+from evaluation.metric import geo_list_iou, geo_list_iou_matrix, set_iou
+
+# 2 个片区 × 2 个市 × 3 个县，每县 2 个站点
+root = tempfile.mkdtemp()
+paths = generate_fixture(root, n_samples=0, n_days=1, n_areas=2, cities_per_area=2, counties_per_city=3, stations_per_county=2)
+os.chdir(root)
+
+
+def random_geo_lists(geo_index, rng, n):
+    """随机的 geo_list，包含空列表与不在地理划分中的名称。"""
+    names = geo_index.std_geo_list + ['不存在的地区']
+    return [rng.sample(names, rng.randint(0, 4)) for _ in range(n)]
+
+
+def station_set(geo_index, geo_list):
+    return set(geo_index.geo_list_to_stationid(geo_list))
+
+
+def check_iou(geo_index, rng):
+    """位图 / 层级节点上计算的 IoU 与逐对 set_iou 一致。"""
+    pred_list, label_list = random_geo_lists(geo_index, rng, 30), random_geo_lists(geo_index, rng, 20)
+    iou_matrix = geo_list_iou_matrix(pred_list, label_list)
+    for i, pred in enumerate(pred_list):
+        for j, label in enumerate(label_list):
+            expected = set_iou(station_set(geo_index, pred), station_set(geo_index, label))
+            assert abs(iou_matrix[i, j] - expected) < 1e-12, (pred, label, iou_matrix[i, j], expected)
+            assert abs(geo_list_iou(pred, label) - expected) < 1e-12, (pred, label)
+
+
+def check_complement_iou(geo_index, rng):
+    """GeoHierarchy.complement_iou 与对两侧补集（全部站点减去覆盖站点）调用 set_iou 一致。"""
+    all_stations = geo_index.station_id_set
+    geo_lists = random_geo_lists(geo_index, rng, 40) + [geo_index.geo_dict_list['片区']]
+    for geo_list_a in geo_lists:
+        for geo_list_b in geo_lists:
+            expected = set_iou(all_stations - station_set(geo_index, geo_list_a), all_stations - station_set(geo_index, geo_list_b))
+            actual = geo_index.hierarchy.complement_iou(geo_list_a, geo_list_b)
+            assert abs(actual - expected) < 1e-12, (geo_list_a, geo_list_b, actual, expected)
+
+
+rng = random.Random(0)
+geo_index = get_geo_index()
+assert geo_index.hierarchy.is_laminar
+check_iou(geo_index, rng)
+check_complement_iou(geo_index, rng)
+print('laminar geo division: bitmask / complement iou == set iou')
+
+# 把一个站点划到另一个片区，使"片区0市0"跨两个片区，层级不再是 laminar，IoU 退回位图计算
+with open(paths['geo_division']) as f:
+    lines = f.read().splitlines()
+station_id, county, city, _ = lines[1].split(',')
+lines[1] = ','.join([station_id, county, city, '片区1'])
+with open(paths['geo_division'], 'w') as f:
+    f.write('\n'.join(lines) + '\n')
+clear_geo_index_cache()
+geo_index = get_geo_index()
+assert not geo_index.hierarchy.is_laminar
+check_iou(geo_index, rng)
+check_complement_iou(geo_index, rng)
+print('non-laminar geo division: bitmask / complement iou == set iou')
@@ -0,0 +1,29 @@
+import sys
+
+sys.path.append('src')
+
+from evaluation.geo_rule_matcher import GeoRuleMatcher
+
+matcher = GeoRuleMatcher(
+    ['清远市', '阳山县', '粤北', '连南瑶族自治县', '乳源瑶族自治县', '韶关市', '惠州北部'],
+    alias_table={'清远大部': '清远市'},
+)
+
+# 修饰性后缀不改变范围，可以确定地映射
+assert matcher.match_with_tier('清远市一带') == ('清远市', 'affix')
+assert matcher.match_with_tier('广东阳山县境内') == ('阳山县', 'affix')
+assert matcher.match_with_tier('阳山') == ('阳山县', 'short_name')
+
+# "大部""部分地区"只覆盖区域的一部分，规则层不处理，交给 LLM（别名表显式给出时除外）
+for geo in ['粤北大部', '粤北大部分地区', '阳山县部分地区', '清远市大部分']:
+    assert matcher.match_with_tier(geo) == (None, 'miss'), geo
+assert matcher.match_with_tier('清远大部') == ('清远市', 'alias')
+
+# 方位词与"市区""沿海""山区"等同样只覆盖一部分，不能经简称或 n-gram 上卷为整个区域
+for geo in ['连南瑶族自治县北部', '乳源瑶族自治县东部', '韶关市区', '阳山县东南部', '阳山北部山区', '清远市沿海地区', '广东韶关市区']:
+    assert matcher.match_with_tier(geo) == (None, 'miss'), geo
+# 标准名称本身含方位词时，剥离修饰后缀后精确命中仍然可以接受
+assert matcher.match_with_tier('惠州北部') == ('惠州北部', 'exact')
+assert matcher.match_with_tier('惠州北部一带') == ('惠州北部', 'affix')
+
+print('geo rule matcher ok')
@@ -0,0 +1,35 @@
+import random
+import sys
+import time
+
+sys.path.append('src')
+
+from task.task_base import PipelineStage, StreamingPipeline
+
+batch_sizes = []
+
+
+def jitter_stage(record):
+    """随机耗时，7 的倍数被丢弃。"""
+    time.sleep(random.random() * 0.002)
+    return record if record % 7 else None
+
+
+def batch_stage(batch):
+    batch_sizes.append(len(batch))
+    time.sleep(0.005)
+    return [record * 2 for record in batch]
+
+
+# 批处理阶段只合并已就绪的记录：结果不丢不重，每批不超过 batch_size，多个 worker 都能正常收尾
+for workers in (1, 3):
+    batch_sizes.clear()
+    pipeline = StreamingPipeline([
+        PipelineStage('jitter', jitter_stage, workers=4),
+        PipelineStage('batch', batch_stage, workers=workers, batch_size=8),
+    ], queue_size=16)
+    outputs = sorted(pipeline.run(range(500)))
+    assert outputs == [record * 2 for record in range(500) if record % 7], len(outputs)
+    assert max(batch_sizes) <= 8 and sum(batch_sizes) == len(outputs), batch_sizes
+    assert pipeline.get_stats()['stages']['batch']['processed'] == len(outputs)
+print('streaming pipeline batch stage ok')
@@ -0,0 +1,131 @@
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+
+# 测试在临时目录下运行（地理划分按相对路径读取），模块路径需为绝对路径
+sys.path.append(os.path.abspath('src'))
+sys.path.append(os.path.abspath('benchmark'))
+
+from fixtures import generate_fixture
+from evaluation.geo_index import get_geo_index
+from evaluation.label_store import LabelStore
+from evaluation.metric import (grouped_min_max_without_outliers, number_precise_scoring, number_precise_scoring_array,
+                               number_range_scoring, number_range_scoring_array, number_round_scoring,
+                               number_round_scoring_array, remove_outliers_mask, to_float_array)
+from evaluation import observation_store
+from evaluation.observation_store import ObservationStore
+from evaluation.task4 import stage_2_scoring
+from util.data_process import load_json
+from util.profiler import PROFILER
+
+
+def check_outlier_kernels(rng, csv_data_paths):
+    """分组的离群值过滤 / 区间内核与逐组调用 remove_outliers / compute_temp_range 逐位一致。"""
+    groups = [[round(rng.uniform(15, 38), 1) for _ in range(rng.randint(0, 12))] for _ in range(200)]
+    # 含明显离群值、全部相同与单个元素的组
+    groups += [[20.0] * 9 + [40.0], [25.0] * 5, [31.7]]
+    values = [temp for group in groups for temp in group]
+    lengths = [len(group) for group in groups]
+    keep = remove_outliers_mask(values, lengths).tolist()
+    lower, upper = grouped_min_max_without_outliers(values, lengths)
+    start = 0
+    for idx, group in enumerate(groups):
+        kept = [temp for temp, flag in zip(group, keep[start:start + len(group)]) if flag]
+        start += len(group)
+        expected = stage_2_scoring.remove_outliers(group)
+        assert kept == expected, (group, kept, expected)
+        if expected:
+            assert (lower[idx], upper[idx]) == (min(expected), max(expected)), group
+        else:
+            assert math.isnan(lower[idx]) and math.isnan(upper[idx]), group
+
+    geo_index = get_geo_index()
+    station_id_lists = [geo_index.geo_list_to_stationid([geo]) for geo in geo_index.std_geo_list] + [[], ['不存在的站点']]
+    for temp_csv_path in csv_data_paths:
+        batch = stage_2_scoring.compute_temp_ranges_batch(temp_csv_path, station_id_lists)
+        scalar = [stage_2_scoring.compute_temp_range(temp_csv_path, station_ids) for station_ids in station_id_lists]
+        assert batch == scalar, temp_csv_path
+    print('grouped outlier kernels == remove_outliers / compute_temp_range')
+
+
+def check_scoring_kernels(rng, preds, label_store):
+    """数值打分的数组内核与标量函数逐位一致（含 None、.5 边界与负数），整批评分与逐条评分一致。"""
+    pool = [None, -0.5, 0.5, 1.5, 2.5, 24.49, 24.5, 24.51, 25.0, 25.09, 25.5, 26.0]
+    values = pool + [round(rng.uniform(-5, 40), rng.choice([0, 1, 2])) for _ in range(300)]
+    predicted = [rng.choice(values) for _ in range(2000)]
+    actual = [rng.choice(values) for _ in range(2000)]
+    pred_array, actual_array = to_float_array(predicted), to_float_array(actual)
+    assert number_precise_scoring_array(pred_array, actual_array).tolist() == [number_precise_scoring(p, a) for p, a in zip(predicted, actual)]
+    assert number_round_scoring_array(pred_array, actual_array).tolist() == [number_round_scoring(p, a) for p, a in zip(predicted, actual)]
+    lower, upper = predicted[:1000], predicted[1000:]
+    actual_lower, actual_upper = actual[:1000], actual[1000:]
+    expected = [number_range_scoring(p, a) for p, a in zip(zip(lower, upper), zip(actual_lower, actual_upper))]
+    got = number_range_scoring_array(to_float_array(lower), to_float_array(upper), to_float_array(actual_lower), to_float_array(actual_upper))
+    assert got.tolist() == expected
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch = stage_2_scoring.accuracy_scoring_batch(preds, label_store)
+        single = [stage_2_scoring.accuracy_scoring_single(pred, label_store) for pred in preds]
+    assert batch == single
+    print('scoring array kernels == scalar scoring functions')
+
+
+def check_temp_range_memo(rng, label_store, qids):
+    """
+    经 TEMP_RANGE_MEMO 的 get_actual_temp_lower_upper（首次计算与再次命中）与直接过滤离群值的结果一致；
+    未设置 cache_dir 时备忘录键只用 (路径, mtime, size)，不计算观测文件的内容哈希。
+    """
+    geo_index = get_geo_index()
+    stage_2_scoring.TEMP_RANGE_MEMO.clear()
+    observation_store._FILE_HASH_MEMO.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for qid in qids:
+            for _ in range(10):
+                station_id_list = geo_index.geo_list_to_stationid(rng.sample(geo_index.std_geo_list, rng.randint(1, 3)))
+                rng.shuffle(station_id_list)
+                temp_list = stage_2_scoring.remove_outliers(stage_2_scoring.get_actual_temp_list(station_id_list, qid, label_store))
+                expected = (min(temp_list), max(temp_list)) if temp_list else (None, None)
+                # 站点顺序不影响结果，第二次调用命中备忘录
+                assert stage_2_scoring.get_actual_temp_lower_upper(station_id_list, qid, label_store) == expected, (qid, station_id_list)
+                assert stage_2_scoring.get_actual_temp_lower_upper(sorted(station_id_list), qid, label_store) == expected, (qid, station_id_list)
+    assert not observation_store._FILE_HASH_MEMO, observation_store._FILE_HASH_MEMO
+    print('memoized get_actual_temp_lower_upper == direct computation')
+
+
+def check_parallel_scoring(preds, label_store):
+    """
+    进程池评分与串行评分结果逐条一致；子进程回传的性能统计只包含各自的增量：
+    fork 前主进程已有的计数不会被重复并入，单条评分计时的次数等于样本数。
+    """
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        serial = stage_2_scoring.accuracy_scoring(preds, label_store=label_store)
+        PROFILER.reset()
+        PROFILER.count('test.parent_counter', 100)
+        parallel = stage_2_scoring.accuracy_scoring_parallel(preds, workers=4, chunksize=8, label_store=label_store)
+    assert serial == parallel
+    report = PROFILER.report()
+    assert report['counters']['test.parent_counter'] == 100, report['counters']['test.parent_counter']
+    assert report['timers']['stage_2.accuracy_scoring_single']['count'] == len(preds), report['timers']['stage_2.accuracy_scoring_single']
+    print('accuracy_scoring_parallel == accuracy_scoring, worker profiles merged once')
+
+
+if __name__ == '__main__':
+    # 2 个片区 × 2 个市 × 3 个县，每县 2 个站点，3 天观测、60 条样本
+    root = tempfile.mkdtemp()
+    paths = generate_fixture(root, n_samples=60, n_days=3, n_areas=2, cities_per_area=2, counties_per_city=3, stations_per_county=2)
+    os.chdir(root)
+
+    rng = random.Random(0)
+    label_store = LabelStore(paths['labels'])
+    preds = load_json(paths['preds'])
+    csv_data_paths = sorted(os.listdir(paths['tmax_dir']))
+    with stage_2_scoring.use_observation_store(ObservationStore(paths['tmax_dir'])):
+        check_outlier_kernels(rng, csv_data_paths)
+        check_scoring_kernels(rng, preds, label_store)
+        check_temp_range_memo(rng, label_store, [pred['qid'] for pred in preds[:6]])
+        check_parallel_scoring(preds, label_store)
+    label_store.close()